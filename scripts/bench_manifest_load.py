@@ -0,0 +1,91 @@
+"""Compare manifest decode and registry load time across manifest formats.
+
+The last row loads the same prompts from a module written by ``--emit-python``.
+"""
+
+from __future__ import annotations
+
+import argparse
+import importlib.util
+import py_compile
+import sys
+import time
+from collections.abc import Callable
+from functools import partial
+from pathlib import Path
+from tempfile import TemporaryDirectory
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+PROMPT_TEMPLATE = """---
+{{"id": "prompt_{index}", "version": "v1", "metadata": {{"owner": "bench", "index": {index}}},
+  "variables": ["question"], "blocks": {{"_context": {{"optional": true, "default": ""}}}}}}
+---
+# system
+You are assistant number {index}. {filler}
+
+# user
+{{{{question}}}}
+{{{{_context}}}}
+"""
+
+
+def _write_prompts(src_root: Path, count: int) -> None:
+    filler = "Answer carefully and cite sources. " * 20
+    for index in range(count):
+        path = src_root / f"prompt_{index}" / "v1.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(PROMPT_TEMPLATE.format(index=index, filler=filler), encoding="utf-8")
+
+
+def _best_of(func: Callable[[], object], repeat: int) -> float:
+    timings: list[float] = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func()
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--prompts", type=int, default=2000, help="Number of prompts")
+    parser.add_argument("--repeat", type=int, default=5, help="Loads per format; best is kept")
+    args = parser.parse_args()
+
+    from promptir.codegen import write_python_module
+    from promptir.compiler import compile_prompts
+    from promptir.manifest import MANIFEST_FORMATS, decode_manifest
+    from promptir.registry import PromptRegistry
+
+    with TemporaryDirectory() as tmp:
+        root = Path(tmp)
+        _write_prompts(root / "prompts", args.prompts)
+        manifest: dict[str, object] = {}
+        for manifest_format in MANIFEST_FORMATS:
+            out_path = root / f"manifest.{manifest_format}"
+            manifest = compile_prompts(
+                str(root / "prompts"), str(out_path), manifest_format=manifest_format
+            )
+            data = out_path.read_bytes()
+            decode = _best_of(partial(decode_manifest, data), args.repeat)
+            load = _best_of(partial(PromptRegistry.from_manifest_path, str(out_path)), args.repeat)
+            print(
+                f"{manifest_format:>7}: decode {decode * 1000:8.2f} ms  "
+                f"registry load {load * 1000:8.2f} ms  {len(data) / 1024:10.1f} KiB"
+            )
+
+        module_path = root / "prompts_gen.py"
+        write_python_module(manifest, str(module_path))
+        py_compile.compile(str(module_path), doraise=True)
+        pyc_path = Path(importlib.util.cache_from_source(str(module_path)))
+        load = _best_of(partial(PromptRegistry.from_module, str(module_path)), args.repeat)
+        print(
+            f"{'python':>7}: decode      n/a     registry load {load * 1000:8.2f} ms  "
+            f"{pyc_path.stat().st_size / 1024:10.1f} KiB (.pyc)"
+        )
+
+
+if __name__ == "__main__":
+    main()
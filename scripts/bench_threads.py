@@ -0,0 +1,84 @@
+"""Measure render throughput from 1..N threads against the demo manifests."""
+
+from __future__ import annotations
+
+import argparse
+import json
+import sys
+import sysconfig
+import threading
+import time
+from pathlib import Path
+from typing import Any
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(PROJECT_ROOT / "src"))
+
+DATASET_ROOT = PROJECT_ROOT / "data" / "demo_datasets"
+DATASET_NAMES = ("document_analysis", "local_operations")
+
+# (PreparedPrompt, vars, blocks) for every demo entry.
+Workload = list[tuple[Any, dict[str, Any], dict[str, Any]]]
+
+
+def _load_workload() -> Workload:
+    from promptir.registry import PromptRegistry
+
+    workload: Workload = []
+    for name in DATASET_NAMES:
+        dataset_dir = DATASET_ROOT / name
+        registry = PromptRegistry.from_manifest_path(str(dataset_dir / "manifest.json"))
+        entries = json.loads((dataset_dir / "demo_data.json").read_text(encoding="utf-8"))
+        for entry in entries:
+            prepared = registry.prepare(entry["id"], version=entry.get("version"))
+            workload.append((prepared, entry["vars"], entry["blocks"]))
+    return workload
+
+
+def _run(
+    workload: list[tuple[Any, dict[str, Any], dict[str, Any]]], threads: int, seconds: float
+) -> int:
+    counts = [0] * threads
+    start = threading.Barrier(threads + 1)
+    stop = threading.Event()
+
+    def worker(index: int) -> None:
+        start.wait()
+        done = 0
+        while not stop.is_set():
+            for prepared, vars, blocks in workload:
+                prepared.render(vars, blocks)
+            done += len(workload)
+        counts[index] = done
+
+    pool = [threading.Thread(target=worker, args=(index,)) for index in range(threads)]
+    for thread in pool:
+        thread.start()
+    start.wait()
+    time.sleep(seconds)
+    stop.set()
+    for thread in pool:
+        thread.join()
+    return sum(counts)
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("--max-threads", type=int, default=8, help="Largest thread count")
+    parser.add_argument("--seconds", type=float, default=1.0, help="Duration of each run")
+    args = parser.parse_args()
+
+    workload = _load_workload()
+    free_threaded = bool(sysconfig.get_config_var("Py_GIL_DISABLED"))
+    print(f"Python {sys.version.split()[0]}, free-threaded: {free_threaded}")
+    baseline = 0.0
+    threads = 1
+    while threads <= args.max_threads:
+        rate = _run(workload, threads, args.seconds) / args.seconds
+        baseline = baseline or rate
+        print(f"{threads:>3} threads: {rate:12.0f} renders/s  x{rate / baseline:5.2f}")
+        threads *= 2
+
+
+if __name__ == "__main__":
+    main()
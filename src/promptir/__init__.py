@@ -1,8 +1,21 @@
 """promptir: local-first prompt compiler and runtime registry."""
 
-from promptir.compiler import compile_prompts
+from typing import TYPE_CHECKING, Any
+
 from promptir.enrich import EnrichmentPipeline
 from promptir.registry import PromptRegistry
 
+if TYPE_CHECKING:
+    from promptir.compiler import compile_prompts
+
 __all__ = ["EnrichmentPipeline", "PromptRegistry", "compile_prompts"]
 __version__ = "0.1.0"
+
+
+def __getattr__(name: str) -> Any:
+    # The compiler (and jinja2) load on first use so runtime-only imports stay light.
+    if name == "compile_prompts":
+        from promptir.compiler import compile_prompts
+
+        return compile_prompts
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -0,0 +1,156 @@
+"""Bounded in-memory caches with TTL and LRU eviction."""
+
+from __future__ import annotations
+
+import hashlib
+import sys
+import threading
+import time
+from collections import OrderedDict
+from collections.abc import Callable, Collection, Hashable, Mapping
+from dataclasses import dataclass, fields, is_dataclass
+from typing import Generic, TypeVar, cast
+
+K = TypeVar("K", bound=Hashable)
+V = TypeVar("V")
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    entries: int = 0
+    bytes: int = 0
+
+
+class LRUCache(Generic[K, V]):
+    """Thread-safe LRU cache bounded by entry count and approximate size in bytes.
+
+    Entries older than ``ttl`` seconds are treated as misses. Sizes come from
+    ``sizeof``, which defaults to ``approximate_size`` (one byte per character).
+    """
+
+    def __init__(
+        self,
+        *,
+        max_entries: int | None = 1024,
+        max_bytes: int | None = None,
+        ttl: float | None = None,
+        sizeof: Callable[[V], int] | None = None,
+        clock: Callable[[], float] = time.monotonic,
+    ) -> None:
+        if max_entries is not None and max_entries < 1:
+            raise ValueError("max_entries must be at least 1")
+        if max_bytes is not None and max_bytes < 1:
+            raise ValueError("max_bytes must be at least 1")
+        if ttl is not None and ttl <= 0:
+            raise ValueError("ttl must be positive")
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self._sizeof: Callable[[V], int] = sizeof or approximate_size
+        self._clock = clock
+        self._entries: OrderedDict[K, tuple[float | None, int, V]] = OrderedDict()
+        self._bytes = 0
+        self._hits = 0
+        self._misses = 0
+        self._evictions = 0
+        self._expirations = 0
+        self._lock = threading.Lock()
+
+    def get(self, key: K) -> V | None:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._misses += 1
+                return None
+            expires_at, size, value = entry
+            if expires_at is not None and expires_at <= self._clock():
+                del self._entries[key]
+                self._bytes -= size
+                self._expirations += 1
+                self._misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self._hits += 1
+            return value
+
+    def put(self, key: K, value: V) -> None:
+        size = self._sizeof(value) if self.max_bytes is not None else 0
+        if self.max_bytes is not None and size > self.max_bytes:
+            return
+        expires_at = self._clock() + self.ttl if self.ttl is not None else None
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._bytes -= previous[1]
+            self._entries[key] = (expires_at, size, value)
+            self._bytes += size
+            while self._over_limit():
+                _, (_, evicted_size, _) = self._entries.popitem(last=False)
+                self._bytes -= evicted_size
+                self._evictions += 1
+
+    def discard(self, key: K) -> None:
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is not None:
+                self._bytes -= entry[1]
+
+    def keys(self) -> list[K]:
+        with self._lock:
+            return list(self._entries)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return CacheStats(
+                hits=self._hits,
+                misses=self._misses,
+                evictions=self._evictions,
+                expirations=self._expirations,
+                entries=len(self._entries),
+                bytes=self._bytes,
+            )
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def _over_limit(self) -> bool:
+        if self.max_entries is not None and len(self._entries) > self.max_entries:
+            return True
+        return self.max_bytes is not None and self._bytes > self.max_bytes
+
+
+def digest_values(*mappings: Mapping[str, str], names: Collection[str] | None = None) -> str:
+    """Return a short digest of string mappings, optionally restricted to ``names``."""
+    hasher = hashlib.blake2b(digest_size=16)
+    for mapping in mappings:
+        keys = sorted(mapping if names is None else mapping.keys() & names)
+        hasher.update(f"{len(keys)}|".encode())
+        for key in keys:
+            value = mapping[key]
+            hasher.update(f"{len(key)}:{key}{len(value)}:".encode())
+            hasher.update(value.encode("utf-8", "surrogatepass"))
+    return hasher.hexdigest()
+
+
+def approximate_size(value: object) -> int:
+    """Approximate the size of strings, mappings, sequences and dataclasses in bytes."""
+    if isinstance(value, str):
+        return len(value)
+    if isinstance(value, Mapping):
+        items = cast(Mapping[object, object], value)
+        return sum(approximate_size(k) + approximate_size(v) for k, v in items.items())
+    if isinstance(value, (tuple, list)):
+        sequence = cast(Collection[object], value)
+        return sum(approximate_size(item) for item in sequence)
+    if is_dataclass(value) and not isinstance(value, type):
+        return sum(approximate_size(getattr(value, field.name)) for field in fields(value))
+    return sys.getsizeof(value)
@@ -6,9 +6,9 @@ import argparse
 import json
 import sys
 
-from promptir.compiler import compile_prompts
 from promptir.demo import dump_demo_results, render_demo, write_demo_results
 from promptir.errors import PromptCompileError, PromptInputError, PromptNotFound
+from promptir.manifest import MANIFEST_FORMATS, ManifestFormat, decode_manifest
 
 
 def main() -> int:
@@ -18,6 +18,39 @@ def main() -> int:
     compile_parser = subparsers.add_parser("compile", help="Compile prompts to a manifest")
     compile_parser.add_argument("--src", required=True, help="Source prompts root")
     compile_parser.add_argument("--out", required=True, help="Output manifest path")
+    compile_parser.add_argument(
+        "--cache", help="Build cache path; unchanged prompts are reused from it"
+    )
+    compile_parser.add_argument(
+        "--jobs", type=int, default=1, help="Number of processes used to compile prompts"
+    )
+    compile_parser.add_argument(
+        "--format",
+        choices=MANIFEST_FORMATS,
+        default="json",
+        help="Manifest encoding; binary is compact and faster to load",
+    )
+    compile_parser.add_argument(
+        "--dedupe-includes",
+        action="store_true",
+        help="Store include text once in a content table instead of in every message",
+    )
+    compile_parser.add_argument(
+        "--emit-python",
+        metavar="PATH",
+        help="Also write an importable Python module for PromptRegistry.from_module",
+    )
+    compile_parser.add_argument(
+        "--jinja2-cache",
+        metavar="PATH",
+        help="Also write jinja2 templates as compiled bytecode for the registry to load",
+    )
+    compile_parser.add_argument(
+        "--watch", action="store_true", help="Recompile affected prompts when sources change"
+    )
+    compile_parser.add_argument(
+        "--interval", type=float, default=0.5, help="Polling interval in seconds for --watch"
+    )
 
     demo_parser = subparsers.add_parser(
         "demo-run", help="Render a manifest with demo data to validate prompt outputs"
@@ -28,12 +61,37 @@ def main() -> int:
 
     args = parser.parse_args()
 
+    if args.command == "compile" and args.watch:
+        return _watch(
+            args.src,
+            args.out,
+            args.interval,
+            args.format,
+            args.dedupe_includes,
+            args.emit_python,
+            args.jinja2_cache,
+        )
+
     if args.command == "compile":
+        from promptir.compiler import compile_prompts
+
         try:
-            compile_prompts(args.src, args.out)
+            manifest = compile_prompts(
+                args.src,
+                args.out,
+                cache_path=args.cache,
+                workers=args.jobs,
+                manifest_format=args.format,
+                dedupe_includes=args.dedupe_includes,
+                jinja2_cache_path=args.jinja2_cache,
+            )
         except PromptCompileError as exc:
             print(f"Compile error: {exc}", file=sys.stderr)
             return 1
+        if args.emit_python:
+            from promptir.codegen import write_python_module
+
+            write_python_module(manifest, args.emit_python)
         return 0
 
     if args.command == "demo-run":
@@ -52,5 +110,45 @@ def main() -> int:
     return 1
 
 
+def _watch(
+    src: str,
+    out: str,
+    interval: float,
+    manifest_format: ManifestFormat,
+    dedupe_includes: bool,
+    python_out: str | None,
+    jinja2_cache_out: str | None,
+) -> int:
+    from promptir.codegen import write_python_module
+    from promptir.watch import PromptWatcher, WatchResult
+
+    def report(result: WatchResult) -> None:
+        for error in result.errors:
+            print(f"Compile error: {error}", file=sys.stderr)
+        if result.written:
+            print(f"Wrote {out} ({len(result.recompiled)} prompts recompiled)", file=sys.stderr)
+            if python_out or jinja2_cache_out:
+                with open(out, "rb") as handle:
+                    manifest = decode_manifest(handle.read())
+                if python_out:
+                    write_python_module(manifest, python_out)
+                if jinja2_cache_out:
+                    from promptir.compiler import write_jinja2_cache
+
+                    write_jinja2_cache(manifest, jinja2_cache_out)
+
+    try:
+        watcher = PromptWatcher(
+            src, out, manifest_format=manifest_format, dedupe_includes=dedupe_includes
+        )
+        watcher.run(interval=interval, on_result=report)
+    except PromptCompileError as exc:
+        print(f"Compile error: {exc}", file=sys.stderr)
+        return 1
+    except KeyboardInterrupt:
+        pass
+    return 0
+
+
 if __name__ == "__main__":
     raise SystemExit(main())
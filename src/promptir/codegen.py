@@ -0,0 +1,125 @@
+"""Generate an importable Python module with specialized renderers from a manifest."""
+
+from __future__ import annotations
+
+import json
+import math
+from typing import Any, cast
+
+from promptir.compiler import write_atomic
+from promptir.models import PromptDefinition
+from promptir.registry import CODEGEN_VERSION, load_prompts
+from promptir.render_simple import compile_simple
+
+_HEADER = '''"""Prompts generated by promptir from a compiled manifest. Do not edit."""
+
+# ruff: noqa
+# fmt: off
+
+CODEGEN_VERSION = {version}
+
+'''
+
+
+def generate_python_module(manifest: dict[str, Any]) -> str:
+    """Return Python source for ``manifest`` loadable by ``PromptRegistry.from_module``.
+
+    Prompt data is emitted as tuple literals that the bytecode compiler folds into
+    constants, and prompts are only built when looked up. Simple prompts get one f-string
+    function per message; jinja2_sandbox prompts carry the Python source jinja2
+    generates for each message, so the registry never parses template text. That
+    source is kept as a string and compiled with ``compile`` when the prompt is
+    first built, once per process; the module's ``.pyc`` does not cache it.
+    """
+    prompts = load_prompts(manifest)
+    functions: list[str] = []
+    entries: list[str] = []
+    renderers: list[str] = []
+    jinja2_code: list[str] = []
+    env: Any = None
+    for prompt in prompts.values():
+        entries.append(f"    {(prompt.id, prompt.version)!r}: {_prompt_tuple(prompt)},")
+        if prompt.template_engine == "simple":
+            names: list[str] = []
+            for message in prompt.messages:
+                name = f"_render_{len(functions)}"
+                label = f"{prompt.id}@{prompt.version} {message.role}"
+                functions.append(_simple_function(name, label, message.content))
+                names.append(name)
+            renderers.append(f"    {prompt.hash!r}: ({', '.join(names)},),")
+        elif prompt.template_engine == "jinja2_sandbox":
+            if env is None:
+                from promptir.render_jinja2 import create_sandbox_environment
+
+                env = create_sandbox_environment()
+            for message in prompt.messages:
+                code = env.compile(message.content, raw=True)
+                jinja2_code.append(f"    {(prompt.hash, message.role)!r}: {code!r},")
+
+    return "".join(
+        (
+            _HEADER.format(version=CODEGEN_VERSION),
+            *functions,
+            "# (id, version) -> (metadata, template_engine, variables, blocks, messages, hash)\n",
+            "# with blocks as (name, optional, default) and messages as (role, content).\n",
+            _dict_literal("PROMPTS", entries),
+            "# prompt hash -> one renderer per message, in message order\n",
+            _dict_literal("RENDERERS", renderers),
+            "# (prompt hash, role) -> Python source generated by jinja2 for the template\n",
+            _dict_literal("JINJA2_CODE", jinja2_code),
+        )
+    )
+
+
+def write_python_module(manifest: dict[str, Any], out_path: str) -> None:
+    """Write ``generate_python_module(manifest)`` to ``out_path`` atomically."""
+    write_atomic(out_path, generate_python_module(manifest).encode("utf-8"))
+
+
+def _prompt_tuple(prompt: PromptDefinition) -> str:
+    blocks = tuple((name, spec.optional, spec.default) for name, spec in prompt.blocks.items())
+    messages = tuple((message.role, message.content) for message in prompt.messages)
+    fields = (prompt.metadata, prompt.template_engine, prompt.variables, blocks, messages)
+    return _literal((*fields, prompt.hash))
+
+
+def _literal(value: Any) -> str:
+    # Manifest data is JSON, whose Python repr is a valid literal except for the
+    # NaN and Infinity floats json accepts; those repr as bare names.
+    if isinstance(value, float) and not math.isfinite(value):
+        return f"float({str(value)!r})"
+    if isinstance(value, dict):
+        items = cast(dict[Any, Any], value).items()
+        return "{" + ", ".join(f"{_literal(k)}: {_literal(v)}" for k, v in items) + "}"
+    if isinstance(value, list):
+        return "[" + ", ".join(_literal(item) for item in cast(list[Any], value)) + "]"
+    if isinstance(value, tuple):
+        items = [_literal(item) for item in cast(tuple[Any, ...], value)]
+        return "(" + ", ".join(items) + ("," if len(items) == 1 else "") + ")"
+    return repr(value)
+
+
+def _simple_function(name: str, label: str, template: str) -> str:
+    plan = compile_simple(template)
+    if len(plan) == 1:
+        return f"def {name}(values):  # {label!r}\n    return {plan[0]!r}\n\n\n"
+    parts: list[str] = []
+    for index, part in enumerate(plan):
+        if index % 2:
+            parts.append(f"{{get({part!r}, '')}}")
+        else:
+            parts.append(_fstring_text(part))
+    body = "".join(parts)
+    return f'def {name}(values):  # {label!r}\n    get = values.get\n    return f"{body}"\n\n\n'
+
+
+def _fstring_text(text: str) -> str:
+    # JSON string escapes are valid Python escapes and always use double quotes.
+    escaped = json.dumps(text, ensure_ascii=False)[1:-1]
+    return escaped.replace("{", "{{").replace("}", "}}")
+
+
+def _dict_literal(name: str, lines: list[str]) -> str:
+    if not lines:
+        return f"{name} = {{}}\n\n"
+    return f"{name} = {{\n" + "\n".join(lines) + "\n}\n\n"
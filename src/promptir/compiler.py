@@ -6,20 +6,33 @@ import hashlib
 import json
 import os
 import re
-from collections.abc import Iterable
+from collections.abc import Iterable, Sequence
+from contextlib import ExitStack
 from dataclasses import asdict
+from itertools import repeat
 from pathlib import Path
-from typing import Any, cast
-
-from jinja2 import Environment, meta
+from types import CodeType
+from typing import Any, TypeGuard, cast
 
 from promptir.errors import PromptCompileError
+from promptir.manifest import (
+    MANIFEST_FORMATS,
+    ManifestFormat,
+    encode_manifest,
+    message_content,
+)
 from promptir.models import BlockSpec, PromptMessage
+from promptir.tracing import Tracer, get_tracer, span
 
 _VARIABLE_PATTERN = re.compile(r"{{\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*}}")
 _VARIABLE_NAME_PATTERN = re.compile(r"^[a-z][a-z0-9_]*$")
 _BLOCK_NAME_PATTERN = re.compile(r"^_[a-z][a-z0-9_]*$")
 _ALLOWED_ENGINES = {"simple", "jinja2_sandbox"}
+# Bump whenever compiled entries change shape so stale build caches are ignored.
+_BUILD_CACHE_VERSION = 1
+_MANIFEST_ENTRY_KEYS = frozenset(
+    {"id", "version", "metadata", "template_engine", "variables", "blocks", "messages", "hash"}
+)
 
 
 class PromptDocument:
@@ -28,60 +41,360 @@ class PromptDocument:
         self.sections = sections
 
 
-def compile_prompts(src_root: str, out_path: str) -> dict[str, Any]:
-    """Compile prompts from src_root into a manifest written to out_path."""
+def compile_prompts(
+    src_root: str,
+    out_path: str,
+    *,
+    cache_path: str | None = None,
+    workers: int | None = None,
+    manifest_format: ManifestFormat = "json",
+    dedupe_includes: bool = False,
+    jinja2_cache_path: str | None = None,
+) -> dict[str, Any]:
+    """Compile prompts from src_root into a manifest written to out_path.
+
+    With ``cache_path``, a build cache records each prompt file's content hash, the
+    hashes of the include files it pulled in and its compiled entry. Prompts whose
+    file and includes are unchanged reuse the cached entry instead of being parsed
+    and validated again; the cache is rewritten after a successful compile.
+
+    With ``workers`` greater than one, prompts are parsed and validated in a process
+    pool. Results are consumed in file order, so the manifest, duplicate detection
+    and the error raised for a broken tree are the same as for a serial compile.
+
+    ``manifest_format`` selects the JSON manifest or the compact binary encoding
+    from ``promptir.manifest``; ``PromptRegistry.from_manifest_path`` reads both.
+
+    With ``dedupe_includes``, include text merged into messages is stored once in a
+    content-addressed ``contents`` table and messages refer to it by digest. Prompt
+    hashes are computed before this step and are unchanged.
+
+    With ``jinja2_cache_path``, jinja2_sandbox templates are also compiled to code
+    objects in a sidecar file that ``PromptRegistry.from_manifest_path`` can load
+    instead of parsing template source; see ``write_jinja2_cache``.
+
+    With a tracer installed (``promptir.tracing.set_tracer``), the plan, prompt,
+    assemble and write phases are reported as spans under ``promptir.compile``.
+    """
+    if workers is not None and workers < 1:
+        raise PromptCompileError(f"workers must be at least 1, got {workers}")
+    if manifest_format not in MANIFEST_FORMATS:
+        raise PromptCompileError(f"Unknown manifest format: {manifest_format}")
     src_path = Path(src_root)
     if not src_path.exists():
         raise PromptCompileError(f"Source root not found: {src_root}")
 
-    prompt_files = _collect_prompt_files(src_path)
-    prompts: list[dict[str, Any]] = []
+    tracer = get_tracer()
+    with span(
+        tracer,
+        "promptir.compile",
+        {"promptir.src_root": src_root, "promptir.format": manifest_format},
+    ):
+        return _compile_tree(
+            src_path,
+            out_path,
+            cache_path=cache_path,
+            workers=workers,
+            manifest_format=manifest_format,
+            dedupe_includes=dedupe_includes,
+            jinja2_cache_path=jinja2_cache_path,
+            tracer=tracer,
+        )
+
+
+def write_jinja2_cache(manifest: dict[str, Any], out_path: str) -> int:
+    """Compile every jinja2_sandbox message in ``manifest`` into a bytecode sidecar.
+
+    Code objects are keyed by ``(prompt hash, role)`` and loaded by
+    ``PromptRegistry.from_manifest_path(jinja2_cache_path=...)``. Entries already in
+    the file at ``out_path`` are reused for unchanged hashes, so only edited templates
+    are parsed again. The file is replaced atomically; returns the number of templates.
+    """
+    from promptir.render_jinja2 import (
+        compile_jinja2_code,
+        create_sandbox_environment,
+        decode_jinja2_cache,
+        encode_jinja2_cache,
+    )
+
+    path = Path(out_path)
+    try:
+        previous = decode_jinja2_cache(path.read_bytes())
+    except OSError:
+        previous = {}
+    contents: dict[str, str] = manifest.get("contents", {})
+    env = None
+    codes: dict[tuple[str, str], CodeType] = {}
+    for entry in manifest.get("prompts", []):
+        if entry["template_engine"] != "jinja2_sandbox":
+            continue
+        for message in entry["messages"]:
+            key = (entry["hash"], message["role"])
+            code = previous.get(key)
+            if code is None:
+                if env is None:
+                    env = create_sandbox_environment()
+                code = compile_jinja2_code(env, message_content(message, contents))
+            codes[key] = code
+    write_atomic(path, encode_jinja2_cache(codes))
+    return len(codes)
+
+
+def _compile_tree(
+    src_path: Path,
+    out_path: str,
+    *,
+    cache_path: str | None,
+    workers: int | None,
+    manifest_format: ManifestFormat,
+    dedupe_includes: bool,
+    jinja2_cache_path: str | None,
+    tracer: Tracer | None,
+) -> dict[str, Any]:
+    prompt_files = collect_prompt_files(src_path)
+    build_cache = _load_build_cache(cache_path) if cache_path else {}
+    new_cache: dict[str, Any] = {}
+    include_digests: dict[str, str | None] = {}
+    compiled_files: list[tuple[Path, dict[str, Any], list[str]]] = []
     seen: set[tuple[str, str]] = set()
 
-    for prompt_file in prompt_files:
-        prompt_doc = _load_prompt_document(prompt_file, src_path, is_include=False)
-        frontmatter = prompt_doc.frontmatter
-        includes = frontmatter.get("includes", [])
-        merged_sections = dict(prompt_doc.sections)
-        for include_ref in includes:
-            include_doc = _load_include_document(src_path, include_ref)
-            for role, content in include_doc.sections.items():
-                existing = merged_sections.get(role, "")
-                merged_sections[role] = _merge_role_content(content, existing)
-
-        _ensure_required_roles(prompt_file, merged_sections)
-        variables = _validate_variables(frontmatter, prompt_file)
-        blocks = _validate_blocks(frontmatter, prompt_file)
-        template_engine = frontmatter.get("template_engine", "simple")
-        _validate_template_engine(template_engine, prompt_file)
-
-        _validate_declared_names(variables, blocks, prompt_file)
-        used_names = _extract_used_names(template_engine, merged_sections)
-        _validate_used_names(used_names, variables, blocks, prompt_file)
-
-        prompt_id = frontmatter["id"]
-        version = frontmatter["version"]
-        if (prompt_id, version) in seen:
-            raise PromptCompileError(
-                f"Duplicate prompt id/version: {prompt_id}@{version} in {prompt_file}"
+    # Without a cache_path nothing is digested: uncached builds read each file once.
+    planned: list[tuple[Path, str, str | None, dict[str, Any] | None]] = []
+    with span(tracer, "promptir.compile.plan", {"promptir.files": len(prompt_files)}):
+        for prompt_file in prompt_files:
+            rel_path = prompt_file.relative_to(src_path).as_posix()
+            if not cache_path:
+                planned.append((prompt_file, rel_path, None, None))
+                continue
+            file_digest = _file_digest(prompt_file)
+            cached = build_cache.get(rel_path)
+            if cached is not None and not _is_cache_entry_fresh(
+                cached, file_digest, src_path, include_digests
+            ):
+                cached = None
+            planned.append((prompt_file, rel_path, file_digest, cached))
+
+    pending = [prompt_file for prompt_file, _, _, cached in planned if cached is None]
+    include_table: dict[str, PromptDocument] = {}
+    with (
+        span(
+            tracer,
+            "promptir.compile.prompts",
+            {"promptir.pending": len(pending), "promptir.workers": workers or 1},
+        ),
+        ExitStack() as stack,
+    ):
+        if workers is not None and workers > 1 and len(pending) > 1:
+            from concurrent.futures import ProcessPoolExecutor
+
+            executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_compile_worker)
+            stack.callback(executor.shutdown, wait=True, cancel_futures=True)
+            chunksize = max(1, len(pending) // (workers * 4))
+            compiled = executor.map(
+                _compile_prompt_file_in_worker,
+                pending,
+                repeat(src_path),
+                chunksize=chunksize,
+            )
+        else:
+            compiled = (
+                _compile_prompt_file_traced(prompt_file, src_path, include_table, tracer)
+                for prompt_file in pending
             )
-        seen.add((prompt_id, version))
-
-        prompt_entry = _build_prompt_entry(
-            frontmatter,
-            variables,
-            blocks,
-            template_engine,
-            merged_sections,
-        )
-        prompts.append(prompt_entry)
 
-    manifest = {"schema_version": 1, "prompts": prompts}
-    _write_manifest(out_path, manifest)
+        for prompt_file, rel_path, file_digest, cached in planned:
+            if cached is not None:
+                prompt_entry = cached["entry"]
+                includes = cached["includes"]
+                include_refs = list(includes)
+            else:
+                prompt_entry, include_refs = next(compiled)
+                includes = None
+
+            # Checked here as well so a duplicate is reported before later files compile.
+            _check_duplicate(seen, prompt_entry, prompt_file)
+            compiled_files.append((prompt_file, prompt_entry, include_refs))
+            if file_digest is not None:
+                if includes is None:
+                    includes = {
+                        ref: _include_digest(src_path, ref, include_digests) for ref in include_refs
+                    }
+                new_cache[rel_path] = {
+                    "sha256": file_digest,
+                    "includes": includes,
+                    "entry": prompt_entry,
+                }
+
+    with span(tracer, "promptir.compile.assemble", {"promptir.prompts": len(compiled_files)}):
+        manifest = assemble_manifest(
+            compiled_files, src_path, include_table, dedupe_includes=dedupe_includes
+        )
+    with span(tracer, "promptir.compile.write", {"promptir.format": manifest_format}):
+        write_manifest(out_path, manifest, manifest_format)
+        if cache_path:
+            _write_build_cache(cache_path, new_cache)
+        if jinja2_cache_path:
+            write_jinja2_cache(manifest, jinja2_cache_path)
     return manifest
 
 
-def _collect_prompt_files(src_path: Path) -> list[Path]:
+def _compile_prompt_file_traced(
+    prompt_file: Path,
+    src_path: Path,
+    include_table: dict[str, PromptDocument],
+    tracer: Tracer | None,
+) -> tuple[dict[str, Any], list[str]]:
+    if tracer is None:
+        return compile_prompt_file(prompt_file, src_path, include_table)
+    attributes = {
+        "promptir.path": prompt_file.relative_to(src_path).as_posix(),
+        "promptir.input.bytes": prompt_file.stat().st_size,
+    }
+    with span(tracer, "promptir.compile.file", attributes):
+        return compile_prompt_file(prompt_file, src_path, include_table)
+
+
+def assemble_manifest(
+    compiled_files: Sequence[tuple[Path, dict[str, Any], Sequence[str]]],
+    src_path: Path,
+    include_table: dict[str, PromptDocument],
+    *,
+    dedupe_includes: bool = False,
+) -> dict[str, Any]:
+    """Build a manifest from ``(prompt file, entry, include refs)`` in file order.
+
+    Raises ``PromptCompileError`` when two files declare the same id and version.
+    """
+    seen: set[tuple[str, str]] = set()
+    for prompt_file, entry, _ in compiled_files:
+        _check_duplicate(seen, entry, prompt_file)
+    prompts = [entry for _, entry, _ in compiled_files]
+    if dedupe_includes:
+        prompt_includes = [list(include_refs) for _, _, include_refs in compiled_files]
+        return _dedupe_include_content(prompts, prompt_includes, src_path, include_table)
+    return {"schema_version": 1, "prompts": prompts}
+
+
+def _dedupe_include_content(
+    prompts: list[dict[str, Any]],
+    prompt_includes: list[list[str]],
+    src_path: Path,
+    include_table: dict[str, PromptDocument],
+) -> dict[str, Any]:
+    """Build a schema 2 manifest whose messages refer to shared include bodies by digest.
+
+    Merged messages are ``"\n\n".join`` of the stripped include sections followed by
+    the prompt's own text, so leading include bodies are peeled off as ``{"ref": ...}``
+    parts and whatever remains is kept as a ``{"text": ...}`` part.
+    """
+    contents: dict[str, str] = {}
+    deduped: list[dict[str, Any]] = []
+    for entry, include_refs in zip(prompts, prompt_includes, strict=True):
+        bodies_by_role: dict[str, list[str]] = {}
+        for include_ref in include_refs:
+            include_doc = _resolve_include(src_path, include_ref, include_table)
+            for role, content in include_doc.sections.items():
+                if content:
+                    bodies_by_role.setdefault(role, []).append(content)
+        messages: list[dict[str, Any]] = []
+        for message in entry["messages"]:
+            bodies = sorted(bodies_by_role.get(message["role"], []), key=len, reverse=True)
+            parts = _split_include_parts(message["content"], bodies)
+            if parts is None:
+                messages.append(message)
+                continue
+            refs: list[dict[str, str]] = []
+            for body, is_include in parts:
+                if is_include:
+                    digest = hashlib.sha256(body.encode("utf-8")).hexdigest()
+                    contents[digest] = body
+                    refs.append({"ref": digest})
+                else:
+                    refs.append({"text": body})
+            messages.append({"role": message["role"], "parts": refs})
+        deduped.append({**entry, "messages": messages})
+    return {"schema_version": 2, "contents": contents, "prompts": deduped}
+
+
+def _split_include_parts(content: str, bodies: list[str]) -> list[tuple[str, bool]] | None:
+    parts: list[tuple[str, bool]] = []
+    rest = content
+    while rest:
+        for body in bodies:
+            if rest == body or rest.startswith(body + "\n\n"):
+                parts.append((body, True))
+                rest = rest[len(body) + 2 :]
+                break
+        else:
+            parts.append((rest, False))
+            break
+    return parts if any(is_include for _, is_include in parts) else None
+
+
+def _check_duplicate(
+    seen: set[tuple[str, str]], prompt_entry: dict[str, Any], prompt_file: Path
+) -> None:
+    prompt_id = prompt_entry["id"]
+    version = prompt_entry["version"]
+    if (prompt_id, version) in seen:
+        raise PromptCompileError(
+            f"Duplicate prompt id/version: {prompt_id}@{version} in {prompt_file}"
+        )
+    seen.add((prompt_id, version))
+
+
+_WORKER_INCLUDE_TABLE: dict[str, PromptDocument] = {}
+
+
+def _init_compile_worker() -> None:
+    _WORKER_INCLUDE_TABLE.clear()
+
+
+def _compile_prompt_file_in_worker(
+    prompt_file: Path, src_path: Path
+) -> tuple[dict[str, Any], list[str]]:
+    return compile_prompt_file(prompt_file, src_path, _WORKER_INCLUDE_TABLE)
+
+
+def compile_prompt_file(
+    prompt_file: Path, src_path: Path, include_table: dict[str, PromptDocument]
+) -> tuple[dict[str, Any], list[str]]:
+    """Parse and validate one prompt file; return its manifest entry and include refs.
+
+    ``include_table`` caches parsed includes by reference across calls.
+    """
+    prompt_doc = _load_prompt_document(prompt_file, src_path, is_include=False)
+    frontmatter = prompt_doc.frontmatter
+    includes = frontmatter.get("includes", [])
+    merged_sections = dict(prompt_doc.sections)
+    for include_ref in includes:
+        include_doc = _resolve_include(src_path, include_ref, include_table)
+        for role, content in include_doc.sections.items():
+            existing = merged_sections.get(role, "")
+            merged_sections[role] = _merge_role_content(content, existing)
+
+    _ensure_required_roles(prompt_file, merged_sections)
+    variables = _validate_variables(frontmatter, prompt_file)
+    blocks = _validate_blocks(frontmatter, prompt_file)
+    template_engine = frontmatter.get("template_engine", "simple")
+    _validate_template_engine(template_engine, prompt_file)
+
+    _validate_declared_names(variables, blocks, prompt_file)
+    used_names = _extract_used_names(template_engine, merged_sections, prompt_file)
+    _validate_used_names(used_names, variables, blocks, prompt_file)
+
+    prompt_entry = _build_prompt_entry(
+        frontmatter,
+        variables,
+        blocks,
+        template_engine,
+        merged_sections,
+    )
+    return prompt_entry, list(includes)
+
+
+def collect_prompt_files(src_path: Path) -> list[Path]:
+    """Return the prompt files under ``src_path`` in compile order, skipping includes."""
     prompt_files: list[Path] = []
     for root, dirs, files in os.walk(src_path):
         if "_includes" in dirs:
@@ -92,6 +405,17 @@ def _collect_prompt_files(src_path: Path) -> list[Path]:
     return sorted(prompt_files)
 
 
+def _resolve_include(
+    src_path: Path, include_ref: str, include_table: dict[str, PromptDocument]
+) -> PromptDocument:
+    """Load an include once per compile run and share the parsed document."""
+    include_doc = include_table.get(include_ref)
+    if include_doc is None:
+        include_doc = _load_include_document(src_path, include_ref)
+        include_table[include_ref] = include_doc
+    return include_doc
+
+
 def _load_include_document(src_path: Path, include_ref: str) -> PromptDocument:
     if "@" not in include_ref:
         raise PromptCompileError(f"Invalid include reference: {include_ref}")
@@ -111,7 +435,10 @@ def _load_prompt_document(path: Path, src_path: Path, is_include: bool) -> Promp
 
 
 def _parse_frontmatter(path: Path) -> tuple[dict[str, Any], str]:
-    text = path.read_text(encoding="utf-8")
+    try:
+        text = path.read_text(encoding="utf-8")
+    except (OSError, UnicodeDecodeError) as exc:
+        raise PromptCompileError(f"Cannot read {path}: {exc}") from exc
     lines = text.splitlines()
     if not lines or lines[0].strip() != "---":
         raise PromptCompileError(f"Missing frontmatter delimiter in {path}")
@@ -248,12 +575,19 @@ def _validate_declared_names(
         raise PromptCompileError(f"Variables and blocks overlap in {path}: {sorted(overlap)}")
 
 
-def _extract_used_names(template_engine: str, sections: dict[str, str]) -> set[str]:
+def _extract_used_names(template_engine: str, sections: dict[str, str], path: Path) -> set[str]:
     merged_text = "\n".join(sections.values())
     if template_engine == "simple":
         return set(_VARIABLE_PATTERN.findall(merged_text))
+    from jinja2 import Environment, TemplateSyntaxError, meta
+
     env = Environment()
-    ast = cast(Any, env.parse(merged_text))
+    try:
+        ast = cast(Any, env.parse(merged_text))
+    except TemplateSyntaxError as exc:
+        raise PromptCompileError(
+            f"Invalid jinja2 template in {path} (line {exc.lineno}): {exc.message}"
+        ) from exc
     undeclared = cast(Iterable[str], meta.find_undeclared_variables(ast))
     return set(undeclared)
 
@@ -323,7 +657,84 @@ def _hash_prompt(prompt_data: dict[str, Any]) -> str:
     return hashlib.sha256(canonical_json.encode("utf-8")).hexdigest()
 
 
-def _write_manifest(out_path: str, manifest: dict[str, Any]) -> None:
-    output_path = Path(out_path)
-    output_path.parent.mkdir(parents=True, exist_ok=True)
-    output_path.write_text(json.dumps(manifest, indent=2, sort_keys=True) + "\n", encoding="utf-8")
+def _file_digest(path: Path) -> str:
+    return hashlib.sha256(path.read_bytes()).hexdigest()
+
+
+def _include_digest(src_path: Path, include_ref: str, digests: dict[str, str | None]) -> str | None:
+    if include_ref not in digests:
+        name, _, version = include_ref.partition("@")
+        include_path = src_path / "_includes" / name / f"{version}.md"
+        digests[include_ref] = _file_digest(include_path) if include_path.is_file() else None
+    return digests[include_ref]
+
+
+def _is_cache_entry_fresh(
+    cached: object,
+    file_digest: str,
+    src_path: Path,
+    include_digests: dict[str, str | None],
+) -> bool:
+    if not _is_cache_entry(cached) or cached["sha256"] != file_digest:
+        return False
+    includes: dict[str, str | None] = cached["includes"]
+    return all(
+        digest is not None and _include_digest(src_path, ref, include_digests) == digest
+        for ref, digest in includes.items()
+    )
+
+
+def _is_cache_entry(cached: object) -> TypeGuard[dict[str, Any]]:
+    """Check the shape ``_compile_tree`` writes; anything else is treated as a miss."""
+    if not isinstance(cached, dict):
+        return False
+    typed: dict[str, Any] = cached
+    includes = typed.get("includes")
+    entry = typed.get("entry")
+    return (
+        isinstance(typed.get("sha256"), str)
+        and isinstance(includes, dict)
+        and all(
+            digest is None or isinstance(digest, str)
+            for digest in cast(dict[str, Any], includes).values()
+        )
+        and isinstance(entry, dict)
+        and _MANIFEST_ENTRY_KEYS.issubset(cast(dict[str, Any], entry))
+    )
+
+
+def _load_build_cache(cache_path: str) -> dict[str, Any]:
+    path = Path(cache_path)
+    try:
+        data = json.loads(path.read_text(encoding="utf-8"))
+    except (OSError, ValueError):
+        return {}
+    if not isinstance(data, dict) or data.get("cache_version") != _BUILD_CACHE_VERSION:
+        return {}
+    prompts = data.get("prompts")
+    return prompts if isinstance(prompts, dict) else {}
+
+
+def _write_build_cache(cache_path: str, prompts: dict[str, Any]) -> None:
+    data = {"cache_version": _BUILD_CACHE_VERSION, "prompts": prompts}
+    encoded = json.dumps(data, sort_keys=True, separators=(",", ":")).encode("utf-8")
+    write_atomic(cache_path, encoded)
+
+
+def write_manifest(
+    out_path: str, manifest: dict[str, Any], manifest_format: ManifestFormat = "json"
+) -> None:
+    """Encode ``manifest`` and replace ``out_path`` atomically."""
+    write_atomic(out_path, encode_manifest(manifest, manifest_format))
+
+
+def write_atomic(path: str | Path, data: bytes) -> None:
+    """Write data next to path and rename it into place so readers never see a partial file."""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(f".{path.name}.{os.getpid()}.tmp")
+    try:
+        tmp_path.write_bytes(data)
+        os.replace(tmp_path, path)
+    finally:
+        tmp_path.unlink(missing_ok=True)
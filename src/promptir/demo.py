@@ -20,13 +20,9 @@ def render_demo(manifest_path: str, data_path: str) -> list[dict[str, Any]]:
             raise ValueError("Demo entry 'version' must be a string when provided.")
         vars_payload = _require_dict(entry, "vars")
         blocks_payload = _require_dict(entry, "blocks")
-        prompt = registry._get_prompt(prompt_id, version)
-        rendered = registry.render(
-            prompt_id,
-            version=version,
-            vars=vars_payload,
-            blocks=blocks_payload,
-        )
+        prepared = registry.prepare(prompt_id, version=version)
+        prompt = prepared.prompt
+        rendered = prepared.render(vars_payload, blocks_payload)
         results.append(
             {
                 "id": prompt.id,
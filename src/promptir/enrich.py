@@ -2,28 +2,560 @@
 
 from __future__ import annotations
 
-from collections.abc import Callable
-from dataclasses import dataclass
+import inspect
+import threading
+import time
+from collections.abc import Awaitable, Callable, Iterable, Sequence
+from dataclasses import dataclass, field, replace
+from typing import TYPE_CHECKING
 
+from promptir.cache import LRUCache, digest_values
+from promptir.errors import PromptEnrichmentError
+from promptir.metrics import RenderMetrics
 from promptir.models import PromptDefinition
+from promptir.tracing import SpanAttributes, bind_context, get_tracer, prompt_attributes, span
+
+# asyncio and concurrent.futures are imported where they are used: most renders
+# never reach the async or threaded paths, and both are slow to import.
+if TYPE_CHECKING:
+    from concurrent.futures import ThreadPoolExecutor
 
 Enricher = Callable[[PromptDefinition, dict[str, str], dict[str, str]], dict[str, str]]
+AsyncEnricher = Callable[
+    [PromptDefinition, dict[str, str], dict[str, str]], Awaitable[dict[str, str]]
+]
+Stages = tuple[tuple["EnricherSpec", ...], ...]
+EnrichmentCacheKey = tuple[str, str, str]
+# Updates returned by one enricher; None when it timed out (or is not computed yet).
+StageResult = dict[str, str] | None
+
+
+@dataclass(frozen=True)
+class EnricherSpec:
+    """An enricher with the names it reads and the blocks it writes.
+
+    ``reads`` covers both vars and blocks. ``None`` means undeclared: the enricher
+    may read every block (or only the input blocks in a concurrent pipeline) and
+    may write any block. ``timeout`` (seconds) overrides the pipeline deadline and
+    ``cacheable=False`` keeps the enricher out of the pipeline's result cache.
+    """
+
+    func: Enricher | AsyncEnricher
+    reads: frozenset[str] | None = None
+    writes: frozenset[str] | None = None
+    name: str = ""
+    timeout: float | None = None
+    cacheable: bool = True
+
+    def __post_init__(self) -> None:
+        if not self.name:
+            object.__setattr__(self, "name", _enricher_name(self.func))
+
+    @property
+    def is_async(self) -> bool:
+        # Objects with ``async def __call__`` are coroutine callables as well.
+        func = self.func
+        return inspect.iscoroutinefunction(func) or inspect.iscoroutinefunction(type(func).__call__)
+
+
+def enricher(
+    *,
+    reads: Iterable[str] | None = None,
+    writes: Iterable[str] | None = None,
+    name: str = "",
+    timeout: float | None = None,
+    cacheable: bool = True,
+) -> Callable[[Enricher | AsyncEnricher], EnricherSpec]:
+    """Decorate an enricher with the names it reads and the blocks it writes."""
+
+    def decorate(func: Enricher | AsyncEnricher) -> EnricherSpec:
+        return EnricherSpec(
+            func,
+            reads=frozenset(reads) if reads is not None else None,
+            writes=frozenset(writes) if writes is not None else None,
+            name=name,
+            timeout=timeout,
+            cacheable=cacheable,
+        )
+
+    return decorate
+
+
+@dataclass(frozen=True)
+class EnricherStats:
+    calls: int = 0
+    timeouts: int = 0
+    total_seconds: float = 0.0
+    max_seconds: float = 0.0
 
 
 @dataclass
 class EnrichmentPipeline:
-    enrichers: list[Enricher]
+    """Runs enrichers as a dependency graph built from their declared reads/writes.
+
+    Enrichers are grouped into stages; an enricher lands in a later stage than any
+    earlier enricher whose writes it reads. Enrichers in one stage see the same
+    blocks and their updates are merged in list order, which gives the same result
+    as running the list sequentially. Enrichers whose declared writes miss every
+    block of the prompt are skipped. ``max_workers`` runs synchronous enrichers of
+    a stage on a thread pool; ``aapply`` gathers coroutine enrichers of a stage.
+    Stages are computed on first use for each prompt, so build a new pipeline
+    rather than mutating ``enrichers`` afterwards. Different functions that share a
+    name (two lambdas, or two closures from one factory) are told apart by a
+    ``#<n>`` suffix on later ones, which ``stats()``, metrics and cache keys use.
+
+    ``timeout`` is the default deadline (seconds from the start of its stage) for
+    each enricher. An enricher that overruns it is abandoned and its updates are
+    dropped, so its blocks keep their pre-enrichment values, i.e. the manifest
+    defaults unless the caller supplied them. Timed enrichers run on the thread
+    pool (or under ``asyncio.wait_for``); ``stats()`` reports per-enricher timings.
+    Threads cannot be interrupted, so an abandoned enricher keeps its pool slot
+    until it returns; enrichers that hang can fill the pool and stall later stages.
+    ``close()`` (or using the pipeline as a context manager) shuts the pool down.
+
+    With a ``cache``, enricher results are reused for identical inputs: the key is
+    the prompt hash, the enricher name and a digest of the vars and blocks the
+    enricher declares in ``reads`` (all of them when undeclared). Caches are local
+    to the process and are not pickled with the pipeline; give enrichers distinct
+    names before sharing one cache between pipelines.
+    """
+
+    enrichers: list[Enricher | AsyncEnricher | EnricherSpec]
+    concurrent: bool = False
+    max_workers: int | None = None
+    timeout: float | None = None
+    cache: LRUCache[EnrichmentCacheKey, dict[str, str]] | None = field(default=None, compare=False)
+    _stages: dict[str, Stages] = field(default_factory=dict, init=False, repr=False, compare=False)
+    _executor: ThreadPoolExecutor | None = field(
+        default=None, init=False, repr=False, compare=False
+    )
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, repr=False, compare=False
+    )
+    _stats: dict[str, EnricherStats] = field(
+        default_factory=dict, init=False, repr=False, compare=False
+    )
+
+    def __getstate__(self) -> dict[str, object]:
+        state = dict(self.__dict__)
+        state["_stages"] = {}
+        state["_executor"] = None
+        state["_stats"] = {}
+        state["cache"] = None
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state: dict[str, object]) -> None:
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
+
+    def __enter__(self) -> EnrichmentPipeline:
+        return self
+
+    def __exit__(self, *exc_info: object) -> None:
+        self.close()
+
+    def close(self) -> None:
+        """Shut down the thread pool without waiting for abandoned enricher calls.
+
+        Queued calls are cancelled. A later threaded stage starts a new pool.
+        """
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
 
     def apply(
         self,
         prompt: PromptDefinition,
         vars: dict[str, str],
         blocks: dict[str, str],
+        *,
+        metrics: RenderMetrics | None = None,
     ) -> dict[str, str]:
-        """Apply enrichers sequentially, returning an updated blocks dict."""
+        """Apply enrichers stage by stage, returning an updated blocks dict.
+
+        ``metrics`` additionally receives each enricher call's duration for this prompt.
+        """
         enriched = dict(blocks)
-        for enricher in self.enrichers:
-            updates = enricher(prompt, vars, dict(enriched))
-            if updates:
-                enriched.update(updates)
+        stages = self.stages_for(prompt)
+        tracer = get_tracer()
+        if tracer is None:
+            for stage in stages:
+                self._apply_stage(stage, prompt, vars, enriched, metrics)
+            return enriched
+        with span(tracer, "promptir.enrich", prompt_attributes(prompt)):
+            for index, stage in enumerate(stages):
+                with span(tracer, "promptir.enrich.stage", _stage_attributes(index, stage)):
+                    self._apply_stage(stage, prompt, vars, enriched, metrics)
         return enriched
+
+    async def aapply(
+        self,
+        prompt: PromptDefinition,
+        vars: dict[str, str],
+        blocks: dict[str, str],
+        *,
+        metrics: RenderMetrics | None = None,
+    ) -> dict[str, str]:
+        """Apply enrichers stage by stage, running each stage's enrichers concurrently.
+
+        Synchronous enrichers run inline on the event loop unless ``max_workers`` is
+        set, in which case they run on the pipeline's thread pool.
+        """
+        enriched = dict(blocks)
+        stages = self.stages_for(prompt)
+        tracer = get_tracer()
+        if tracer is None:
+            for stage in stages:
+                await self._aapply_stage(stage, prompt, vars, enriched, metrics)
+            return enriched
+        with span(tracer, "promptir.enrich", prompt_attributes(prompt)):
+            for index, stage in enumerate(stages):
+                with span(tracer, "promptir.enrich.stage", _stage_attributes(index, stage)):
+                    await self._aapply_stage(stage, prompt, vars, enriched, metrics)
+        return enriched
+
+    def stages_for(self, prompt: PromptDefinition) -> Stages:
+        """Return the enricher stages for a prompt, built once per prompt hash."""
+        stages = self._stages.get(prompt.hash)
+        if stages is None:
+            specs = _unique_names([_as_spec(item) for item in self.enrichers])
+            stages = _build_stages(specs, frozenset(prompt.blocks), self.concurrent)
+            self._stages[prompt.hash] = stages
+        return stages
+
+    def stats(self) -> dict[str, EnricherStats]:
+        """Return a snapshot of per-enricher call counts, timeouts and timings."""
+        with self._lock:
+            return dict(self._stats)
+
+    def _apply_stage(
+        self,
+        stage: tuple[EnricherSpec, ...],
+        prompt: PromptDefinition,
+        vars: dict[str, str],
+        enriched: dict[str, str],
+        metrics: RenderMetrics | None,
+    ) -> None:
+        keys, results = self._lookup_cached(stage, prompt, vars, enriched)
+        pending = tuple(spec for spec, result in zip(stage, results, strict=True) if result is None)
+        if pending:
+            if self._needs_threads(pending):
+                fresh = self._run_stage_threaded(pending, prompt, vars, enriched, metrics)
+            else:
+                fresh = [
+                    self._call_inline(spec, prompt, vars, dict(enriched), metrics)
+                    for spec in pending
+                ]
+            self._store_fresh(keys, results, fresh)
+        _merge_updates(enriched, stage, results, prompt)
+
+    async def _aapply_stage(
+        self,
+        stage: tuple[EnricherSpec, ...],
+        prompt: PromptDefinition,
+        vars: dict[str, str],
+        enriched: dict[str, str],
+        metrics: RenderMetrics | None,
+    ) -> None:
+        keys, results = self._lookup_cached(stage, prompt, vars, enriched)
+        pending = tuple(spec for spec, result in zip(stage, results, strict=True) if result is None)
+        if pending:
+            import asyncio
+
+            fresh = await asyncio.gather(
+                *(self._call_async(spec, prompt, vars, dict(enriched), metrics) for spec in pending)
+            )
+            self._store_fresh(keys, results, fresh)
+        _merge_updates(enriched, stage, results, prompt)
+
+    def _lookup_cached(
+        self,
+        stage: tuple[EnricherSpec, ...],
+        prompt: PromptDefinition,
+        vars: dict[str, str],
+        blocks: dict[str, str],
+    ) -> tuple[list[EnrichmentCacheKey | None], list[StageResult]]:
+        cache = self.cache
+        if cache is None:
+            return [None] * len(stage), [None] * len(stage)
+        keys: list[EnrichmentCacheKey | None] = []
+        results: list[StageResult] = []
+        for spec in stage:
+            if not spec.cacheable:
+                keys.append(None)
+                results.append(None)
+                continue
+            key = (prompt.hash, spec.name, digest_values(vars, blocks, names=spec.reads))
+            keys.append(key)
+            results.append(cache.get(key))
+        return keys, results
+
+    def _store_fresh(
+        self,
+        keys: list[EnrichmentCacheKey | None],
+        results: list[StageResult],
+        fresh: Sequence[StageResult],
+    ) -> None:
+        pending = iter(fresh)
+        for index, result in enumerate(results):
+            if result is not None:
+                continue
+            updates = next(pending)
+            results[index] = updates
+            key = keys[index]
+            if key is not None and updates is not None and self.cache is not None:
+                self.cache.put(key, updates)
+
+    def _timeout_for(self, spec: EnricherSpec) -> float | None:
+        return spec.timeout if spec.timeout is not None else self.timeout
+
+    def _needs_threads(self, stage: tuple[EnricherSpec, ...]) -> bool:
+        if len(stage) > 1 and self.max_workers:
+            return True
+        return any(self._timeout_for(spec) is not None for spec in stage)
+
+    def _call_inline(
+        self,
+        spec: EnricherSpec,
+        prompt: PromptDefinition,
+        vars: dict[str, str],
+        blocks: dict[str, str],
+        metrics: RenderMetrics | None,
+    ) -> dict[str, str]:
+        updates, elapsed = _call_sync_timed(spec, prompt, vars, blocks)
+        self._record(spec, prompt, metrics, elapsed, timed_out=False)
+        return updates
+
+    def _run_stage_threaded(
+        self,
+        stage: tuple[EnricherSpec, ...],
+        prompt: PromptDefinition,
+        vars: dict[str, str],
+        blocks: dict[str, str],
+        metrics: RenderMetrics | None,
+    ) -> list[StageResult]:
+        from concurrent.futures import TimeoutError as FutureTimeoutError
+
+        executor = self._get_executor()
+        started = time.perf_counter()
+        futures = [
+            executor.submit(bind_context(_call_sync_timed), spec, prompt, vars, dict(blocks))
+            for spec in stage
+        ]
+        results: list[StageResult] = []
+        for spec, future in zip(stage, futures, strict=True):
+            timeout = self._timeout_for(spec)
+            if timeout is None:
+                updates, elapsed = future.result()
+            else:
+                remaining = max(0.0, started + timeout - time.perf_counter())
+                try:
+                    updates, elapsed = future.result(timeout=remaining)
+                except FutureTimeoutError:
+                    future.cancel()
+                    elapsed = time.perf_counter() - started
+                    self._record(spec, prompt, metrics, elapsed, timed_out=True)
+                    results.append(None)
+                    continue
+            self._record(spec, prompt, metrics, elapsed, timed_out=False)
+            results.append(updates)
+        return results
+
+    async def _call_async(
+        self,
+        spec: EnricherSpec,
+        prompt: PromptDefinition,
+        vars: dict[str, str],
+        blocks: dict[str, str],
+        metrics: RenderMetrics | None,
+    ) -> StageResult:
+        import asyncio
+
+        timeout = self._timeout_for(spec)
+        invocation = self._invoke_async(spec, prompt, vars, blocks, offload=timeout is not None)
+        started = time.perf_counter()
+        try:
+            with span(get_tracer(), "promptir.enricher", _enricher_attributes(spec)):
+                updates = await asyncio.wait_for(invocation, timeout)
+        except asyncio.TimeoutError:
+            self._record(spec, prompt, metrics, time.perf_counter() - started, timed_out=True)
+            return None
+        self._record(spec, prompt, metrics, time.perf_counter() - started, timed_out=False)
+        return updates
+
+    async def _invoke_async(
+        self,
+        spec: EnricherSpec,
+        prompt: PromptDefinition,
+        vars: dict[str, str],
+        blocks: dict[str, str],
+        *,
+        offload: bool,
+    ) -> dict[str, str]:
+        if not spec.is_async and (offload or self.max_workers):
+            import asyncio
+
+            loop = asyncio.get_running_loop()
+            return await loop.run_in_executor(
+                self._get_executor(), bind_context(_call_sync), spec, prompt, vars, blocks
+            )
+        updates = spec.func(prompt, vars, blocks)
+        if inspect.isawaitable(updates):
+            return await updates
+        return updates
+
+    def _record(
+        self,
+        spec: EnricherSpec,
+        prompt: PromptDefinition,
+        metrics: RenderMetrics | None,
+        elapsed: float,
+        *,
+        timed_out: bool,
+    ) -> None:
+        if metrics is not None:
+            metrics.record_enricher(prompt, spec.name, elapsed, timed_out=timed_out)
+        name = spec.name
+        with self._lock:
+            current = self._stats.get(name, EnricherStats())
+            self._stats[name] = EnricherStats(
+                calls=current.calls + 1,
+                timeouts=current.timeouts + int(timed_out),
+                total_seconds=current.total_seconds + elapsed,
+                max_seconds=max(current.max_seconds, elapsed),
+            )
+
+    def _get_executor(self) -> ThreadPoolExecutor:
+        from concurrent.futures import ThreadPoolExecutor
+
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers, thread_name_prefix="promptir-enrich"
+                )
+            return self._executor
+
+
+def _as_spec(item: Enricher | AsyncEnricher | EnricherSpec) -> EnricherSpec:
+    if isinstance(item, EnricherSpec):
+        return item
+    return EnricherSpec(item)
+
+
+def _unique_names(specs: list[EnricherSpec]) -> list[EnricherSpec]:
+    taken = {spec.name for spec in specs}
+    # Each name maps to the distinct functions seen under it and the names they got.
+    assigned: dict[str, list[tuple[object, str]]] = {}
+    unique: list[EnricherSpec] = []
+    for spec in specs:
+        funcs = assigned.setdefault(spec.name, [])
+        name = next((given for func, given in funcs if func is spec.func), None)
+        if name is None:
+            name = spec.name
+            occurrence = len(funcs) + 1
+            if funcs:
+                while f"{spec.name}#{occurrence}" in taken:
+                    occurrence += 1
+                name = f"{spec.name}#{occurrence}"
+                taken.add(name)
+            funcs.append((spec.func, name))
+        unique.append(spec if name == spec.name else replace(spec, name=name))
+    return unique
+
+
+def _build_stages(
+    specs: list[EnricherSpec], block_names: frozenset[str], concurrent: bool
+) -> Stages:
+    kept = [spec for spec in specs if spec.writes is None or spec.writes & block_names]
+    levels: list[int] = []
+    for index, spec in enumerate(kept):
+        reads = spec.reads
+        if reads is None and concurrent:
+            reads = frozenset[str]()
+        level = 0
+        for prior, prior_level in zip(kept[:index], levels, strict=True):
+            if _overlaps(prior.writes, reads):
+                level = max(level, prior_level + 1)
+            elif _overlaps(prior.writes, spec.writes) or _overlaps(spec.writes, prior.reads):
+                level = max(level, prior_level)
+        levels.append(level)
+    stages: list[list[EnricherSpec]] = [[] for _ in range(max(levels, default=-1) + 1)]
+    for spec, level in zip(kept, levels, strict=True):
+        stages[level].append(spec)
+    return tuple(tuple(stage) for stage in stages)
+
+
+def _overlaps(writes: frozenset[str] | None, reads: frozenset[str] | None) -> bool:
+    if writes is None:
+        return reads is None or bool(reads)
+    if reads is None:
+        return bool(writes)
+    return not writes.isdisjoint(reads)
+
+
+def _call_sync_timed(
+    spec: EnricherSpec,
+    prompt: PromptDefinition,
+    vars: dict[str, str],
+    blocks: dict[str, str],
+) -> tuple[dict[str, str], float]:
+    tracer = get_tracer()
+    started = time.perf_counter()
+    if tracer is None:
+        updates = _call_sync(spec, prompt, vars, blocks)
+    else:
+        with span(tracer, "promptir.enricher", _enricher_attributes(spec)):
+            updates = _call_sync(spec, prompt, vars, blocks)
+    return updates, time.perf_counter() - started
+
+
+def _call_sync(
+    spec: EnricherSpec,
+    prompt: PromptDefinition,
+    vars: dict[str, str],
+    blocks: dict[str, str],
+) -> dict[str, str]:
+    updates = spec.func(prompt, vars, blocks)
+    if inspect.isawaitable(updates):
+        _close_awaitable(updates)
+        raise PromptEnrichmentError(f"Async enricher {spec.name} requires aapply/arender")
+    return updates
+
+
+def _merge_updates(
+    enriched: dict[str, str],
+    stage: tuple[EnricherSpec, ...],
+    results: list[StageResult],
+    prompt: PromptDefinition,
+) -> None:
+    for spec, updates in zip(stage, results, strict=True):
+        if not updates:
+            continue
+        if spec.writes is not None:
+            undeclared = updates.keys() - spec.writes
+            if undeclared:
+                raise PromptEnrichmentError(
+                    f"Enricher {spec.name} wrote undeclared blocks: {sorted(undeclared)}"
+                )
+            updates = {name: value for name, value in updates.items() if name in prompt.blocks}
+        enriched.update(updates)
+
+
+def _stage_attributes(index: int, stage: tuple[EnricherSpec, ...]) -> SpanAttributes:
+    return {"promptir.stage": index, "promptir.enrichers": len(stage)}
+
+
+def _enricher_attributes(spec: EnricherSpec) -> SpanAttributes:
+    return {"promptir.enricher": spec.name}
+
+
+def _close_awaitable(awaitable: object) -> None:
+    close = getattr(awaitable, "close", None)
+    if callable(close):
+        close()
+
+
+def _enricher_name(enricher: object) -> str:
+    return getattr(enricher, "__qualname__", None) or repr(enricher)
@@ -15,3 +15,7 @@ class PromptNotFound(PromptError):
 
 class PromptInputError(PromptError):
     """Raised for invalid runtime inputs."""
+
+
+class PromptEnrichmentError(PromptError):
+    """Raised when the enrichment pipeline cannot run an enricher."""
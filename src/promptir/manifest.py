@@ -0,0 +1,178 @@
+"""Manifest encodings: readable JSON, compact binary and a lazily decoded indexed layout."""
+
+from __future__ import annotations
+
+import json
+import marshal
+import mmap
+import tempfile
+from collections.abc import Iterator, Mapping
+from pathlib import Path
+from typing import Any, Literal, cast
+
+ManifestFormat = Literal["json", "binary", "indexed"]
+MANIFEST_FORMATS: tuple[ManifestFormat, ...] = ("json", "binary", "indexed")
+
+# Binary manifests are a magic prefix, the marshal format version, then the
+# marshalled manifest dict. marshal decodes in C without any text parsing.
+BINARY_MAGIC = b"PIRM"
+# Indexed manifests share the version byte, then an 8-byte little-endian header
+# length, a marshalled header holding the top-level manifest fields and an
+# (id, version) -> (offset, length) index, and finally one marshalled entry per
+# prompt. Only the header is decoded at load time.
+INDEXED_MAGIC = b"PIRX"
+_MAGIC_SIZE = 4
+_PREFIX_SIZE = _MAGIC_SIZE + 1
+_HEADER_LENGTH_SIZE = 8
+
+PromptKey = tuple[str, str]
+
+
+def encode_manifest(manifest: dict[str, Any], manifest_format: ManifestFormat = "json") -> bytes:
+    """Serialize a manifest dict in the requested format."""
+    if manifest_format == "json":
+        return (json.dumps(manifest, indent=2, sort_keys=True) + "\n").encode("utf-8")
+    if manifest_format == "binary":
+        return BINARY_MAGIC + bytes([marshal.version]) + marshal.dumps(_canonical(manifest))
+    if manifest_format == "indexed":
+        return _encode_indexed(manifest)
+    raise ValueError(f"Unknown manifest format: {manifest_format}")
+
+
+def decode_manifest(data: bytes) -> dict[str, Any]:
+    """Deserialize a manifest, detecting its encoding from the first bytes."""
+    if data.startswith(INDEXED_MAGIC):
+        indexed = IndexedManifest(data)
+        return {**indexed.fields, "prompts": [indexed[key] for key in indexed]}
+    if not data.startswith(BINARY_MAGIC):
+        return json.loads(data.decode("utf-8"))
+    _check_marshal_version(data)
+    return _as_manifest_dict(_unmarshal(data[_PREFIX_SIZE:]))
+
+
+def message_content(message: dict[str, Any], contents: Mapping[str, str]) -> str:
+    """Return a message's text, joining ``{"ref"}``/``{"text"}`` parts of schema 2 manifests."""
+    parts: list[dict[str, str]] | None = message.get("parts")
+    if parts is None:
+        return message["content"]
+    texts = [contents[part["ref"]] if "ref" in part else part["text"] for part in parts]
+    # Only a message that is exactly one include reuses the table's string object;
+    # mixed messages are joined into their own string, which is what gets rendered.
+    return texts[0] if len(texts) == 1 else "\n\n".join(texts)
+
+
+def detect_manifest_format(data: bytes) -> ManifestFormat:
+    if data.startswith(INDEXED_MAGIC):
+        return "indexed"
+    return "binary" if data.startswith(BINARY_MAGIC) else "json"
+
+
+class IndexedManifest(Mapping[PromptKey, dict[str, Any]]):
+    """Read-only view of an indexed manifest that decodes each entry on access.
+
+    ``buffer`` is usually a read-only ``mmap`` from ``open_indexed_manifest``, so
+    only the pages holding the index and the entries actually read become
+    resident. Entries are not cached here; callers keep what they decode.
+    """
+
+    def __init__(self, buffer: bytes | mmap.mmap) -> None:
+        if buffer[:_MAGIC_SIZE] != INDEXED_MAGIC:
+            raise ValueError("Not an indexed manifest")
+        _check_marshal_version(buffer[:_PREFIX_SIZE])
+        header_start = _PREFIX_SIZE + _HEADER_LENGTH_SIZE
+        if len(buffer) < header_start:
+            raise ValueError("Corrupt binary manifest: missing header")
+        header_length = int.from_bytes(buffer[_PREFIX_SIZE:header_start], "little")
+        payload_start = header_start + header_length
+        header = _as_manifest_dict(_unmarshal(buffer[header_start:payload_start]))
+        if "fields" not in header or "index" not in header:
+            raise ValueError("Corrupt binary manifest: missing index")
+        self.fields: dict[str, Any] = header["fields"]
+        self._index: dict[PromptKey, tuple[int, int]] = header["index"]
+        self._buffer = buffer
+        self._payload_start = payload_start
+
+    def __getitem__(self, key: PromptKey) -> dict[str, Any]:
+        offset, length = self._index[key]
+        start = self._payload_start + offset
+        return _as_manifest_dict(_unmarshal(self._buffer[start : start + length]))
+
+    def __iter__(self) -> Iterator[PromptKey]:
+        return iter(self._index)
+
+    def __len__(self) -> int:
+        return len(self._index)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._index
+
+
+def open_indexed_manifest(path: str | Path) -> IndexedManifest | None:
+    """Memory-map ``path`` if it holds an indexed manifest; return None otherwise."""
+    with open(path, "rb") as handle:
+        if handle.read(_MAGIC_SIZE) != INDEXED_MAGIC:
+            return None
+        buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    return IndexedManifest(buffer)
+
+
+def share_manifest(manifest: dict[str, Any]) -> IndexedManifest:
+    """Copy ``manifest`` into a read-only shared mapping in the indexed layout.
+
+    The mapping is backed by an unlinked temporary file. Processes forked after
+    this call map the same physical pages instead of each holding a decoded copy,
+    and decode only the prompts they resolve.
+    """
+    with tempfile.TemporaryFile() as handle:
+        handle.write(_encode_indexed(manifest))
+        handle.flush()
+        buffer = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+    return IndexedManifest(buffer)
+
+
+def _encode_indexed(manifest: dict[str, Any]) -> bytes:
+    payload = bytearray()
+    index: dict[PromptKey, tuple[int, int]] = {}
+    for raw_entry in manifest["prompts"]:
+        entry = _canonical(raw_entry)
+        blob = marshal.dumps(entry)
+        index[(entry["id"], entry["version"])] = (len(payload), len(blob))
+        payload += blob
+    fields = _canonical({key: value for key, value in manifest.items() if key != "prompts"})
+    header = marshal.dumps({"fields": fields, "index": index})
+    return b"".join(
+        (
+            INDEXED_MAGIC,
+            bytes([marshal.version]),
+            len(header).to_bytes(_HEADER_LENGTH_SIZE, "little"),
+            header,
+            payload,
+        )
+    )
+
+
+def _canonical(value: Any) -> Any:
+    # marshal output depends on key order and on which strings are shared or
+    # interned, which differs between serial, worker and build-cache compiles.
+    # A sorted JSON round-trip rebuilds the value the same way every time.
+    return json.loads(json.dumps(value, sort_keys=True))
+
+
+def _check_marshal_version(prefix: bytes) -> None:
+    if len(prefix) < _PREFIX_SIZE:
+        raise ValueError("Corrupt binary manifest: missing header")
+    if prefix[_MAGIC_SIZE] > marshal.version:
+        raise ValueError("Binary manifest was written by a newer Python; recompile it")
+
+
+def _unmarshal(data: bytes) -> object:
+    try:
+        return marshal.loads(data)
+    except (EOFError, TypeError, ValueError) as exc:
+        raise ValueError(f"Corrupt binary manifest: {exc}") from exc
+
+
+def _as_manifest_dict(value: object) -> dict[str, Any]:
+    if not isinstance(value, dict):
+        raise ValueError("Corrupt binary manifest: expected a mapping")
+    return cast(dict[str, Any], value)
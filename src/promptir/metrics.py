@@ -0,0 +1,296 @@
+"""Per-prompt render metrics with a dependency-free Prometheus text exporter."""
+
+from __future__ import annotations
+
+import threading
+import time
+from bisect import bisect_left
+from collections.abc import Sequence
+from dataclasses import dataclass, field
+
+from promptir.models import PromptDefinition
+from promptir.tracing import OpenSpan, SpanAttributes, Tracer
+
+# Upper bounds in seconds; an implicit +Inf bucket follows the last one.
+DEFAULT_BUCKETS: tuple[float, ...] = (
+    0.00001,
+    0.000025,
+    0.00005,
+    0.0001,
+    0.00025,
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+    10.0,
+)
+# cache_lookup is only recorded with a render cache and enrichment only with a pipeline.
+RENDER_PHASES = (
+    "normalize",
+    "cache_lookup",
+    "validate",
+    "block_defaults",
+    "enrichment",
+    "render",
+)
+
+# (id, version, hash)
+PromptLabels = tuple[str, str, str]
+
+
+@dataclass(frozen=True)
+class HistogramSnapshot:
+    buckets: tuple[float, ...]
+    # Per-bucket (not cumulative) counts; the last entry is the +Inf bucket.
+    counts: tuple[int, ...]
+    count: int
+    sum: float
+
+
+@dataclass(frozen=True)
+class PromptMetrics:
+    renders: int = 0
+    cache_hits: int = 0
+    errors: int = 0
+    phases: dict[str, HistogramSnapshot] = field(default_factory=dict)
+    enrichers: dict[str, HistogramSnapshot] = field(default_factory=dict)
+    enricher_timeouts: dict[str, int] = field(default_factory=dict)
+
+
+@dataclass(frozen=True)
+class MetricsSnapshot:
+    prompts: dict[PromptLabels, PromptMetrics]
+
+
+class RenderTimer:
+    """Collects phase durations for one render and, given a tracer, a span per phase.
+
+    ``enter`` closes the running phase and starts the next; ``finish`` closes the
+    last phase and the enclosing ``promptir.render`` span.
+    """
+
+    __slots__ = (
+        "_phase",
+        "_phase_span",
+        "_render_span",
+        "_started",
+        "_tracer",
+        "cache_hit",
+        "phases",
+    )
+
+    def __init__(
+        self, tracer: Tracer | None = None, attributes: SpanAttributes | None = None
+    ) -> None:
+        self.phases: list[tuple[str, float]] = []
+        self.cache_hit = False
+        self._tracer = tracer
+        self._phase: str | None = None
+        self._phase_span: OpenSpan | None = None
+        self._render_span = (
+            OpenSpan(tracer, "promptir.render", attributes or {}) if tracer is not None else None
+        )
+        self._started = time.perf_counter()
+
+    def enter(self, phase: str) -> None:
+        self._close_phase(None)
+        self._phase = phase
+        if self._tracer is not None:
+            self._phase_span = OpenSpan(self._tracer, f"promptir.render.{phase}", {})
+
+    def finish(self, error: BaseException | None = None) -> None:
+        self._close_phase(error)
+        if self._render_span is not None:
+            self._render_span.end(error)
+            self._render_span = None
+
+    def _close_phase(self, error: BaseException | None) -> None:
+        now = time.perf_counter()
+        if self._phase is not None:
+            self.phases.append((self._phase, now - self._started))
+            self._phase = None
+        if self._phase_span is not None:
+            self._phase_span.end(error)
+            self._phase_span = None
+        self._started = now
+
+
+class _Histogram:
+    __slots__ = ("count", "counts", "sum")
+
+    def __init__(self, size: int) -> None:
+        self.counts = [0] * (size + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, buckets: tuple[float, ...], value: float) -> None:
+        self.counts[bisect_left(buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self, buckets: tuple[float, ...]) -> HistogramSnapshot:
+        return HistogramSnapshot(buckets, tuple(self.counts), self.count, self.sum)
+
+
+class _PromptSeries:
+    __slots__ = ("cache_hits", "enricher_timeouts", "enrichers", "errors", "phases", "renders")
+
+    def __init__(self) -> None:
+        self.renders = 0
+        self.cache_hits = 0
+        self.errors = 0
+        self.phases: dict[str, _Histogram] = {}
+        self.enrichers: dict[str, _Histogram] = {}
+        self.enricher_timeouts: dict[str, int] = {}
+
+
+class RenderMetrics:
+    """Thread-safe collector of per-prompt render counters and latency histograms.
+
+    Pass one to ``PromptRegistry`` to record each render's ``RENDER_PHASES`` and
+    every enricher call, keyed by the prompt's id, version and hash. Read it back
+    with ``snapshot`` or ``to_prometheus``.
+    """
+
+    def __init__(self, *, buckets: Sequence[float] = DEFAULT_BUCKETS) -> None:
+        bounds = tuple(float(bound) for bound in buckets)
+        if not bounds or list(bounds) != sorted(set(bounds)) or bounds[0] <= 0:
+            raise ValueError("buckets must be positive, unique and increasing")
+        self.buckets = bounds
+        self._series: dict[PromptLabels, _PromptSeries] = {}
+        self._lock = threading.Lock()
+
+    def record_render(self, prompt: PromptDefinition, timer: RenderTimer) -> None:
+        with self._lock:
+            series = self._series_for(prompt)
+            series.renders += 1
+            series.cache_hits += int(timer.cache_hit)
+            for phase, seconds in timer.phases:
+                self._observe(series.phases, phase, seconds)
+
+    def record_error(self, prompt: PromptDefinition) -> None:
+        with self._lock:
+            self._series_for(prompt).errors += 1
+
+    def record_enricher(
+        self, prompt: PromptDefinition, name: str, seconds: float, *, timed_out: bool
+    ) -> None:
+        with self._lock:
+            series = self._series_for(prompt)
+            self._observe(series.enrichers, name, seconds)
+            if timed_out:
+                series.enricher_timeouts[name] = series.enricher_timeouts.get(name, 0) + 1
+
+    def snapshot(self) -> MetricsSnapshot:
+        with self._lock:
+            return MetricsSnapshot(
+                {
+                    labels: PromptMetrics(
+                        renders=series.renders,
+                        cache_hits=series.cache_hits,
+                        errors=series.errors,
+                        phases={
+                            name: hist.snapshot(self.buckets)
+                            for name, hist in series.phases.items()
+                        },
+                        enrichers={
+                            name: hist.snapshot(self.buckets)
+                            for name, hist in series.enrichers.items()
+                        },
+                        enricher_timeouts=dict(series.enricher_timeouts),
+                    )
+                    for labels, series in self._series.items()
+                }
+            )
+
+    def reset(self) -> None:
+        with self._lock:
+            self._series.clear()
+
+    def to_prometheus(self, *, prefix: str = "promptir") -> str:
+        return format_prometheus(self.snapshot(), prefix=prefix)
+
+    def _series_for(self, prompt: PromptDefinition) -> _PromptSeries:
+        labels = (prompt.id, prompt.version, prompt.hash)
+        series = self._series.get(labels)
+        if series is None:
+            series = _PromptSeries()
+            self._series[labels] = series
+        return series
+
+    def _observe(self, histograms: dict[str, _Histogram], name: str, seconds: float) -> None:
+        histogram = histograms.get(name)
+        if histogram is None:
+            histogram = _Histogram(len(self.buckets))
+            histograms[name] = histogram
+        histogram.observe(self.buckets, seconds)
+
+
+def format_prometheus(snapshot: MetricsSnapshot, *, prefix: str = "promptir") -> str:
+    """Render a snapshot in the Prometheus text exposition format (version 0.0.4)."""
+    lines: list[str] = []
+    prompts = sorted(snapshot.prompts.items())
+    counters = (
+        ("renders_total", "Renders completed, including render cache hits.", "renders"),
+        ("render_cache_hits_total", "Renders served from the render cache.", "cache_hits"),
+        ("render_errors_total", "Renders that raised an exception.", "errors"),
+    )
+    for suffix, help_text, attribute in counters:
+        name = f"{prefix}_{suffix}"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} counter"]
+        for labels, metrics in prompts:
+            lines.append(f"{name}{{{_prompt_labels(labels)}}} {getattr(metrics, attribute)}")
+
+    histograms = (
+        ("render_phase_seconds", "Time spent in each render phase.", "phase", "phases"),
+        ("enricher_seconds", "Time spent in each enricher call.", "enricher", "enrichers"),
+    )
+    for suffix, help_text, label, attribute in histograms:
+        name = f"{prefix}_{suffix}"
+        lines += [f"# HELP {name} {help_text}", f"# TYPE {name} histogram"]
+        for labels, metrics in prompts:
+            series: dict[str, HistogramSnapshot] = getattr(metrics, attribute)
+            for key, histogram in sorted(series.items()):
+                base = f'{_prompt_labels(labels)},{label}="{_escape(key)}"'
+                lines += _histogram_lines(name, base, histogram)
+
+    name = f"{prefix}_enricher_timeouts_total"
+    lines += [
+        f"# HELP {name} Enricher calls abandoned at their deadline.",
+        f"# TYPE {name} counter",
+    ]
+    for labels, metrics in prompts:
+        for enricher_name, count in sorted(metrics.enricher_timeouts.items()):
+            base = f'{_prompt_labels(labels)},enricher="{_escape(enricher_name)}"'
+            lines.append(f"{name}{{{base}}} {count}")
+    return "\n".join(lines) + "\n"
+
+
+def _histogram_lines(name: str, base: str, histogram: HistogramSnapshot) -> list[str]:
+    lines: list[str] = []
+    cumulative = 0
+    bounds = [repr(bound) for bound in histogram.buckets] + ["+Inf"]
+    for bound, count in zip(bounds, histogram.counts, strict=True):
+        cumulative += count
+        lines.append(f'{name}_bucket{{{base},le="{bound}"}} {cumulative}')
+    lines.append(f"{name}_sum{{{base}}} {histogram.sum!r}")
+    lines.append(f"{name}_count{{{base}}} {histogram.count}")
+    return lines
+
+
+def _prompt_labels(labels: PromptLabels) -> str:
+    prompt_id, version, prompt_hash = labels
+    return f'id="{_escape(prompt_id)}",version="{_escape(version)}",hash="{_escape(prompt_hash)}"'
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
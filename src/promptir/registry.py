@@ -2,16 +2,47 @@
 
 from __future__ import annotations
 
-import json
-from dataclasses import dataclass
+import hashlib
+import importlib
+import importlib.util
+import threading
+from collections.abc import Callable, Iterable, Iterator, Mapping
+from dataclasses import dataclass, replace
+from functools import partial
+from itertools import islice
 from pathlib import Path
-from typing import Any
+from types import CodeType, ModuleType
+from typing import TYPE_CHECKING, Any, Literal
 
+from promptir.cache import LRUCache, digest_values
 from promptir.enrich import EnrichmentPipeline
 from promptir.errors import PromptInputError, PromptNotFound
+from promptir.manifest import (
+    IndexedManifest,
+    decode_manifest,
+    message_content,
+    open_indexed_manifest,
+    share_manifest,
+)
+from promptir.metrics import RenderMetrics, RenderTimer
 from promptir.models import BlockSpec, PromptDefinition, PromptMessage
-from promptir.render_jinja2 import render_jinja2
-from promptir.render_simple import render_simple
+from promptir.render_simple import SimplePlan, compile_simple, render_simple_plan
+from promptir.tracing import SpanAttributes, get_tracer, prompt_attributes
+
+if TYPE_CHECKING:
+    from concurrent.futures import Executor
+
+    from jinja2 import Template
+    from jinja2.sandbox import SandboxedEnvironment
+
+    from promptir.sampling import RenderSampler, SampleProbe
+
+MessageRenderer = Callable[[dict[str, str]], str]
+RenderInput = tuple[dict[str, Any] | None, dict[str, Any] | None]
+# (prompt hash, digest of the normalized vars and blocks)
+RenderCacheKey = tuple[str, str]
+# Layout version of modules written by promptir.codegen; bump when it changes.
+CODEGEN_VERSION = 1
 
 
 @dataclass(frozen=True)
@@ -19,27 +50,418 @@ class RenderedPrompt:
     messages: tuple[dict[str, str], ...]
 
 
+class PreparedPrompt:
+    """A resolved prompt with frozen validation sets and compiled message renderers."""
+
+    def __init__(
+        self,
+        registry: PromptRegistry,
+        prompt: PromptDefinition,
+        renderers: tuple[MessageRenderer, ...],
+    ) -> None:
+        self.prompt = prompt
+        self.block_names = frozenset(prompt.blocks)
+        self.required_vars = frozenset(prompt.variables) - self.block_names
+        self.required_blocks = tuple(
+            name for name, spec in prompt.blocks.items() if not spec.optional
+        )
+        self.block_defaults = {
+            name: spec.default if spec.default is not None else ""
+            for name, spec in prompt.blocks.items()
+            if spec.optional
+        }
+        self._registry = registry
+        self._strict_inputs = registry._strict_inputs
+        self._render_cache = registry._render_cache
+        self._metrics = registry._metrics
+        self._sampler = registry._sampler
+        self._messages = tuple(
+            (message.role, renderer)
+            for message, renderer in zip(prompt.messages, renderers, strict=True)
+        )
+
+    def render(
+        self,
+        vars: dict[str, Any] | None = None,
+        blocks: dict[str, Any] | None = None,
+    ) -> RenderedPrompt:
+        return self._render(vars, blocks, self._registry._pipeline)
+
+    def render_many(self, inputs: Iterable[RenderInput]) -> list[RenderedPrompt]:
+        """Render a batch of (vars, blocks) pairs, resolving the pipeline once."""
+        return self._render_batch(inputs, self._registry._pipeline)
+
+    def _render_batch(
+        self, inputs: Iterable[RenderInput], pipeline: EnrichmentPipeline | None
+    ) -> list[RenderedPrompt]:
+        return [self._render(vars, blocks, pipeline) for vars, blocks in inputs]
+
+    async def arender(
+        self,
+        vars: dict[str, Any] | None = None,
+        blocks: dict[str, Any] | None = None,
+    ) -> RenderedPrompt:
+        pipeline = self._registry._pipeline
+        timer = self._start_timer(vars, blocks)
+        if timer is None:
+            return await self._arender_steps(vars, blocks, pipeline, None)
+        # cProfile cannot attribute time across awaits, so async renders are not profiled.
+        probe = self._sampler.begin(profile=False) if self._sampler is not None else None
+        try:
+            rendered = await self._arender_steps(vars, blocks, pipeline, timer)
+        except Exception as exc:
+            self._finish_timer(timer, probe, vars, blocks, exc)
+            raise
+        self._finish_timer(timer, probe, vars, blocks, None)
+        return rendered
+
+    def _render(
+        self,
+        vars: dict[str, Any] | None,
+        blocks: dict[str, Any] | None,
+        pipeline: EnrichmentPipeline | None,
+    ) -> RenderedPrompt:
+        timer = self._start_timer(vars, blocks)
+        if timer is None:
+            return self._render_steps(vars, blocks, pipeline, None)
+        probe = self._sampler.begin() if self._sampler is not None else None
+        try:
+            rendered = self._render_steps(vars, blocks, pipeline, timer)
+        except Exception as exc:
+            self._finish_timer(timer, probe, vars, blocks, exc)
+            raise
+        self._finish_timer(timer, probe, vars, blocks, None)
+        return rendered
+
+    def _start_timer(
+        self, vars: dict[str, Any] | None, blocks: dict[str, Any] | None
+    ) -> RenderTimer | None:
+        tracer = get_tracer()
+        if tracer is None:
+            if self._metrics is None and self._sampler is None:
+                return None
+            return RenderTimer()
+        return RenderTimer(tracer, _span_attributes(self.prompt, vars, blocks))
+
+    def _finish_timer(
+        self,
+        timer: RenderTimer,
+        probe: SampleProbe | None,
+        vars: dict[str, Any] | None,
+        blocks: dict[str, Any] | None,
+        error: Exception | None,
+    ) -> None:
+        timer.finish(error)
+        if self._sampler is not None:
+            self._sampler.finish(probe, self.prompt, timer, vars, blocks, error)
+        if self._metrics is None:
+            return
+        if error is None:
+            self._metrics.record_render(self.prompt, timer)
+        else:
+            self._metrics.record_error(self.prompt)
+
+    def _render_steps(
+        self,
+        vars: dict[str, Any] | None,
+        blocks: dict[str, Any] | None,
+        pipeline: EnrichmentPipeline | None,
+        timer: RenderTimer | None,
+    ) -> RenderedPrompt:
+        if timer is not None:
+            timer.enter("normalize")
+        normalized_vars, normalized_blocks = _normalize_inputs(vars, blocks)
+        cache_key, cached = self._lookup_cached(normalized_vars, normalized_blocks, timer)
+        if cached is not None:
+            return cached
+        blocks_with_defaults = self._check_inputs(normalized_vars, normalized_blocks, timer)
+        if pipeline is not None:
+            if timer is not None:
+                timer.enter("enrichment")
+            blocks_with_defaults = self._check_enriched(
+                pipeline.apply(
+                    self.prompt, normalized_vars, blocks_with_defaults, metrics=self._metrics
+                )
+            )
+        if timer is not None:
+            timer.enter("render")
+        rendered = self._render_values(normalized_vars, blocks_with_defaults)
+        return self._store_cached(cache_key, rendered)
+
+    async def _arender_steps(
+        self,
+        vars: dict[str, Any] | None,
+        blocks: dict[str, Any] | None,
+        pipeline: EnrichmentPipeline | None,
+        timer: RenderTimer | None,
+    ) -> RenderedPrompt:
+        if timer is not None:
+            timer.enter("normalize")
+        normalized_vars, normalized_blocks = _normalize_inputs(vars, blocks)
+        cache_key, cached = self._lookup_cached(normalized_vars, normalized_blocks, timer)
+        if cached is not None:
+            return cached
+        blocks_with_defaults = self._check_inputs(normalized_vars, normalized_blocks, timer)
+        if pipeline is not None:
+            if timer is not None:
+                timer.enter("enrichment")
+            blocks_with_defaults = self._check_enriched(
+                await pipeline.aapply(
+                    self.prompt, normalized_vars, blocks_with_defaults, metrics=self._metrics
+                )
+            )
+        if timer is not None:
+            timer.enter("render")
+        rendered = self._render_values(normalized_vars, blocks_with_defaults)
+        return self._store_cached(cache_key, rendered)
+
+    def _lookup_cached(
+        self, vars: dict[str, str], blocks: dict[str, str], timer: RenderTimer | None
+    ) -> tuple[RenderCacheKey | None, RenderedPrompt | None]:
+        cache = self._render_cache
+        if cache is None:
+            return None, None
+        if timer is not None:
+            timer.enter("cache_lookup")
+        key = (self.prompt.hash, digest_values(vars, blocks))
+        cached = cache.get(key)
+        if timer is not None:
+            timer.cache_hit = cached is not None
+        return key, _copy_rendered(cached) if cached is not None else None
+
+    def _store_cached(self, key: RenderCacheKey | None, rendered: RenderedPrompt) -> RenderedPrompt:
+        if key is not None and self._render_cache is not None:
+            # Callers own the returned message dicts, so the cache keeps its own copy.
+            self._render_cache.put(key, _copy_rendered(rendered))
+        return rendered
+
+    def _check_inputs(
+        self, vars: dict[str, str], blocks: dict[str, str], timer: RenderTimer | None
+    ) -> dict[str, str]:
+        if timer is not None:
+            timer.enter("validate")
+        if self._strict_inputs:
+            _validate_inputs(self.required_vars, self.block_names, vars, blocks)
+        if timer is not None:
+            timer.enter("block_defaults")
+        return self._apply_block_defaults(blocks)
+
+    def _check_enriched(self, enriched_blocks: dict[str, str]) -> dict[str, str]:
+        if self._strict_inputs:
+            _validate_enriched_blocks(self.block_names, enriched_blocks)
+        return enriched_blocks
+
+    def _render_values(self, vars: dict[str, str], blocks: dict[str, str]) -> RenderedPrompt:
+        values = {**vars, **blocks}
+        return RenderedPrompt(
+            messages=tuple(
+                {"role": role, "content": renderer(values)} for role, renderer in self._messages
+            )
+        )
+
+    def _apply_block_defaults(self, blocks: dict[str, str]) -> dict[str, str]:
+        for name in self.required_blocks:
+            if name not in blocks:
+                raise PromptInputError(f"Missing required block: {name}")
+        return {**self.block_defaults, **blocks}
+
+
+@dataclass(frozen=True)
+class _PromptTable:
+    """Immutable snapshot of registry state; prepare misses and reloads publish a new one."""
+
+    prompts: Mapping[tuple[str, str], PromptDefinition]
+    latest_versions: dict[str, str]
+    prepared: dict[tuple[str, str | None], PreparedPrompt]
+
+
 class PromptRegistry:
     def __init__(
         self,
-        prompts: dict[tuple[str, str], PromptDefinition],
+        prompts: Mapping[tuple[str, str], PromptDefinition],
         *,
         strict_inputs: bool = True,
+        render_cache: LRUCache[RenderCacheKey, RenderedPrompt] | None = None,
+        metrics: RenderMetrics | None = None,
+        sampler: RenderSampler | None = None,
     ) -> None:
-        self._prompts = prompts
+        self._table = _PromptTable(prompts, _calculate_latest_versions(prompts), {})
         self._strict_inputs = strict_inputs
-        self._latest_versions = _calculate_latest_versions(prompts)
+        self._render_cache = render_cache
+        self._metrics = metrics
+        self._sampler = sampler
+        self._manifest_path: str | None = None
+        self._jinja2_cache_path: str | None = None
+        self._shared = False
+        # Serializes prepare misses and reloads; renders never take it.
+        self._lock = threading.Lock()
         self._pipeline: EnrichmentPipeline | None = None
+        self._jinja_env: SandboxedEnvironment | None = None
+        self._jinja_templates: dict[tuple[str, str], Template] = {}
+        self._simple_plans: dict[tuple[str, str], SimplePlan] = {}
+        # Set by from_module or a jinja2 cache; keyed by prompt hash, so they stay
+        # valid across reloads.
+        self._generated_renderers: Mapping[str, tuple[MessageRenderer, ...]] = {}
+        self._jinja2_code: Mapping[tuple[str, str], str | CodeType] = {}
 
     @classmethod
-    def from_manifest_path(cls, path: str, *, strict_inputs: bool = True) -> PromptRegistry:
-        manifest_path = Path(path)
-        data = json.loads(manifest_path.read_text(encoding="utf-8"))
-        prompts = _load_prompts(data)
-        return cls(prompts, strict_inputs=strict_inputs)
+    def from_manifest_path(
+        cls,
+        path: str,
+        *,
+        strict_inputs: bool = True,
+        render_cache: LRUCache[RenderCacheKey, RenderedPrompt] | None = None,
+        metrics: RenderMetrics | None = None,
+        sampler: RenderSampler | None = None,
+        shared: bool = False,
+        jinja2_cache_path: str | None = None,
+    ) -> PromptRegistry:
+        """Load a manifest in any format written by ``compile_prompts``.
+
+        Indexed manifests are memory-mapped and decoded per prompt on first use. With
+        ``shared``, other formats are copied once into a read-only shared mapping in
+        the indexed layout, so workers forked afterwards share one physical copy.
+
+        ``jinja2_cache_path`` names a sidecar written by ``promptir compile
+        --jinja2-cache``; jinja2 templates found in it are built from their compiled
+        code. A missing or stale sidecar is ignored and templates are parsed as usual.
+        """
+        registry = cls(
+            _read_manifest(path, shared),
+            strict_inputs=strict_inputs,
+            render_cache=render_cache,
+            metrics=metrics,
+            sampler=sampler,
+        )
+        registry._manifest_path = path
+        registry._shared = shared
+        if jinja2_cache_path is not None:
+            registry._jinja2_cache_path = jinja2_cache_path
+            registry._jinja2_code = _read_jinja2_cache(jinja2_cache_path)
+        return registry
+
+    @classmethod
+    def from_module(
+        cls,
+        module: str | ModuleType,
+        *,
+        strict_inputs: bool = True,
+        render_cache: LRUCache[RenderCacheKey, RenderedPrompt] | None = None,
+        metrics: RenderMetrics | None = None,
+        sampler: RenderSampler | None = None,
+    ) -> PromptRegistry:
+        """Load prompts from a module written by ``promptir compile --emit-python``.
+
+        ``module`` is a module object, an importable module name or a path to the
+        generated ``.py`` file. Prompts are built on first lookup and render with the
+        module's specialized functions; jinja2 templates are built from the Python
+        source generated at compile time, which is compiled on first lookup instead of
+        the template being parsed.
+        """
+        generated = _import_generated_module(module)
+        version = getattr(generated, "CODEGEN_VERSION", None)
+        if version != CODEGEN_VERSION:
+            raise ValueError(
+                f"Generated prompt module has version {version}, expected "
+                f"{CODEGEN_VERSION}; regenerate it with promptir compile --emit-python"
+            )
+        registry = cls(
+            _GeneratedPrompts(generated.PROMPTS),
+            strict_inputs=strict_inputs,
+            render_cache=render_cache,
+            metrics=metrics,
+            sampler=sampler,
+        )
+        registry._generated_renderers = generated.RENDERERS
+        registry._jinja2_code = generated.JINJA2_CODE
+        return registry
+
+    def reload(self, path: str | None = None) -> None:
+        """Load the manifest again and swap the new prompt table in atomically.
+
+        The table is built before the swap, and renders already in flight finish
+        against the prompts they started with. Prepared handles and compiled
+        templates are kept for prompts whose hash did not change; render and
+        enrichment caches are keyed by hash, so their entries stay valid as well.
+        A jinja2 cache passed to ``from_manifest_path`` is read again with it.
+        """
+        manifest_path = path or self._manifest_path
+        if manifest_path is None:
+            raise ValueError("reload() needs a path when the registry was not loaded from one")
+        prompts = _read_manifest(manifest_path, self._shared)
+        jinja2_code = self._jinja2_code
+        if self._jinja2_cache_path is not None:
+            jinja2_code = _read_jinja2_cache(self._jinja2_cache_path)
+        with self._lock:
+            self._jinja2_code = jinja2_code
+            self._swap_table(prompts)
+            self._manifest_path = manifest_path
+
+    def watch_manifest(
+        self,
+        interval: float = 1.0,
+        *,
+        compare: Literal["mtime", "hash"] = "mtime",
+        on_error: Callable[[Exception], None] | None = None,
+    ) -> threading.Event:
+        """Reload from a daemon thread whenever the manifest file changes.
+
+        ``compare`` checks the file's mtime and size, or the sha256 of its bytes. A
+        manifest that fails to load is reported to ``on_error`` and the current table
+        stays in place until the file changes again. Set the returned event to stop.
+        """
+        if self._manifest_path is None:
+            raise ValueError("watch_manifest() needs a registry loaded from a manifest path")
+        path = Path(self._manifest_path)
+        stop = threading.Event()
+
+        def poll(fingerprint: object) -> None:
+            while not stop.wait(interval):
+                try:
+                    current = _manifest_fingerprint(path, compare)
+                    if current == fingerprint:
+                        continue
+                    fingerprint = current
+                    self.reload(str(path))
+                except Exception as exc:
+                    if on_error is not None:
+                        on_error(exc)
+
+        fingerprint = _manifest_fingerprint(path, compare)
+        thread = threading.Thread(
+            target=poll, args=(fingerprint,), name="promptir-manifest-reload", daemon=True
+        )
+        thread.start()
+        return stop
 
     def set_enrichment_pipeline(self, pipeline: EnrichmentPipeline) -> None:
+        """Swap the pipeline; each render reads it once and uses that one throughout.
+
+        The render cache is cleared, since its entries were enriched by the old pipeline.
+        """
         self._pipeline = pipeline
+        if self._render_cache is not None:
+            self._render_cache.clear()
+
+    def prepare(self, prompt_id: str, *, version: str | None = None) -> PreparedPrompt:
+        """Resolve a prompt once and return a handle that only does per-request work.
+
+        Hits read the current table snapshot without locking. Misses build the handle
+        under the registry lock and publish a copied ``prepared`` map, so a published
+        map is never mutated and concurrent readers need no synchronization.
+        """
+        prepared = self._table.prepared.get((prompt_id, version))
+        if prepared is not None:
+            return prepared
+        with self._lock:
+            table = self._table
+            key = (prompt_id, version)
+            prepared = table.prepared.get(key)
+            if prepared is None:
+                prompt = _get_prompt(table, prompt_id, version)
+                prepared = PreparedPrompt(self, prompt, self._build_renderers(prompt))
+                self._table = replace(table, prepared={**table.prepared, key: prepared})
+            return prepared
 
     def render(
         self,
@@ -49,68 +471,311 @@ class PromptRegistry:
         vars: dict[str, Any] | None = None,
         blocks: dict[str, Any] | None = None,
     ) -> RenderedPrompt:
-        prompt = self._get_prompt(prompt_id, version)
-        vars = vars or {}
-        blocks = blocks or {}
-        normalized_vars = _normalize_values(vars)
-        normalized_blocks = _normalize_values(blocks)
+        return self.prepare(prompt_id, version=version).render(vars, blocks)
 
-        if self._strict_inputs:
-            _validate_inputs(prompt, normalized_vars, normalized_blocks)
+    async def arender(
+        self,
+        prompt_id: str,
+        *,
+        version: str | None = None,
+        vars: dict[str, Any] | None = None,
+        blocks: dict[str, Any] | None = None,
+    ) -> RenderedPrompt:
+        """Render like ``render`` but await the enrichment pipeline's async path."""
+        return await self.prepare(prompt_id, version=version).arender(vars, blocks)
+
+    def render_many(
+        self,
+        prompt_id: str,
+        inputs: Iterable[RenderInput],
+        *,
+        version: str | None = None,
+        executor: Executor | None = None,
+        chunk_size: int = 256,
+    ) -> list[RenderedPrompt]:
+        """Render many (vars, blocks) pairs against one prompt, preserving input order.
+
+        Lookup, validation sets and the enrichment pipeline are resolved once for the
+        whole batch. When an executor is given, inputs are split into chunks of
+        ``chunk_size`` and rendered on it; a ``ProcessPoolExecutor`` requires the
+        enrichment pipeline, if any, to be picklable.
 
-        blocks_with_defaults = _apply_block_defaults(prompt, normalized_blocks)
+        Process workers only receive the prompt, ``strict_inputs`` and the pipeline.
+        They render without the registry's render cache, metrics, sampler, jinja2
+        cache or generated renderers, and compile the prompt's templates themselves.
+        """
+        prepared = self.prepare(prompt_id, version=version)
+        pipeline = self._pipeline
+        if executor is None:
+            return prepared._render_batch(inputs, pipeline)
+        if chunk_size < 1:
+            raise ValueError("chunk_size must be at least 1")
+        from concurrent.futures import ProcessPoolExecutor
 
-        if self._pipeline is not None:
-            enriched_blocks = self._pipeline.apply(prompt, normalized_vars, blocks_with_defaults)
-            if self._strict_inputs:
-                _validate_enriched_blocks(prompt, enriched_blocks)
+        chunks = _chunked(inputs, chunk_size)
+        if isinstance(executor, ProcessPoolExecutor):
+            futures = [
+                executor.submit(
+                    _render_chunk_in_worker,
+                    prepared.prompt,
+                    self._strict_inputs,
+                    pipeline,
+                    chunk,
+                )
+                for chunk in chunks
+            ]
         else:
-            enriched_blocks = blocks_with_defaults
+            futures = [executor.submit(prepared._render_batch, chunk, pipeline) for chunk in chunks]
+        results: list[RenderedPrompt] = []
+        for future in futures:
+            results.extend(future.result())
+        return results
 
-        values = {**normalized_vars, **enriched_blocks}
-        rendered_messages = tuple(
-            {"role": message.role, "content": _render_message(prompt, message, values)}
-            for message in prompt.messages
+    def _build_renderers(self, prompt: PromptDefinition) -> tuple[MessageRenderer, ...]:
+        generated = self._generated_renderers.get(prompt.hash)
+        if generated is not None:
+            return generated
+        if prompt.template_engine == "simple":
+            return tuple(
+                partial(render_simple_plan, self._get_simple_plan(prompt, message))
+                for message in prompt.messages
+            )
+        if prompt.template_engine == "jinja2_sandbox":
+            return tuple(
+                self._get_jinja_template(prompt, message).render for message in prompt.messages
+            )
+        raise PromptInputError(
+            f"Unknown template_engine '{prompt.template_engine}' for {prompt.id}@{prompt.version}"
         )
-        return RenderedPrompt(messages=rendered_messages)
 
-    def _get_prompt(self, prompt_id: str, version: str | None) -> PromptDefinition:
-        resolved_version = version or self._latest_versions.get(prompt_id)
-        if resolved_version is None:
-            raise PromptNotFound(f"Prompt id not found: {prompt_id}")
-        key = (prompt_id, resolved_version)
-        prompt = self._prompts.get(key)
-        if prompt is None:
-            raise PromptNotFound(f"Prompt not found: {prompt_id}@{resolved_version}")
-        return prompt
+    def _get_simple_plan(self, prompt: PromptDefinition, message: PromptMessage) -> SimplePlan:
+        key = (prompt.hash, message.role)
+        plan = self._simple_plans.get(key)
+        if plan is None:
+            plan = compile_simple(message.content)
+            self._simple_plans[key] = plan
+        return plan
+
+    def _get_jinja_template(self, prompt: PromptDefinition, message: PromptMessage) -> Template:
+        key = (prompt.hash, message.role)
+        template = self._jinja_templates.get(key)
+        if template is None:
+            from promptir.render_jinja2 import (
+                compile_jinja2,
+                create_sandbox_environment,
+                load_jinja2_code,
+            )
+
+            if self._jinja_env is None:
+                self._jinja_env = create_sandbox_environment()
+            code = self._jinja2_code.get(key)
+            if code is not None:
+                template = load_jinja2_code(self._jinja_env, code)
+            else:
+                template = compile_jinja2(self._jinja_env, message.content)
+            self._jinja_templates[key] = template
+        return template
+
+    def _swap_table(self, prompts: Mapping[tuple[str, str], PromptDefinition]) -> None:
+        latest_versions = _calculate_latest_versions(prompts)
+        prepared: dict[tuple[str, str | None], PreparedPrompt] = {}
+        for key, handle in self._table.prepared.items():
+            prompt_id, version = key
+            resolved_version = version or latest_versions.get(prompt_id)
+            prompt = prompts.get((prompt_id, resolved_version)) if resolved_version else None
+            if prompt is not None and prompt.hash == handle.prompt.hash:
+                prepared[key] = handle
+        kept_hashes = {handle.prompt.hash for handle in prepared.values()}
+        self._jinja_templates = {
+            key: template
+            for key, template in self._jinja_templates.items()
+            if key[0] in kept_hashes
+        }
+        self._simple_plans = {
+            key: plan for key, plan in self._simple_plans.items() if key[0] in kept_hashes
+        }
+        self._table = _PromptTable(prompts, latest_versions, prepared)
 
 
-def _load_prompts(manifest: dict[str, Any]) -> dict[tuple[str, str], PromptDefinition]:
+def _get_prompt(table: _PromptTable, prompt_id: str, version: str | None) -> PromptDefinition:
+    resolved_version = version or table.latest_versions.get(prompt_id)
+    if resolved_version is None:
+        raise PromptNotFound(f"Prompt id not found: {prompt_id}")
+    key = (prompt_id, resolved_version)
+    prompt = table.prompts.get(key)
+    if prompt is None:
+        raise PromptNotFound(f"Prompt not found: {prompt_id}@{resolved_version}")
+    return prompt
+
+
+def _read_manifest(path: str, shared: bool) -> Mapping[tuple[str, str], PromptDefinition]:
+    indexed = open_indexed_manifest(path)
+    if indexed is None and shared:
+        indexed = share_manifest(decode_manifest(Path(path).read_bytes()))
+    if indexed is not None:
+        return _LazyPrompts(indexed)
+    return load_prompts(decode_manifest(Path(path).read_bytes()))
+
+
+def _manifest_fingerprint(path: Path, compare: Literal["mtime", "hash"]) -> object:
+    if compare == "hash":
+        return hashlib.sha256(path.read_bytes()).digest()
+    stat = path.stat()
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+def _copy_rendered(rendered: RenderedPrompt) -> RenderedPrompt:
+    return RenderedPrompt(messages=tuple(dict(message) for message in rendered.messages))
+
+
+def _read_jinja2_cache(path: str) -> dict[tuple[str, str], CodeType]:
+    try:
+        data = Path(path).read_bytes()
+    except OSError:
+        return {}
+    from promptir.render_jinja2 import decode_jinja2_cache
+
+    return decode_jinja2_cache(data)
+
+
+def load_prompts(manifest: dict[str, Any]) -> dict[tuple[str, str], PromptDefinition]:
+    """Build every prompt of a decoded manifest dict, keyed by ``(id, version)``."""
     prompts: dict[tuple[str, str], PromptDefinition] = {}
+    contents: dict[str, str] = manifest.get("contents", {})
     for entry in manifest.get("prompts", []):
-        blocks = {
-            name: BlockSpec(optional=spec["optional"], default=spec["default"])
-            for name, spec in entry.get("blocks", {}).items()
-        }
-        messages = tuple(
-            PromptMessage(role=msg["role"], content=msg["content"])
-            for msg in entry.get("messages", [])
-        )
-        prompt = PromptDefinition(
-            id=entry["id"],
-            version=entry["version"],
-            metadata=entry["metadata"],
-            template_engine=entry["template_engine"],
-            variables=tuple(entry["variables"]),
-            blocks=blocks,
-            messages=messages,
-            hash=entry["hash"],
-        )
+        prompt = _prompt_from_entry(entry, contents)
         prompts[(prompt.id, prompt.version)] = prompt
     return prompts
 
 
-def _calculate_latest_versions(prompts: dict[tuple[str, str], PromptDefinition]) -> dict[str, str]:
+def _prompt_from_entry(entry: dict[str, Any], contents: dict[str, str]) -> PromptDefinition:
+    blocks = {
+        name: BlockSpec(optional=spec["optional"], default=spec["default"])
+        for name, spec in entry.get("blocks", {}).items()
+    }
+    messages = tuple(
+        PromptMessage(role=msg["role"], content=message_content(msg, contents))
+        for msg in entry.get("messages", [])
+    )
+    return PromptDefinition(
+        id=entry["id"],
+        version=entry["version"],
+        metadata=entry["metadata"],
+        template_engine=entry["template_engine"],
+        variables=tuple(entry["variables"]),
+        blocks=blocks,
+        messages=messages,
+        hash=entry["hash"],
+    )
+
+
+class _LazyPrompts(Mapping[tuple[str, str], PromptDefinition]):
+    """Build each PromptDefinition from an indexed manifest on first lookup."""
+
+    def __init__(self, manifest: IndexedManifest) -> None:
+        self._manifest = manifest
+        self._contents: dict[str, str] = manifest.fields.get("contents", {})
+        self._prompts: dict[tuple[str, str], PromptDefinition] = {}
+
+    def __getitem__(self, key: tuple[str, str]) -> PromptDefinition:
+        prompt = self._prompts.get(key)
+        if prompt is None:
+            prompt = _prompt_from_entry(self._manifest[key], self._contents)
+            self._prompts[key] = prompt
+        return prompt
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        return iter(self._manifest)
+
+    def __len__(self) -> int:
+        return len(self._manifest)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._manifest
+
+
+class _GeneratedPrompts(Mapping[tuple[str, str], PromptDefinition]):
+    """Build each PromptDefinition from a generated module's entries on first lookup."""
+
+    def __init__(self, entries: Mapping[tuple[str, str], tuple[Any, ...]]) -> None:
+        self._entries = entries
+        self._prompts: dict[tuple[str, str], PromptDefinition] = {}
+
+    def __getitem__(self, key: tuple[str, str]) -> PromptDefinition:
+        prompt = self._prompts.get(key)
+        if prompt is None:
+            metadata, engine, variables, blocks, messages, prompt_hash = self._entries[key]
+            prompt = PromptDefinition(
+                id=key[0],
+                version=key[1],
+                metadata=metadata,
+                template_engine=engine,
+                variables=variables,
+                blocks={
+                    name: BlockSpec(optional=optional, default=default)
+                    for name, optional, default in blocks
+                },
+                messages=tuple(PromptMessage(role=role, content=text) for role, text in messages),
+                hash=prompt_hash,
+            )
+            self._prompts[key] = prompt
+        return prompt
+
+    def __iter__(self) -> Iterator[tuple[str, str]]:
+        return iter(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __contains__(self, key: object) -> bool:
+        return key in self._entries
+
+
+def _import_generated_module(module: str | ModuleType) -> ModuleType:
+    if isinstance(module, ModuleType):
+        return module
+    if not module.endswith(".py"):
+        return importlib.import_module(module)
+    path = Path(module)
+    spec = importlib.util.spec_from_file_location(f"_promptir_generated_{path.stem}", path)
+    if spec is None or spec.loader is None:
+        raise ValueError(f"Cannot load generated prompt module: {module}")
+    loaded = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(loaded)
+    return loaded
+
+
+def _chunked(inputs: Iterable[RenderInput], size: int) -> list[list[RenderInput]]:
+    chunks: list[list[RenderInput]] = []
+    iterator = iter(inputs)
+    while chunk := list(islice(iterator, size)):
+        chunks.append(chunk)
+    return chunks
+
+
+_WORKER_PREPARED: dict[tuple[str, bool], PreparedPrompt] = {}
+
+
+def _render_chunk_in_worker(
+    prompt: PromptDefinition,
+    strict_inputs: bool,
+    pipeline: EnrichmentPipeline | None,
+    chunk: list[RenderInput],
+) -> list[RenderedPrompt]:
+    key = (prompt.hash, strict_inputs)
+    prepared = _WORKER_PREPARED.get(key)
+    if prepared is None:
+        registry = PromptRegistry(
+            {(prompt.id, prompt.version): prompt}, strict_inputs=strict_inputs
+        )
+        prepared = registry.prepare(prompt.id, version=prompt.version)
+        _WORKER_PREPARED[key] = prepared
+    return [prepared._render(vars, blocks, pipeline) for vars, blocks in chunk]
+
+
+def _calculate_latest_versions(
+    prompts: Mapping[tuple[str, str], PromptDefinition],
+) -> dict[str, str]:
     latest: dict[str, str] = {}
     for prompt_id, version in prompts:
         current = latest.get(prompt_id)
@@ -119,6 +784,30 @@ def _calculate_latest_versions(prompts: dict[tuple[str, str], PromptDefinition])
     return latest
 
 
+def _span_attributes(
+    prompt: PromptDefinition, vars: dict[str, Any] | None, blocks: dict[str, Any] | None
+) -> SpanAttributes:
+    vars = vars or {}
+    blocks = blocks or {}
+    return {
+        **prompt_attributes(prompt),
+        "promptir.input.vars": len(vars),
+        "promptir.input.blocks": len(blocks),
+        "promptir.input.chars": sum(
+            len(value) for value in (*vars.values(), *blocks.values()) if isinstance(value, str)
+        ),
+    }
+
+
+def _normalize_inputs(
+    vars: dict[str, Any] | None, blocks: dict[str, Any] | None
+) -> tuple[dict[str, str], dict[str, str]]:
+    return (
+        _normalize_values(vars) if vars else {},
+        _normalize_values(blocks) if blocks else {},
+    )
+
+
 def _normalize_values(values: dict[str, Any]) -> dict[str, str]:
     normalized: dict[str, str] = {}
     for key, value in values.items():
@@ -132,44 +821,23 @@ def _normalize_values(values: dict[str, Any]) -> dict[str, str]:
 
 
 def _validate_inputs(
-    prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    required_vars: frozenset[str],
+    block_names: frozenset[str],
+    vars: dict[str, str],
+    blocks: dict[str, str],
 ) -> None:
-    missing_vars = prompt.required_vars - set(vars.keys())
-    if missing_vars:
-        raise PromptInputError(f"Missing required vars: {sorted(missing_vars)}")
-    extra_vars = set(vars.keys()) - prompt.required_vars
-    if extra_vars:
+    if vars.keys() != required_vars:
+        missing_vars = required_vars - vars.keys()
+        if missing_vars:
+            raise PromptInputError(f"Missing required vars: {sorted(missing_vars)}")
+        extra_vars = vars.keys() - required_vars
         raise PromptInputError(f"Extra vars provided: {sorted(extra_vars)}")
-    extra_blocks = set(blocks.keys()) - prompt.block_names
-    if extra_blocks:
+    if blocks and not blocks.keys() <= block_names:
+        extra_blocks = blocks.keys() - block_names
         raise PromptInputError(f"Extra blocks provided: {sorted(extra_blocks)}")
 
 
-def _apply_block_defaults(prompt: PromptDefinition, blocks: dict[str, str]) -> dict[str, str]:
-    merged = dict(blocks)
-    for name, spec in prompt.blocks.items():
-        if name in merged:
-            continue
-        if spec.optional:
-            merged[name] = spec.default if spec.default is not None else ""
-        else:
-            raise PromptInputError(f"Missing required block: {name}")
-    return merged
-
-
-def _validate_enriched_blocks(prompt: PromptDefinition, blocks: dict[str, str]) -> None:
-    extra = set(blocks.keys()) - prompt.block_names
-    if extra:
+def _validate_enriched_blocks(block_names: frozenset[str], blocks: dict[str, str]) -> None:
+    if not blocks.keys() <= block_names:
+        extra = blocks.keys() - block_names
         raise PromptInputError(f"Enrichers introduced undeclared blocks: {sorted(extra)}")
-
-
-def _render_message(
-    prompt: PromptDefinition, message: PromptMessage, values: dict[str, str]
-) -> str:
-    if prompt.template_engine == "simple":
-        return render_simple(message.content, values)
-    if prompt.template_engine == "jinja2_sandbox":
-        return render_jinja2(message.content, values)
-    raise PromptInputError(
-        f"Unknown template_engine '{prompt.template_engine}' for {prompt.id}@{prompt.version}"
-    )
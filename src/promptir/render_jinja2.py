@@ -2,14 +2,25 @@
 
 from __future__ import annotations
 
+import importlib.util
+import marshal
 from collections.abc import Mapping
+from types import CodeType
 
-from jinja2 import StrictUndefined
+import jinja2
+from jinja2 import StrictUndefined, Template
 from jinja2.sandbox import SandboxedEnvironment
 
+# Marshalled code objects only load on the interpreter that wrote them, so the
+# header carries the bytecode magic number next to the sidecar format version.
+_JINJA2_CACHE_VERSION = 1
+_JINJA2_CACHE_MAGIC = b"PIRJ" + bytes([_JINJA2_CACHE_VERSION]) + importlib.util.MAGIC_NUMBER
 
-def render_jinja2(template: str, values: Mapping[str, str]) -> str:
-    """Render a template using a locked-down sandbox environment."""
+Jinja2CodeTable = dict[tuple[str, str], CodeType]
+
+
+def create_sandbox_environment() -> SandboxedEnvironment:
+    """Build the locked-down sandbox environment used for jinja2_sandbox prompts."""
     env = SandboxedEnvironment(
         undefined=StrictUndefined,
         autoescape=False,
@@ -19,4 +30,49 @@ def render_jinja2(template: str, values: Mapping[str, str]) -> str:
     env.globals = {}
     env.filters = {}
     env.tests = {}
-    return env.from_string(template).render(**values)
+    return env
+
+
+def compile_jinja2(env: SandboxedEnvironment, template: str) -> Template:
+    """Compile template source once so it can be rendered many times."""
+    return env.from_string(template)
+
+
+def load_jinja2_code(env: SandboxedEnvironment, code: str | CodeType) -> Template:
+    """Build a template from ``env.compile`` output, as Python source or a code object."""
+    if isinstance(code, str):
+        code = compile(code, "<template>", "exec")
+    return env.template_class.from_code(env, code, env.make_globals(None))
+
+
+def render_jinja2(template: str, values: Mapping[str, str]) -> str:
+    """Render a template using a locked-down sandbox environment."""
+    env = create_sandbox_environment()
+    return compile_jinja2(env, template).render(**values)
+
+
+def compile_jinja2_code(env: SandboxedEnvironment, template: str) -> CodeType:
+    """Parse template source and return the code object ``load_jinja2_code`` accepts."""
+    return env.compile(template)
+
+
+def encode_jinja2_cache(codes: Mapping[tuple[str, str], CodeType]) -> bytes:
+    """Serialize compiled templates keyed by ``(prompt hash, role)`` for a sidecar file."""
+    return _JINJA2_CACHE_MAGIC + marshal.dumps((jinja2.__version__, dict(codes)))
+
+
+def decode_jinja2_cache(data: bytes) -> Jinja2CodeTable:
+    """Deserialize ``encode_jinja2_cache`` output.
+
+    Data written by another Python or jinja2 version, or that does not decode,
+    yields an empty table so templates are parsed from source instead.
+    """
+    if not data.startswith(_JINJA2_CACHE_MAGIC):
+        return {}
+    try:
+        version, codes = marshal.loads(data[len(_JINJA2_CACHE_MAGIC) :])
+    except (EOFError, TypeError, ValueError):
+        return {}
+    if version != jinja2.__version__ or not isinstance(codes, dict):
+        return {}
+    return codes
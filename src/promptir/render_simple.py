@@ -7,12 +7,26 @@ from collections.abc import Mapping
 
 _TOKEN_PATTERN = re.compile(r"{{\s*([a-zA-Z_][a-zA-Z0-9_]*)\s*}}")
 
+# Alternating literal text and variable names: (literal, name, literal, ..., literal).
+SimplePlan = tuple[str, ...]
+
+
+def compile_simple(template: str) -> SimplePlan:
+    """Split a template into a plan of literal segments and variable slots."""
+    return tuple(_TOKEN_PATTERN.split(template))
 
-def render_simple(template: str, values: Mapping[str, str]) -> str:
-    """Render simple templates by replacing {{var}} tokens."""
 
-    def replace(match: re.Match[str]) -> str:
-        key = match.group(1)
-        return values.get(key, "")
+def render_simple_plan(plan: SimplePlan, values: Mapping[str, str]) -> str:
+    """Render a precompiled plan without scanning the template text."""
+    if len(plan) == 1:
+        return plan[0]
+    parts = list(plan)
+    get = values.get
+    for index in range(1, len(parts), 2):
+        parts[index] = get(parts[index], "")
+    return "".join(parts)
 
-    return _TOKEN_PATTERN.sub(replace, template)
+
+def render_simple(template: str, values: Mapping[str, str]) -> str:
+    """Render simple templates by replacing {{var}} tokens."""
+    return render_simple_plan(compile_simple(template), values)
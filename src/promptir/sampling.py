@@ -0,0 +1,166 @@
+"""Opt-in capture of slow or randomly sampled renders for offline analysis."""
+
+from __future__ import annotations
+
+import cProfile
+import io
+import json
+import pstats
+import random
+import threading
+import time
+from collections import deque
+from collections.abc import Callable, Mapping
+from dataclasses import asdict, dataclass, field
+from pathlib import Path
+from typing import Any, Literal
+
+from promptir.metrics import RenderTimer
+from promptir.models import PromptDefinition
+
+# Lines of pstats output (sorted by cumulative time) kept per profiled render.
+_PROFILE_LINES = 30
+
+
+@dataclass(frozen=True)
+class RenderSample:
+    prompt_id: str
+    version: str
+    hash: str
+    # Wall-clock time (seconds since the epoch) at which the render finished.
+    timestamp: float
+    duration: float
+    reason: Literal["slow", "sampled"]
+    phases: dict[str, float] = field(default_factory=dict)
+    # UTF-8 size of each var and block as passed to render, before normalization.
+    input_bytes: dict[str, int] = field(default_factory=dict)
+    cache_hit: bool = False
+    error: str | None = None
+    profile: str | None = None
+
+
+class SampleProbe:
+    """Per-render sampling decision, made before the render starts."""
+
+    __slots__ = ("profiler", "sampled")
+
+    def __init__(self, sampled: bool, profiler: cProfile.Profile | None) -> None:
+        self.sampled = sampled
+        self.profiler = profiler
+
+
+class RenderSampler:
+    """Keeps the most recent slow or sampled renders in a bounded ring buffer.
+
+    A render is recorded when it takes at least ``threshold`` seconds or when it is
+    picked at random with probability ``sample_rate``. Each sample carries the
+    render's phase timings and input sizes. With ``profile``, synchronous renders
+    also run under cProfile: only the sampled ones when there is no ``threshold``,
+    every render otherwise, since slowness is known only once a render ends.
+    """
+
+    def __init__(
+        self,
+        *,
+        threshold: float | None = None,
+        sample_rate: float = 0.0,
+        capacity: int = 256,
+        profile: bool = False,
+        rng: Callable[[], float] = random.random,
+    ) -> None:
+        if threshold is not None and threshold < 0:
+            raise ValueError("threshold must not be negative")
+        if not 0.0 <= sample_rate <= 1.0:
+            raise ValueError("sample_rate must be between 0 and 1")
+        if threshold is None and sample_rate == 0.0:
+            raise ValueError("set a threshold, a sample_rate or both")
+        if capacity < 1:
+            raise ValueError("capacity must be at least 1")
+        self.threshold = threshold
+        self.sample_rate = sample_rate
+        self.profile = profile
+        self._rng = rng
+        self._samples: deque[RenderSample] = deque(maxlen=capacity)
+        self._lock = threading.Lock()
+
+    def begin(self, *, profile: bool = True) -> SampleProbe | None:
+        """Decide whether the next render is sampled and start profiling it if needed."""
+        sampled = self.sample_rate > 0.0 and self._rng() < self.sample_rate
+        profiler = None
+        if profile and self.profile and (sampled or self.threshold is not None):
+            profiler = cProfile.Profile()
+            try:
+                profiler.enable()
+            except ValueError:
+                # Another profiler is active, e.g. a concurrent render on 3.12+.
+                profiler = None
+        if not sampled and profiler is None:
+            return None
+        return SampleProbe(sampled, profiler)
+
+    def finish(
+        self,
+        probe: SampleProbe | None,
+        prompt: PromptDefinition,
+        timer: RenderTimer,
+        vars: Mapping[str, Any] | None,
+        blocks: Mapping[str, Any] | None,
+        error: BaseException | None,
+    ) -> None:
+        profiler = probe.profiler if probe is not None else None
+        if profiler is not None:
+            profiler.disable()
+        duration = sum(seconds for _, seconds in timer.phases)
+        if self.threshold is not None and duration >= self.threshold:
+            reason: Literal["slow", "sampled"] = "slow"
+        elif probe is not None and probe.sampled:
+            reason = "sampled"
+        else:
+            return
+        sample = RenderSample(
+            prompt_id=prompt.id,
+            version=prompt.version,
+            hash=prompt.hash,
+            timestamp=time.time(),
+            duration=duration,
+            reason=reason,
+            phases=dict(timer.phases),
+            input_bytes={**_input_bytes(vars), **_input_bytes(blocks)},
+            cache_hit=timer.cache_hit,
+            error=f"{type(error).__name__}: {error}" if error is not None else None,
+            profile=_format_profile(profiler) if profiler is not None else None,
+        )
+        with self._lock:
+            self._samples.append(sample)
+
+    def samples(self) -> list[RenderSample]:
+        """Return the buffered samples, oldest first."""
+        with self._lock:
+            return list(self._samples)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._samples.clear()
+
+    def dump_jsonl(self, path: str | Path) -> int:
+        """Write the buffered samples to ``path`` as JSON lines; return how many."""
+        samples = self.samples()
+        with open(path, "w", encoding="utf-8") as handle:
+            for sample in samples:
+                handle.write(json.dumps(asdict(sample), sort_keys=True) + "\n")
+        return len(samples)
+
+
+def _input_bytes(values: Mapping[str, Any] | None) -> dict[str, int]:
+    if not values:
+        return {}
+    return {
+        name: len(("" if value is None else str(value)).encode("utf-8", "surrogatepass"))
+        for name, value in values.items()
+    }
+
+
+def _format_profile(profiler: cProfile.Profile) -> str:
+    stream = io.StringIO()
+    pstats.Stats(profiler, stream=stream).sort_stats("cumulative").print_stats(_PROFILE_LINES)
+    return stream.getvalue()
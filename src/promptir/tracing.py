@@ -0,0 +1,110 @@
+"""Pluggable tracing hooks for render, enrichment and compile phases.
+
+promptir depends on no tracing SDK. Install any object implementing ``Tracer`` with
+``set_tracer``; spans are opened through it around each phase and nest via a context
+variable, so they follow asyncio tasks and the enrichment thread pool. With no
+tracer installed, instrumented code skips all span bookkeeping.
+"""
+
+from __future__ import annotations
+
+import contextvars
+from collections.abc import Callable, Mapping
+from types import TracebackType
+from typing import Protocol, TypeVar
+
+from promptir.models import PromptDefinition
+
+SpanAttributes = Mapping[str, str | int | float | bool]
+T = TypeVar("T")
+
+
+class Tracer(Protocol):
+    def start_span(self, name: str, attributes: SpanAttributes, parent: object | None) -> object:
+        """Start a span and return a handle; ``parent`` is the enclosing promptir span."""
+        ...
+
+    def end_span(self, span: object, error: BaseException | None) -> None:
+        """End a span returned by ``start_span``; ``error`` is set when the phase raised."""
+        ...
+
+
+_tracer: Tracer | None = None
+_current_span: contextvars.ContextVar[object | None] = contextvars.ContextVar(
+    "promptir_current_span", default=None
+)
+
+
+def set_tracer(tracer: Tracer | None) -> None:
+    """Install ``tracer`` process-wide, or remove the current one with None."""
+    global _tracer
+    _tracer = tracer
+
+
+def get_tracer() -> Tracer | None:
+    return _tracer
+
+
+def current_span() -> object | None:
+    """Return the innermost open promptir span in this context, if any."""
+    return _current_span.get()
+
+
+class OpenSpan:
+    """A started span that is also the current span until ``end`` is called."""
+
+    __slots__ = ("_span", "_token", "_tracer")
+
+    def __init__(self, tracer: Tracer, name: str, attributes: SpanAttributes) -> None:
+        self._tracer = tracer
+        self._span = tracer.start_span(name, attributes, _current_span.get())
+        self._token = _current_span.set(self._span)
+
+    def end(self, error: BaseException | None = None) -> None:
+        _current_span.reset(self._token)
+        self._tracer.end_span(self._span, error)
+
+
+class span:
+    """Context manager for one span; a no-op when ``tracer`` is None."""
+
+    __slots__ = ("_attributes", "_name", "_open", "_tracer")
+
+    def __init__(self, tracer: Tracer | None, name: str, attributes: SpanAttributes) -> None:
+        self._tracer = tracer
+        self._name = name
+        self._attributes = attributes
+        self._open: OpenSpan | None = None
+
+    def __enter__(self) -> None:
+        if self._tracer is not None:
+            self._open = OpenSpan(self._tracer, self._name, self._attributes)
+
+    def __exit__(
+        self,
+        exc_type: type[BaseException] | None,
+        exc: BaseException | None,
+        traceback: TracebackType | None,
+    ) -> None:
+        if self._open is not None:
+            self._open.end(exc)
+
+
+def bind_context(func: Callable[..., T]) -> Callable[..., T]:
+    """Run ``func`` in a copy of the current context, e.g. on a worker thread."""
+    if _tracer is None:
+        return func
+    context = contextvars.copy_context()
+
+    def run(*args: object) -> T:
+        return context.run(func, *args)
+
+    return run
+
+
+def prompt_attributes(prompt: PromptDefinition) -> dict[str, str | int | float | bool]:
+    return {
+        "promptir.prompt.id": prompt.id,
+        "promptir.prompt.version": prompt.version,
+        "promptir.prompt.hash": prompt.hash,
+    }
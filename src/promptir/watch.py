@@ -0,0 +1,155 @@
+"""Watch a prompt tree and recompile only the prompts affected by each change."""
+
+from __future__ import annotations
+
+import threading
+from collections.abc import Callable
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any
+
+from promptir.compiler import (
+    PromptDocument,
+    assemble_manifest,
+    collect_prompt_files,
+    compile_prompt_file,
+    write_manifest,
+)
+from promptir.errors import PromptCompileError
+from promptir.manifest import ManifestFormat
+
+
+@dataclass(frozen=True)
+class WatchResult:
+    recompiled: tuple[str, ...]
+    errors: tuple[str, ...]
+    written: bool
+
+
+class PromptWatcher:
+    """Poll a prompt tree by mtime and keep its manifest up to date.
+
+    A reverse index maps each ``_includes/<name>/<version>.md`` reference to the
+    prompts that include it, so an edited include only recompiles its dependents.
+    The manifest is rewritten atomically, and only when every prompt compiles.
+    """
+
+    def __init__(
+        self,
+        src_root: str,
+        out_path: str,
+        *,
+        manifest_format: ManifestFormat = "json",
+        dedupe_includes: bool = False,
+    ) -> None:
+        self._src_path = Path(src_root)
+        self._out_path = out_path
+        self._manifest_format: ManifestFormat = manifest_format
+        self._dedupe_includes = dedupe_includes
+        self._mtimes: dict[Path, int] = {}
+        self._entries: dict[Path, dict[str, Any]] = {}
+        self._includes_of: dict[Path, tuple[str, ...]] = {}
+        self._dependents: dict[str, set[Path]] = {}
+        self._failed: dict[Path, str] = {}
+        self._include_table: dict[str, PromptDocument] = {}
+
+    def dependents(self, include_ref: str) -> frozenset[Path]:
+        """Return the prompt files that currently include ``include_ref``."""
+        return frozenset(self._dependents.get(include_ref, ()))
+
+    def poll(self) -> WatchResult | None:
+        """Rescan the tree; return None when nothing changed since the last poll."""
+        if not self._src_path.exists():
+            raise PromptCompileError(f"Source root not found: {self._src_path}")
+        prompt_files = set(collect_prompt_files(self._src_path))
+        include_dir = self._src_path / "_includes"
+        include_files = set(include_dir.glob("*/*.md")) if include_dir.is_dir() else set()
+        mtimes = _stat_mtimes(prompt_files | include_files)
+        changed = {path for path, mtime in mtimes.items() if self._mtimes.get(path) != mtime}
+        changed |= self._mtimes.keys() - mtimes.keys()
+        if not changed:
+            return None
+        self._mtimes = mtimes
+
+        changed_refs = {
+            self._include_ref(path) for path in changed if path.is_relative_to(include_dir)
+        }
+        affected = {path for path in changed if path in prompt_files}
+        for ref in changed_refs:
+            self._include_table.pop(ref, None)
+            affected |= self._dependents.get(ref, set())
+        if changed_refs:
+            affected |= self._failed.keys()
+        for path in (self._entries.keys() | self._failed.keys()) - prompt_files:
+            self._forget(path)
+
+        recompiled: list[str] = []
+        for path in sorted(affected & prompt_files):
+            self._forget(path)
+            try:
+                entry, include_refs = compile_prompt_file(path, self._src_path, self._include_table)
+            except PromptCompileError as exc:
+                self._failed[path] = str(exc)
+                continue
+            except Exception as exc:
+                # A half-saved file must not stop the watch loop; report it like a
+                # compile error and retry when the tree changes again.
+                self._failed[path] = f"Failed to compile {path}: {exc!r}"
+                continue
+            self._entries[path] = entry
+            self._includes_of[path] = tuple(include_refs)
+            for ref in include_refs:
+                self._dependents.setdefault(ref, set()).add(path)
+            recompiled.append(path.relative_to(self._src_path).as_posix())
+
+        if self._failed:
+            errors = tuple(self._failed[path] for path in sorted(self._failed))
+            return WatchResult(tuple(recompiled), errors, written=False)
+        compiled_files = [
+            (path, self._entries[path], self._includes_of[path]) for path in sorted(self._entries)
+        ]
+        manifest = assemble_manifest(
+            compiled_files,
+            self._src_path,
+            self._include_table,
+            dedupe_includes=self._dedupe_includes,
+        )
+        write_manifest(self._out_path, manifest, self._manifest_format)
+        return WatchResult(tuple(recompiled), (), written=True)
+
+    def run(
+        self,
+        *,
+        interval: float = 0.5,
+        stop: threading.Event | None = None,
+        on_result: Callable[[WatchResult], None] | None = None,
+    ) -> None:
+        """Poll every ``interval`` seconds until ``stop`` is set."""
+        stop = stop or threading.Event()
+        while not stop.is_set():
+            result = self.poll()
+            if result is not None and on_result is not None:
+                on_result(result)
+            stop.wait(interval)
+
+    def _forget(self, path: Path) -> None:
+        self._entries.pop(path, None)
+        self._failed.pop(path, None)
+        for ref in self._includes_of.pop(path, ()):
+            dependents = self._dependents.get(ref)
+            if dependents is not None:
+                dependents.discard(path)
+
+    def _include_ref(self, path: Path) -> str:
+        _, name, version_file = path.relative_to(self._src_path).parts
+        return f"{name}@{version_file.removesuffix('.md')}"
+
+
+def _stat_mtimes(paths: set[Path]) -> dict[Path, int]:
+    mtimes: dict[Path, int] = {}
+    for path in paths:
+        try:
+            mtimes[path] = path.stat().st_mtime_ns
+        except FileNotFoundError:
+            continue
+    return mtimes
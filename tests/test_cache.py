@@ -0,0 +1,69 @@
+from __future__ import annotations
+
+import pytest
+
+from promptir.cache import CacheStats, LRUCache, approximate_size, digest_values
+
+
+class _Clock:
+    def __init__(self) -> None:
+        self.now = 0.0
+
+    def __call__(self) -> float:
+        return self.now
+
+
+def test_lru_cache_evicts_least_recently_used() -> None:
+    cache: LRUCache[str, str] = LRUCache(max_entries=2)
+    cache.put("a", "1")
+    cache.put("b", "2")
+    assert cache.get("a") == "1"
+    cache.put("c", "3")
+    assert cache.get("b") is None
+    assert cache.keys() == ["a", "c"]
+    assert cache.stats() == CacheStats(hits=1, misses=1, evictions=1, entries=2)
+
+
+def test_lru_cache_ttl_and_byte_budget() -> None:
+    clock = _Clock()
+    cache: LRUCache[str, str] = LRUCache(max_entries=None, max_bytes=10, ttl=5, clock=clock)
+    cache.put("a", "12345")
+    cache.put("b", "12345")
+    assert cache.stats().bytes == 10
+    cache.put("c", "123")
+    assert cache.get("a") is None
+    cache.put("huge", "x" * 11)
+    assert cache.get("huge") is None
+    clock.now = 5
+    assert cache.get("b") is None
+    stats = cache.stats()
+    assert stats.expirations == 1
+    assert stats.evictions == 1
+    assert stats.entries == 1
+    cache.discard("c")
+    cache.clear()
+    assert len(cache) == 0
+    assert cache.stats().bytes == 0
+
+
+def test_lru_cache_rejects_invalid_limits() -> None:
+    with pytest.raises(ValueError, match="max_entries"):
+        LRUCache(max_entries=0)
+    with pytest.raises(ValueError, match="max_bytes"):
+        LRUCache(max_bytes=0)
+    with pytest.raises(ValueError, match="ttl"):
+        LRUCache(ttl=0)
+
+
+def test_digest_values_respects_names_and_mapping_boundaries() -> None:
+    base = digest_values({"a": "1", "b": "2"}, {"_c": "3"})
+    assert base == digest_values({"b": "2", "a": "1"}, {"_c": "3"})
+    assert base != digest_values({"a": "1"}, {"b": "2", "_c": "3"})
+    assert digest_values({"a": "1", "b": "2"}, names={"a"}) == digest_values(
+        {"a": "1", "b": "other"}, names={"a"}
+    )
+
+
+def test_approximate_size() -> None:
+    assert approximate_size({"ab": ("cd", ["e"])}) == 5
+    assert approximate_size(CacheStats()) > 0
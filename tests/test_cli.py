@@ -44,6 +44,42 @@ Hi.
     assert main() == 0
     assert out_path.exists()
 
+    cache_path = tmp_path / "dist" / "build-cache.json"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "promptir",
+            "compile",
+            "--src",
+            str(src_root),
+            "--out",
+            str(out_path),
+            "--cache",
+            str(cache_path),
+        ],
+    )
+    assert main() == 0
+    assert cache_path.exists()
+
+    binary_path = tmp_path / "dist" / "manifest.bin"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "promptir",
+            "compile",
+            "--src",
+            str(src_root),
+            "--out",
+            str(binary_path),
+            "--format",
+            "binary",
+        ],
+    )
+    assert main() == 0
+    assert binary_path.read_bytes().startswith(b"PIRM")
+
 
 def test_cli_compile_failure(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     src_root = tmp_path / "src" / "llm" / "prompts"
@@ -74,6 +110,51 @@ Bad.
     assert main() == 1
 
 
+def test_cli_compile_watch(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch, capsys: pytest.CaptureFixture[str]
+) -> None:
+    from promptir.watch import PromptWatcher, WatchResult
+
+    src_root = tmp_path / "prompts"
+    _write_prompt(
+        src_root / "hello" / "v1.md",
+        """---
+{"id": "hello", "version": "v1", "metadata": {}, "variables": []}
+---
+# system
+Hello.
+
+# user
+Hi.
+""",
+    )
+    out_path = tmp_path / "dist" / "manifest.json"
+    original_poll = PromptWatcher.poll
+    polls: list[int] = []
+
+    def poll_once(self: PromptWatcher) -> WatchResult | None:
+        if polls:
+            raise KeyboardInterrupt
+        polls.append(1)
+        return original_poll(self)
+
+    monkeypatch.setattr(PromptWatcher, "poll", poll_once)
+    argv = ["promptir", "compile", "--src", str(src_root), "--out", str(out_path)]
+    monkeypatch.setattr(sys, "argv", [*argv, "--watch", "--interval", "0"])
+    assert main() == 0
+    assert out_path.exists()
+    assert "1 prompts recompiled" in capsys.readouterr().err
+
+    _write_prompt(src_root / "bad" / "v1.md", "no front matter")
+    polls.clear()
+    assert main() == 0
+    assert "Compile error:" in capsys.readouterr().err
+
+    monkeypatch.setattr(PromptWatcher, "poll", original_poll)
+    monkeypatch.setattr(sys, "argv", [*argv[:3], str(tmp_path / "missing"), *argv[4:], "--watch"])
+    assert main() == 1
+
+
 def test_cli_demo_run(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
     src_root = tmp_path / "src" / "llm" / "prompts"
     prompt_path = src_root / "hello" / "v1.md"
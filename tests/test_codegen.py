@@ -0,0 +1,178 @@
+from __future__ import annotations
+
+import importlib
+import json
+import math
+import sys
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from promptir.cli import main
+from promptir.codegen import generate_python_module, write_python_module
+from promptir.compiler import compile_prompts
+from promptir.registry import PromptRegistry
+
+
+def _write(path: Path, frontmatter: dict[str, Any], body: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"---\n{json.dumps(frontmatter)}\n---\n{body}", encoding="utf-8")
+
+
+def _write_tree(root: Path) -> None:
+    _write(
+        root / "_includes" / "policy" / "v1.md",
+        {"id": "policy", "version": "v1", "metadata": {}, "variables": []},
+        '# system\nFollow policy {braces} and "quotes" with a \\ backslash.\n',
+    )
+    _write(
+        root / "planner" / "v1.md",
+        {
+            "id": "planner",
+            "version": "v1",
+            "metadata": {"owner": "core", "tags": ["a", None, True, 1.5]},
+            "variables": ["question"],
+            "includes": ["policy@v1"],
+            "blocks": {"_context": {"optional": True, "default": "none"}},
+        },
+        "# system\nPlan carefully. Ünïcode ✓\n\n"
+        "# user\nQ: {{ question }}\n'ctx': {{_context}}\t}}{{\n",
+    )
+    _write(
+        root / "sandboxed" / "v1.md",
+        {
+            "id": "sandboxed",
+            "version": "v1",
+            "metadata": {},
+            "variables": ["question"],
+            "template_engine": "jinja2_sandbox",
+        },
+        "# system\nSandboxed.\n\n"
+        "# user\n{% if question %}Q: {{ question }}{% else %}none{% endif %}\n",
+    )
+
+
+def _compile(tmp_path: Path, *, dedupe_includes: bool = False) -> tuple[Path, Path]:
+    _write_tree(tmp_path / "prompts")
+    manifest_path = tmp_path / "manifest.json"
+    manifest = compile_prompts(
+        str(tmp_path / "prompts"), str(manifest_path), dedupe_includes=dedupe_includes
+    )
+    module_path = tmp_path / "prompts_gen.py"
+    write_python_module(manifest, str(module_path))
+    return manifest_path, module_path
+
+
+INPUTS: list[tuple[str, dict[str, Any], dict[str, Any] | None]] = [
+    ("planner", {"question": "Why {not}?"}, None),
+    ("planner", {"question": 'a "b" \\ c'}, {"_context": "ctx\n"}),
+    ("sandboxed", {"question": "Why?"}, None),
+    ("sandboxed", {"question": ""}, None),
+]
+
+
+@pytest.mark.parametrize("dedupe_includes", [False, True])
+def test_generated_module_renders_like_the_manifest(tmp_path: Path, dedupe_includes: bool) -> None:
+    manifest_path, module_path = _compile(tmp_path, dedupe_includes=dedupe_includes)
+    from_manifest = PromptRegistry.from_manifest_path(str(manifest_path))
+    from_module = PromptRegistry.from_module(str(module_path))
+
+    assert set(from_module._table.prompts) == set(from_manifest._table.prompts)  # pyright: ignore[reportPrivateUsage]
+    for prompt_id, vars, blocks in INPUTS:
+        assert from_module.prepare(prompt_id).prompt == from_manifest.prepare(prompt_id).prompt
+        assert from_module.render(prompt_id, vars=vars, blocks=blocks) == from_manifest.render(
+            prompt_id, vars=vars, blocks=blocks
+        )
+
+
+def test_non_strict_render_fills_missing_names(tmp_path: Path) -> None:
+    manifest_path, module_path = _compile(tmp_path)
+    from_manifest = PromptRegistry.from_manifest_path(str(manifest_path), strict_inputs=False)
+    from_module = PromptRegistry.from_module(str(module_path), strict_inputs=False)
+
+    assert from_module.render("planner") == from_manifest.render("planner")
+
+
+def test_generated_renderers_skip_generic_dispatch_and_jinja2_parsing(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    from jinja2.sandbox import SandboxedEnvironment
+
+    _compile(tmp_path)
+    monkeypatch.syspath_prepend(str(tmp_path))
+    module = importlib.import_module("prompts_gen")
+    try:
+        registry = PromptRegistry.from_module(module)
+        by_name = PromptRegistry.from_module("prompts_gen")
+        prompts = by_name._table.prompts  # pyright: ignore[reportPrivateUsage]
+        assert len(prompts) == 2 and ("planner", "v1") in prompts
+
+        def fail_parse(*args: object, **kwargs: object) -> None:
+            raise AssertionError("template source parsed at runtime")
+
+        monkeypatch.setattr(SandboxedEnvironment, "_parse", fail_parse)
+        prepared = registry.prepare("planner")
+        renderers = tuple(renderer for _, renderer in prepared._messages)  # pyright: ignore[reportPrivateUsage]
+        assert renderers == module.RENDERERS[prepared.prompt.hash]
+        rendered = registry.render("sandboxed", vars={"question": "x"})
+        assert rendered.messages[1]["content"] == "Q: x"
+    finally:
+        sys.modules.pop("prompts_gen", None)
+
+
+def test_generated_module_is_valid_python_for_an_empty_manifest() -> None:
+    source = generate_python_module({"schema_version": 1, "prompts": []})
+
+    namespace: dict[str, Any] = {}
+    exec(compile(source, "<generated>", "exec"), namespace)
+    assert namespace["PROMPTS"] == {} and namespace["RENDERERS"] == {}
+
+
+def test_generated_module_keeps_non_finite_metadata(tmp_path: Path) -> None:
+    metadata = {"scores": [float("nan"), float("inf")], "floor": float("-inf")}
+    _write(
+        tmp_path / "prompts" / "scored" / "v1.md",
+        {"id": "scored", "version": "v1", "metadata": metadata, "variables": []},
+        "# system\nScored.\n\n# user\nHi.\n",
+    )
+    manifest = compile_prompts(str(tmp_path / "prompts"), str(tmp_path / "manifest.json"))
+    module_path = tmp_path / "scored_gen.py"
+    write_python_module(manifest, str(module_path))
+
+    loaded = PromptRegistry.from_module(str(module_path)).prepare("scored").prompt.metadata
+    assert math.isnan(loaded["scores"][0])
+    assert loaded["scores"][1] == float("inf") and loaded["floor"] == float("-inf")
+
+
+def test_from_module_rejects_other_codegen_versions(tmp_path: Path) -> None:
+    module_path = tmp_path / "stale.py"
+    module_path.write_text("CODEGEN_VERSION = 0\nPROMPTS = {}\n", encoding="utf-8")
+
+    with pytest.raises(ValueError, match="regenerate"):
+        PromptRegistry.from_module(str(module_path))
+
+
+def test_cli_emit_python(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    _write_tree(tmp_path / "prompts")
+    module_path = tmp_path / "out" / "prompts_gen.py"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "promptir",
+            "compile",
+            "--src",
+            str(tmp_path / "prompts"),
+            "--out",
+            str(tmp_path / "out" / "manifest.json"),
+            "--emit-python",
+            str(module_path),
+        ],
+    )
+
+    assert main() == 0
+    registry = PromptRegistry.from_module(str(module_path))
+    assert (
+        registry.render("planner", vars={"question": "Q"}).messages[1]["content"].startswith("Q: Q")
+    )
@@ -1,12 +1,19 @@
 from __future__ import annotations
 
 import json
+import os
+import threading
 from pathlib import Path
+from typing import Any
 
 import pytest
 
+from promptir import compiler
 from promptir.compiler import compile_prompts
 from promptir.errors import PromptCompileError
+from promptir.manifest import MANIFEST_FORMATS
+from promptir.registry import PromptRegistry, load_prompts
+from promptir.watch import PromptWatcher, WatchResult
 
 
 def _write_prompt(path: Path, content: str) -> None:
@@ -159,3 +166,393 @@ Hi.
     )
     with pytest.raises(PromptCompileError, match="Invalid template_engine"):
         compile_prompts(str(src_root), str(tmp_path / "out.json"))
+
+
+def _write_include_tree(src_root: Path) -> None:
+    _write_prompt(
+        src_root / "_includes" / "policy" / "v1.md",
+        """---
+{"id": "policy", "version": "v1", "metadata": {}, "variables": []}
+---
+# system
+Follow policy.
+""",
+    )
+    for prompt_id, includes in (("alpha", '["policy@v1"]'), ("beta", "[]")):
+        _write_prompt(
+            src_root / prompt_id / "v1.md",
+            f"""---
+{{"id": "{prompt_id}", "version": "v1", "metadata": {{}}, "variables": ["question"],
+  "includes": {includes}}}
+---
+# system
+You are {prompt_id}.
+
+# user
+{{{{question}}}}
+""",
+        )
+
+
+def test_compile_build_cache_reuses_unchanged_prompts(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    src_root = tmp_path / "prompts"
+    _write_include_tree(src_root)
+    out_path = tmp_path / "dist" / "manifest.json"
+    cache_path = tmp_path / "dist" / "build-cache.json"
+    first = compile_prompts(str(src_root), str(out_path), cache_path=str(cache_path))
+    first_bytes = out_path.read_bytes()
+
+    compiled: list[str] = []
+    original = compiler.compile_prompt_file
+
+    def tracking(
+        prompt_file: Path, src_path: Path, include_table: dict[str, Any]
+    ) -> tuple[dict[str, Any], list[str]]:
+        compiled.append(prompt_file.parent.name)
+        return original(prompt_file, src_path, include_table)
+
+    monkeypatch.setattr(compiler, "compile_prompt_file", tracking)
+    assert compile_prompts(str(src_root), str(out_path), cache_path=str(cache_path)) == first
+    assert out_path.read_bytes() == first_bytes
+    assert compiled == []
+
+    include_path = src_root / "_includes" / "policy" / "v1.md"
+    include_path.write_text(
+        include_path.read_text(encoding="utf-8").replace("policy.", "the new policy."),
+        encoding="utf-8",
+    )
+    manifest = compile_prompts(str(src_root), str(out_path), cache_path=str(cache_path))
+    assert compiled == ["alpha"]
+    assert "the new policy" in manifest["prompts"][0]["messages"][0]["content"]
+
+    compiled.clear()
+    beta_path = src_root / "beta" / "v1.md"
+    beta_path.write_text(beta_path.read_text(encoding="utf-8") + "Thanks.\n", encoding="utf-8")
+    compile_prompts(str(src_root), str(out_path), cache_path=str(cache_path))
+    assert compiled == ["beta"]
+
+
+def test_compile_build_cache_hits_are_byte_identical(tmp_path: Path) -> None:
+    src_root = tmp_path / "prompts"
+    _write_include_tree(src_root)
+    for manifest_format in ("binary", "indexed"):
+        fresh_path = tmp_path / f"fresh.{manifest_format}"
+        cached_path = tmp_path / f"cached.{manifest_format}"
+        cache_path = tmp_path / f"build-cache.{manifest_format}.json"
+        compile_prompts(str(src_root), str(fresh_path), manifest_format=manifest_format)
+        for _ in range(2):
+            compile_prompts(
+                str(src_root),
+                str(cached_path),
+                manifest_format=manifest_format,
+                cache_path=str(cache_path),
+            )
+            assert cached_path.read_bytes() == fresh_path.read_bytes()
+
+
+def test_compile_without_cache_path_skips_digests(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    src_root = tmp_path / "prompts"
+    _write_include_tree(src_root)
+    expected = compile_prompts(str(src_root), str(tmp_path / "expected.json"))
+
+    def fail(*args: object) -> str:
+        raise AssertionError("digested without a build cache")
+
+    monkeypatch.setattr(compiler, "_file_digest", fail)
+    monkeypatch.setattr(compiler, "_include_digest", fail)
+    assert compile_prompts(str(src_root), str(tmp_path / "manifest.json")) == expected
+
+
+def test_compile_build_cache_ignores_unreadable_cache(tmp_path: Path) -> None:
+    src_root = tmp_path / "prompts"
+    _write_include_tree(src_root)
+    out_path = tmp_path / "manifest.json"
+    cache_path = tmp_path / "cache.json"
+    cache_path.write_text("not json", encoding="utf-8")
+    manifest = compile_prompts(str(src_root), str(out_path), cache_path=str(cache_path))
+    assert len(manifest["prompts"]) == 2
+    cache_path.write_text('{"cache_version": 0, "prompts": {}}', encoding="utf-8")
+    assert compile_prompts(str(src_root), str(out_path), cache_path=str(cache_path)) == manifest
+    cache = json.loads(cache_path.read_text(encoding="utf-8"))
+    assert sorted(cache["prompts"]) == ["alpha/v1.md", "beta/v1.md"]
+
+
+@pytest.mark.parametrize(
+    "bad_entry",
+    [
+        "not an entry",
+        None,
+        {"sha256": "MATCH", "includes": {}},
+        {"sha256": "MATCH", "includes": [], "entry": {}},
+        {"sha256": "MATCH", "includes": {}, "entry": {"id": "alpha"}},
+    ],
+)
+def test_compile_build_cache_treats_malformed_entries_as_misses(
+    tmp_path: Path, bad_entry: object
+) -> None:
+    src_root = tmp_path / "prompts"
+    _write_include_tree(src_root)
+    out_path = tmp_path / "manifest.json"
+    cache_path = tmp_path / "cache.json"
+    manifest = compile_prompts(str(src_root), str(out_path), cache_path=str(cache_path))
+    cache = json.loads(cache_path.read_text(encoding="utf-8"))
+    digest = cache["prompts"]["alpha/v1.md"]["sha256"]
+    if isinstance(bad_entry, dict):
+        bad_entry = {**bad_entry, "sha256": digest}
+    cache["prompts"]["alpha/v1.md"] = bad_entry
+    cache_path.write_text(json.dumps(cache), encoding="utf-8")
+
+    assert compile_prompts(str(src_root), str(out_path), cache_path=str(cache_path)) == manifest
+    rewritten = json.loads(cache_path.read_text(encoding="utf-8"))
+    assert rewritten["prompts"]["alpha/v1.md"]["entry"] == manifest["prompts"][0]
+
+
+def test_compile_loads_each_include_once(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    src_root = tmp_path / "prompts"
+    _write_include_tree(src_root)
+    beta_path = src_root / "beta" / "v1.md"
+    beta_path.write_text(
+        beta_path.read_text(encoding="utf-8").replace(
+            '"includes": []', '"includes": ["policy@v1"]'
+        ),
+        encoding="utf-8",
+    )
+    loaded: list[str] = []
+    original = compiler._load_include_document
+
+    def tracking(src_path: Path, include_ref: str) -> compiler.PromptDocument:
+        loaded.append(include_ref)
+        return original(src_path, include_ref)
+
+    monkeypatch.setattr(compiler, "_load_include_document", tracking)
+    manifest = compile_prompts(str(src_root), str(tmp_path / "manifest.json"))
+    assert loaded == ["policy@v1"]
+    assert all("Follow policy." in p["messages"][0]["content"] for p in manifest["prompts"])
+
+
+def test_compile_with_workers_matches_serial(tmp_path: Path) -> None:
+    src_root = tmp_path / "prompts"
+    _write_include_tree(src_root)
+    for index in range(6):
+        _write_prompt(
+            src_root / f"extra{index}" / "v1.md",
+            f"""---
+{{"id": "extra{index}", "version": "v1", "metadata": {{}}, "variables": [],
+  "includes": ["policy@v1"]}}
+---
+# system
+Extra {index}.
+
+# user
+Hi.
+""",
+        )
+    for manifest_format in MANIFEST_FORMATS:
+        serial_path = tmp_path / f"serial.{manifest_format}"
+        parallel_path = tmp_path / f"parallel.{manifest_format}"
+        compile_prompts(str(src_root), str(serial_path), manifest_format=manifest_format)
+        compile_prompts(
+            str(src_root), str(parallel_path), workers=3, manifest_format=manifest_format
+        )
+        assert parallel_path.read_bytes() == serial_path.read_bytes()
+    with pytest.raises(PromptCompileError, match="workers must be at least 1"):
+        compile_prompts(str(src_root), str(tmp_path / "parallel.json"), workers=0)
+
+
+def test_compile_with_workers_keeps_error_order(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    src_root = tmp_path / "prompts"
+    _write_include_tree(src_root)
+    bad_path = src_root / "bad" / "v1.md"
+    _write_prompt(bad_path, "# system\nNo frontmatter")
+    alpha_path = src_root / "alpha" / "v1.md"
+    beta_path = src_root / "beta" / "v1.md"
+    out_path = str(tmp_path / "manifest.json")
+
+    order = [alpha_path, beta_path, beta_path, bad_path]
+
+    def ordered_files(_src_root: Path) -> list[Path]:
+        return order
+
+    monkeypatch.setattr(compiler, "collect_prompt_files", ordered_files)
+    with pytest.raises(PromptCompileError, match="Duplicate prompt id/version"):
+        compile_prompts(str(src_root), out_path, workers=2)
+
+    order = [beta_path, bad_path, alpha_path, alpha_path]
+    with pytest.raises(PromptCompileError, match="Missing frontmatter delimiter"):
+        compile_prompts(str(src_root), out_path, workers=2)
+
+
+def _touch(path: Path, text: str) -> None:
+    stat = path.stat()
+    path.write_text(text, encoding="utf-8")
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 1_000_000))
+
+
+def test_watcher_recompiles_only_affected_prompts(tmp_path: Path) -> None:
+    src_root = tmp_path / "prompts"
+    _write_include_tree(src_root)
+    out_path = tmp_path / "dist" / "manifest.json"
+    watcher = PromptWatcher(str(src_root), str(out_path))
+
+    first = watcher.poll()
+    assert first is not None and first.written
+    assert first.recompiled == ("alpha/v1.md", "beta/v1.md")
+    assert out_path.read_bytes() == _compiled_bytes(src_root, tmp_path / "full.json")
+    assert watcher.dependents("policy@v1") == {src_root / "alpha" / "v1.md"}
+    assert watcher.poll() is None
+
+    include_path = src_root / "_includes" / "policy" / "v1.md"
+    _touch(include_path, include_path.read_text(encoding="utf-8").replace("policy.", "new."))
+    result = watcher.poll()
+    assert result is not None and result.recompiled == ("alpha/v1.md",)
+    assert out_path.read_bytes() == _compiled_bytes(src_root, tmp_path / "full.json")
+
+    beta_path = src_root / "beta" / "v1.md"
+    _touch(beta_path, beta_path.read_text(encoding="utf-8").replace("{{question}}", "{{other}}"))
+    before = out_path.read_bytes()
+    failed = watcher.poll()
+    assert failed is not None and not failed.written
+    assert "Undeclared names" in failed.errors[0]
+    assert out_path.read_bytes() == before
+
+    beta_path.unlink()
+    result = watcher.poll()
+    assert result is not None and result.written and result.recompiled == ()
+    manifest = json.loads(out_path.read_text(encoding="utf-8"))
+    assert [prompt["id"] for prompt in manifest["prompts"]] == ["alpha"]
+
+
+def test_watcher_reports_errors_and_runs_until_stopped(tmp_path: Path) -> None:
+    src_root = tmp_path / "prompts"
+    _write_include_tree(src_root)
+    alpha = (src_root / "alpha" / "v1.md").read_text(encoding="utf-8")
+    _write_prompt(src_root / "gamma" / "v1.md", alpha)
+    out_path = tmp_path / "manifest.json"
+    stop = threading.Event()
+    results: list[WatchResult] = []
+
+    def record(result: WatchResult) -> None:
+        results.append(result)
+        stop.set()
+
+    PromptWatcher(str(src_root), str(out_path)).run(interval=0, stop=stop, on_result=record)
+    assert "Prompt id/version mismatch" in results[0].errors[0]
+    assert not out_path.exists()
+
+    with pytest.raises(PromptCompileError, match="Source root not found"):
+        PromptWatcher(str(tmp_path / "missing"), str(out_path)).poll()
+
+
+def test_watcher_records_broken_edits_instead_of_raising(tmp_path: Path) -> None:
+    src_root = tmp_path / "prompts"
+    _write_include_tree(src_root)
+    jinja_path = src_root / "gamma" / "v1.md"
+    _write_prompt(
+        jinja_path,
+        """---
+{"id": "gamma", "version": "v1", "metadata": {}, "variables": ["q"],
+ "template_engine": "jinja2_sandbox"}
+---
+# system
+Hi.
+
+# user
+{{ q }}
+""",
+    )
+    out_path = tmp_path / "manifest.json"
+    watcher = PromptWatcher(str(src_root), str(out_path))
+    first = watcher.poll()
+    assert first is not None and first.written
+
+    _touch(jinja_path, jinja_path.read_text(encoding="utf-8") + "{% if q %}\n")
+    failed = watcher.poll()
+    assert failed is not None and not failed.written
+    assert "Invalid jinja2 template" in failed.errors[0]
+    with pytest.raises(PromptCompileError, match="Invalid jinja2 template"):
+        compile_prompts(str(src_root), str(tmp_path / "full.json"))
+
+    beta_path = src_root / "beta" / "v1.md"
+    beta_path.write_bytes(b"---\n\xff\xfe\n")
+    failed = watcher.poll()
+    assert failed is not None and any("Cannot read" in error for error in failed.errors)
+
+
+def test_watcher_records_unexpected_per_file_errors(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    src_root = tmp_path / "prompts"
+    _write_include_tree(src_root)
+
+    def vanished(prompt_file: Path, *args: object) -> None:
+        raise FileNotFoundError(prompt_file)
+
+    monkeypatch.setattr("promptir.watch.compile_prompt_file", vanished)
+    result = PromptWatcher(str(src_root), str(tmp_path / "manifest.json")).poll()
+    assert result is not None and not result.written
+    assert all("FileNotFoundError" in error for error in result.errors)
+
+
+def _compiled_bytes(src_root: Path, out_path: Path) -> bytes:
+    compile_prompts(str(src_root), str(out_path))
+    return out_path.read_bytes()
+
+
+def test_compile_dedupes_include_bodies(tmp_path: Path) -> None:
+    src_root = tmp_path / "prompts"
+    _write_include_tree(src_root)
+    _write_prompt(
+        src_root / "gamma" / "v1.md",
+        """---
+{"id": "gamma", "version": "v1", "metadata": {}, "variables": [], "includes": ["policy@v1"]}
+---
+# user
+Hi.
+""",
+    )
+    plain = compile_prompts(str(src_root), str(tmp_path / "plain.json"))
+    out_path = tmp_path / "deduped.json"
+    cache_path = tmp_path / "cache.json"
+    deduped = compile_prompts(
+        str(src_root), str(out_path), cache_path=str(cache_path), dedupe_includes=True
+    )
+    assert (
+        compile_prompts(
+            str(src_root), str(out_path), cache_path=str(cache_path), dedupe_includes=True
+        )
+        == deduped
+    )
+
+    assert deduped["schema_version"] == 2
+    assert list(deduped["contents"].values()) == ["Follow policy."]
+    digest = next(iter(deduped["contents"]))
+    alpha, beta, gamma = deduped["prompts"]
+    assert alpha["messages"][0]["parts"] == [{"ref": digest}, {"text": "You are alpha."}]
+    assert beta["messages"] == plain["prompts"][1]["messages"]
+    assert gamma["messages"][0] == {"role": "system", "parts": [{"ref": digest}]}
+    assert [p["hash"] for p in deduped["prompts"]] == [p["hash"] for p in plain["prompts"]]
+
+    registry = PromptRegistry.from_manifest_path(str(out_path))
+    baseline = PromptRegistry.from_manifest_path(str(tmp_path / "plain.json"))
+    for prompt_id in ("alpha", "beta", "gamma"):
+        assert registry.prepare(prompt_id).prompt == baseline.prepare(prompt_id).prompt
+    loaded = json.loads(out_path.read_text(encoding="utf-8"))
+    gamma_prompt = load_prompts(loaded)[("gamma", "v1")]
+    assert gamma_prompt.messages[0].content is loaded["contents"][digest]
+
+    indexed_path = tmp_path / "deduped.idx"
+    compile_prompts(
+        str(src_root), str(indexed_path), manifest_format="indexed", dedupe_includes=True
+    )
+    indexed = PromptRegistry.from_manifest_path(str(indexed_path))
+    assert indexed.prepare("alpha").prompt == baseline.prepare("alpha").prompt
+
+    watch_path = tmp_path / "watched.json"
+    PromptWatcher(str(src_root), str(watch_path), dedupe_includes=True).poll()
+    assert watch_path.read_bytes() == out_path.read_bytes()
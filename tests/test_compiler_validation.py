@@ -56,7 +56,7 @@ Hi
     def duplicate_files(_src_root: Path) -> list[Path]:
         return [prompt_path, prompt_path]
 
-    monkeypatch.setattr("promptir.compiler._collect_prompt_files", duplicate_files)
+    monkeypatch.setattr("promptir.compiler.collect_prompt_files", duplicate_files)
     with pytest.raises(PromptCompileError, match="Duplicate prompt id/version"):
         compile_prompts(str(src_root), str(tmp_path / "out.json"))
 
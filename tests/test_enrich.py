@@ -0,0 +1,348 @@
+from __future__ import annotations
+
+import asyncio
+import pickle
+import threading
+import time
+from collections.abc import Callable
+
+import pytest
+
+from promptir.cache import LRUCache
+from promptir.enrich import EnricherSpec, EnrichmentPipeline, enricher
+from promptir.errors import PromptEnrichmentError
+from promptir.metrics import RenderMetrics
+from promptir.models import BlockSpec, PromptDefinition, PromptMessage
+
+
+def _prompt() -> PromptDefinition:
+    return PromptDefinition(
+        id="planner",
+        version="v1",
+        metadata={},
+        template_engine="simple",
+        variables=("_a", "_b", "question"),
+        blocks={"_a": BlockSpec(), "_b": BlockSpec()},
+        messages=(PromptMessage(role="user", content="{{question}}{{_a}}{{_b}}"),),
+        hash="h",
+    )
+
+
+def _noop(prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]) -> dict[str, str]:
+    return {}
+
+
+def test_sequential_pipeline_sees_previous_updates() -> None:
+    def first(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        return {"_a": "A"}
+
+    def second(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        return {"_b": blocks["_a"] + "B"}
+
+    pipeline = EnrichmentPipeline([first, second])
+    expected = {"_a": "A", "_b": "AB"}
+    assert pipeline.apply(_prompt(), {}, {"_a": "", "_b": ""}) == expected
+    assert asyncio.run(pipeline.aapply(_prompt(), {}, {"_a": "", "_b": ""})) == expected
+
+
+def test_concurrent_pipeline_runs_async_enrichers_together() -> None:
+    async def run() -> dict[str, str]:
+        started_a = asyncio.Event()
+        started_b = asyncio.Event()
+
+        async def enrich_a(
+            prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+        ) -> dict[str, str]:
+            started_a.set()
+            await started_b.wait()
+            return {"_a": "A", "_b": "from-a"}
+
+        async def enrich_b(
+            prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+        ) -> dict[str, str]:
+            started_b.set()
+            await started_a.wait()
+            return {"_b": "B" + blocks["_a"]}
+
+        pipeline = EnrichmentPipeline([enrich_a, enrich_b], concurrent=True)
+        return await asyncio.wait_for(pipeline.aapply(_prompt(), {}, {"_a": "", "_b": ""}), 5)
+
+    assert asyncio.run(run()) == {"_a": "A", "_b": "B"}
+
+
+def test_concurrent_sync_apply_matches_async_merge() -> None:
+    def enrich_a(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        return {"_a": "A"}
+
+    def enrich_b(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        return {"_b": "B" + blocks["_a"]}
+
+    pipeline = EnrichmentPipeline([enrich_a, enrich_b], concurrent=True)
+    blocks = {"_a": "", "_b": ""}
+    assert pipeline.apply(_prompt(), {}, blocks) == {"_a": "A", "_b": "B"}
+    assert asyncio.run(pipeline.aapply(_prompt(), {}, blocks)) == {"_a": "A", "_b": "B"}
+
+
+def test_sync_apply_rejects_async_enricher() -> None:
+    async def enrich(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        return {"_a": "A"}
+
+    pipeline = EnrichmentPipeline([enrich])
+    with pytest.raises(PromptEnrichmentError, match="requires aapply"):
+        pipeline.apply(_prompt(), {}, {})
+
+
+def test_declared_enrichers_form_dependency_stages() -> None:
+    @enricher(reads=["question"], writes=["_a"], name="a")
+    def enrich_a(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        return {"_a": vars["question"]}
+
+    @enricher(reads=["_a"], writes=["_b"], name="b")
+    def enrich_b(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        return {"_b": blocks["_a"] + "!"}
+
+    @enricher(writes=["_unused"])
+    def enrich_unused(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        raise AssertionError("enrichers for undeclared blocks are skipped")
+
+    noop = EnricherSpec(_noop, reads=frozenset(), writes=frozenset({"_b"}))
+    pipeline = EnrichmentPipeline([enrich_b, enrich_unused, enrich_a, noop, enrich_b])
+    stages = pipeline.stages_for(_prompt())
+    assert [[spec.name for spec in stage] for stage in stages] == [["b", "a", "_noop"], ["b"]]
+    blocks = {"_a": "", "_b": ""}
+    assert pipeline.apply(_prompt(), {"question": "Q"}, blocks) == {"_a": "Q", "_b": "Q!"}
+
+
+def test_independent_sync_enrichers_run_on_threads() -> None:
+    barrier = threading.Barrier(2, timeout=5)
+
+    @enricher(reads=[], writes=["_a"])
+    def enrich_a(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        barrier.wait()
+        return {"_a": "A"}
+
+    @enricher(reads=[], writes=["_b"])
+    def enrich_b(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        barrier.wait()
+        return {"_b": "B"}
+
+    pipeline = EnrichmentPipeline([enrich_a, enrich_b], max_workers=2)
+    assert pipeline.apply(_prompt(), {}, {}) == {"_a": "A", "_b": "B"}
+    assert asyncio.run(pipeline.aapply(_prompt(), {}, {})) == {"_a": "A", "_b": "B"}
+
+    restored = pickle.loads(pickle.dumps(EnrichmentPipeline([_noop], max_workers=2)))
+    assert restored == EnrichmentPipeline([_noop], max_workers=2)
+    assert restored.apply(_prompt(), {}, {"_a": "x"}) == {"_a": "x"}
+
+
+def test_declared_writes_are_enforced_and_filtered() -> None:
+    @enricher(writes=["_a", "_elsewhere"])
+    def shared(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        return {"_a": "A", "_elsewhere": "dropped"}
+
+    @enricher(writes=["_a"])
+    def liar(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        return {"_b": "B"}
+
+    assert EnrichmentPipeline([shared]).apply(_prompt(), {}, {}) == {"_a": "A"}
+    with pytest.raises(PromptEnrichmentError, match="wrote undeclared blocks"):
+        EnrichmentPipeline([liar]).apply(_prompt(), {}, {})
+
+
+def test_enricher_deadline_falls_back_to_input_blocks() -> None:
+    release = threading.Event()
+
+    @enricher(writes=["_a"], name="slow")
+    def slow(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        release.wait(5)
+        return {"_a": "late"}
+
+    @enricher(writes=["_b"], name="fast", timeout=5)
+    def fast(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        return {"_b": "B"}
+
+    pipeline = EnrichmentPipeline([slow, fast], timeout=0.05)
+    try:
+        assert pipeline.apply(_prompt(), {}, {"_a": "default", "_b": ""}) == {
+            "_a": "default",
+            "_b": "B",
+        }
+    finally:
+        release.set()
+    stats = pipeline.stats()
+    assert stats["slow"].calls == 1
+    assert stats["slow"].timeouts == 1
+    assert stats["fast"].timeouts == 0
+    assert stats["fast"].max_seconds <= stats["fast"].total_seconds
+
+
+def test_async_enricher_deadline() -> None:
+    @enricher(writes=["_a"], name="slow")
+    async def slow(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        await asyncio.sleep(5)
+        return {"_a": "late"}
+
+    @enricher(writes=["_b"], name="blocking", timeout=0.05)
+    def blocking(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        time.sleep(0.5)
+        return {"_b": "late"}
+
+    pipeline = EnrichmentPipeline([slow, blocking, _noop], timeout=0.05, concurrent=True)
+    started = time.perf_counter()
+    result = asyncio.run(pipeline.aapply(_prompt(), {}, {"_a": "A0", "_b": "B0"}))
+    assert result == {"_a": "A0", "_b": "B0"}
+    assert time.perf_counter() - started < 2
+    stats = pipeline.stats()
+    assert stats["slow"].timeouts == 1
+    assert stats["blocking"].timeouts == 1
+    assert stats["_noop"].calls == 1
+
+
+def test_async_callable_object_runs_on_the_loop_with_a_deadline() -> None:
+    class AsyncRag:
+        async def __call__(
+            self, prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+        ) -> dict[str, str]:
+            await asyncio.sleep(0)
+            return {"_a": "rag"}
+
+    assert EnricherSpec(AsyncRag()).is_async
+    for pipeline in (
+        EnrichmentPipeline([AsyncRag()], timeout=1.0),
+        EnrichmentPipeline([AsyncRag()], max_workers=2),
+    ):
+        assert asyncio.run(pipeline.aapply(_prompt(), {}, {})) == {"_a": "rag"}
+        with pytest.raises(PromptEnrichmentError, match="requires aapply"):
+            pipeline.apply(_prompt(), {}, {})
+
+
+def test_close_shuts_down_the_thread_pool() -> None:
+    def enrich_a(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        return {"_a": threading.current_thread().name}
+
+    with EnrichmentPipeline([enrich_a], timeout=1.0) as pipeline:
+        assert pipeline.apply(_prompt(), {}, {})["_a"].startswith("promptir-enrich")
+        executor = pipeline._executor  # pyright: ignore[reportPrivateUsage]
+        assert executor is not None
+    assert pipeline._executor is None  # pyright: ignore[reportPrivateUsage]
+    with pytest.raises(RuntimeError, match="shutdown"):
+        executor.submit(print)
+    assert pipeline.apply(_prompt(), {}, {})["_a"].startswith("promptir-enrich")
+    pipeline.close()
+
+
+def test_enrichment_cache_reuses_results_for_read_inputs() -> None:
+    calls: list[str] = []
+
+    @enricher(reads=["question"], writes=["_a"], name="rag")
+    def rag(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        calls.append(vars["question"])
+        return {"_a": vars["question"].upper()}
+
+    @enricher(writes=["_b"], name="clock", cacheable=False)
+    def clock(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        calls.append("clock")
+        return {}
+
+    cache: LRUCache[tuple[str, str, str], dict[str, str]] = LRUCache(ttl=60)
+    pipeline = EnrichmentPipeline([rag, clock], cache=cache)
+    assert pipeline.apply(_prompt(), {"question": "q", "other": "1"}, {}) == {"_a": "Q"}
+    assert pipeline.apply(_prompt(), {"question": "q", "other": "2"}, {}) == {"_a": "Q"}
+    assert asyncio.run(pipeline.aapply(_prompt(), {"question": "q", "other": "3"}, {})) == {
+        "_a": "Q"
+    }
+    assert pipeline.apply(_prompt(), {"question": "r", "other": "1"}, {}) == {"_a": "R"}
+    assert calls == ["q", "clock", "clock", "clock", "r", "clock"]
+    assert cache.stats().hits == 2
+    assert cache.stats().misses == 2
+    restored = pickle.loads(pickle.dumps(EnrichmentPipeline([_noop], cache=cache)))
+    assert restored.cache is None
+
+
+def test_same_named_enrichers_keep_separate_cache_entries_and_stats() -> None:
+    def tag(block: str, label: str) -> Callable[..., dict[str, str]]:
+        def enrich(
+            prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+        ) -> dict[str, str]:
+            return {block: label}
+
+        return enrich
+
+    metrics = RenderMetrics()
+    pipeline = EnrichmentPipeline(
+        [lambda p, v, b: {"_a": "A"}, lambda p, v, b: {"_b": "B"}, tag("_a", "x")],
+        concurrent=True,
+        cache=LRUCache(),
+    )
+    first = pipeline.apply(_prompt(), {}, {}, metrics=metrics)
+    second = pipeline.apply(_prompt(), {}, {}, metrics=metrics)
+
+    assert first == second == {"_a": "x", "_b": "B"}
+    names = {spec.name for stage in pipeline.stages_for(_prompt()) for spec in stage}
+    assert names == {
+        "test_same_named_enrichers_keep_separate_cache_entries_and_stats.<locals>.<lambda>",
+        "test_same_named_enrichers_keep_separate_cache_entries_and_stats.<locals>.<lambda>#2",
+        "test_same_named_enrichers_keep_separate_cache_entries_and_stats.<locals>.tag.<locals>"
+        ".enrich",
+    }
+    assert set(pipeline.stats()) == names
+    assert all(stats.calls == 1 for stats in pipeline.stats().values())
+    (series,) = metrics.snapshot().prompts.values()
+    assert set(series.enrichers) == names
+
+
+def test_enrichment_cache_skips_timed_out_results() -> None:
+    release = threading.Event()
+
+    @enricher(writes=["_a"], name="slow", timeout=0.05)
+    def slow(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        release.wait(5)
+        return {"_a": "late"}
+
+    cache: LRUCache[tuple[str, str, str], dict[str, str]] = LRUCache()
+    pipeline = EnrichmentPipeline([slow], cache=cache)
+    try:
+        assert pipeline.apply(_prompt(), {}, {"_a": "default"}) == {"_a": "default"}
+    finally:
+        release.set()
+    assert len(cache) == 0
@@ -0,0 +1,84 @@
+from __future__ import annotations
+
+import json
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+import promptir
+from promptir.compiler import compile_prompts
+
+SRC_ROOT = Path(__file__).resolve().parents[1] / "src"
+# Generous against CI noise; a warm `import promptir` takes well under 100 ms.
+IMPORT_BUDGET_SECONDS = 0.3
+# Modules a simple-engine runtime must not pay for at import or render time.
+DEFERRED_MODULES = (
+    "jinja2",
+    "asyncio",
+    "concurrent.futures.process",
+    "promptir.compiler",
+    "promptir.render_jinja2",
+)
+
+
+def _run(code: str, *args: str) -> str:
+    env = {**os.environ, "PYTHONPATH": str(SRC_ROOT)}
+    result = subprocess.run(
+        [sys.executable, *args, "-c", code],
+        capture_output=True,
+        check=True,
+        env=env,
+        text=True,
+    )
+    return result.stdout + result.stderr
+
+
+def _write_prompt(root: Path, prompt_id: str, engine: str, body: str) -> None:
+    prompt_path = root / prompt_id / "v1.md"
+    prompt_path.parent.mkdir(parents=True)
+    frontmatter = {
+        "id": prompt_id,
+        "version": "v1",
+        "metadata": {},
+        "variables": ["question"],
+        "blocks": {},
+        "template_engine": engine,
+    }
+    prompt_path.write_text(
+        f"---\n{json.dumps(frontmatter)}\n---\n# system\nSystem.\n\n# user\n{body}\n",
+        encoding="utf-8",
+    )
+
+
+def test_simple_runtime_never_imports_jinja2_or_the_compiler(tmp_path: Path) -> None:
+    _write_prompt(tmp_path / "prompts", "simple", "simple", "{{question}}")
+    _write_prompt(tmp_path / "prompts", "sandboxed", "jinja2_sandbox", "{{ question }}")
+    manifest_path = tmp_path / "manifest.json"
+    compile_prompts(str(tmp_path / "prompts"), str(manifest_path))
+
+    code = f"""
+import sys
+from promptir import PromptRegistry
+registry = PromptRegistry.from_manifest_path({str(manifest_path)!r})
+registry.render("simple", vars={{"question": "Why?"}})
+print(sorted(name for name in {DEFERRED_MODULES!r} if name in sys.modules))
+registry.render("sandboxed", vars={{"question": "Why?"}})
+print("jinja2" in sys.modules)
+"""
+    assert _run(code).splitlines() == ["[]", "True"]
+
+
+def test_compile_prompts_is_still_exported() -> None:
+    assert promptir.compile_prompts is compile_prompts
+    assert "compile_prompts" in promptir.__all__
+
+
+def test_import_time_stays_within_budget() -> None:
+    def cumulative_microseconds() -> int:
+        output = _run("import promptir", "-X", "importtime")
+        last = [line for line in output.splitlines() if line.endswith("| promptir")][-1]
+        return int(last.split("|")[1])
+
+    best = min(cumulative_microseconds() for _ in range(3))
+    assert best / 1_000_000 < IMPORT_BUDGET_SECONDS
@@ -0,0 +1,158 @@
+from __future__ import annotations
+
+import json
+import sys
+from pathlib import Path
+from typing import Any
+
+import jinja2
+import pytest
+from jinja2.sandbox import SandboxedEnvironment
+
+from promptir.cli import main
+from promptir.compiler import compile_prompts, write_jinja2_cache
+from promptir.registry import PromptRegistry
+from promptir.render_jinja2 import decode_jinja2_cache, encode_jinja2_cache
+
+
+def _write(path: Path, frontmatter: dict[str, Any], body: str) -> None:
+    path.parent.mkdir(parents=True, exist_ok=True)
+    path.write_text(f"---\n{json.dumps(frontmatter)}\n---\n{body}", encoding="utf-8")
+
+
+def _write_tree(root: Path, greeting: str = "Hello") -> None:
+    _write(
+        root / "sandboxed" / "v1.md",
+        {
+            "id": "sandboxed",
+            "version": "v1",
+            "metadata": {},
+            "variables": ["question"],
+            "template_engine": "jinja2_sandbox",
+        },
+        f"# system\n{greeting}.\n\n"
+        "# user\n{% if question %}Q: {{ question }}{% else %}none{% endif %}\n",
+    )
+    _write(
+        root / "plain" / "v1.md",
+        {"id": "plain", "version": "v1", "metadata": {}, "variables": ["question"]},
+        "# system\nPlain.\n\n# user\n{{question}}\n",
+    )
+
+
+def _compile(tmp_path: Path, greeting: str = "Hello") -> tuple[Path, Path]:
+    _write_tree(tmp_path / "prompts", greeting)
+    manifest_path = tmp_path / "manifest.json"
+    cache_path = tmp_path / "manifest.jinja2c"
+    compile_prompts(
+        str(tmp_path / "prompts"), str(manifest_path), jinja2_cache_path=str(cache_path)
+    )
+    return manifest_path, cache_path
+
+
+VARS = {"question": "Why?"}
+
+
+def _read_cache(path: Path) -> dict[tuple[str, str], Any]:
+    return decode_jinja2_cache(path.read_bytes()) if path.exists() else {}
+
+
+def _fail_parse(*args: object, **kwargs: object) -> None:
+    raise AssertionError("template source parsed at runtime")
+
+
+def test_compile_writes_bytecode_for_jinja2_messages_only(tmp_path: Path) -> None:
+    manifest_path, cache_path = _compile(tmp_path)
+    registry = PromptRegistry.from_manifest_path(str(manifest_path))
+    prompt_hash = registry.prepare("sandboxed").prompt.hash
+
+    assert set(_read_cache(cache_path)) == {
+        (prompt_hash, "system"),
+        (prompt_hash, "user"),
+    }
+
+
+def test_registry_renders_from_the_cache_without_parsing(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    manifest_path, cache_path = _compile(tmp_path)
+    expected = PromptRegistry.from_manifest_path(str(manifest_path)).render("sandboxed", vars=VARS)
+    registry = PromptRegistry.from_manifest_path(
+        str(manifest_path), jinja2_cache_path=str(cache_path)
+    )
+
+    monkeypatch.setattr(SandboxedEnvironment, "_parse", _fail_parse)
+    assert registry.render("sandboxed", vars=VARS) == expected
+    assert registry.render("plain", vars={"question": "Q"}).messages[1]["content"] == "Q"
+
+
+@pytest.mark.parametrize("corruption", ["missing", "magic", "jinja2_version", "truncated"])
+def test_unusable_cache_falls_back_to_parsing(tmp_path: Path, corruption: str) -> None:
+    manifest_path, cache_path = _compile(tmp_path)
+    data = cache_path.read_bytes()
+    if corruption == "missing":
+        cache_path.unlink()
+    elif corruption == "magic":
+        cache_path.write_bytes(b"XXXX" + data[4:])
+    elif corruption == "jinja2_version":
+        with pytest.MonkeyPatch.context() as patch:
+            patch.setattr(jinja2, "__version__", "0.0")
+            cache_path.write_bytes(encode_jinja2_cache(_read_cache(cache_path)))
+    else:
+        cache_path.write_bytes(data[: len(data) // 2])
+
+    assert _read_cache(cache_path) == {}
+    registry = PromptRegistry.from_manifest_path(
+        str(manifest_path), jinja2_cache_path=str(cache_path)
+    )
+    rendered = registry.render("sandboxed", vars={"question": ""})
+    assert rendered.messages[1]["content"] == "none"
+
+
+def test_rewrite_reuses_unchanged_entries_and_reload_rereads(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    manifest_path, cache_path = _compile(tmp_path)
+    registry = PromptRegistry.from_manifest_path(
+        str(manifest_path), jinja2_cache_path=str(cache_path)
+    )
+    assert registry.render("sandboxed", vars=VARS).messages[0]["content"] == "Hello."
+
+    _compile(tmp_path, greeting="Bye")
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    parsed: list[str] = []
+    original_parse = SandboxedEnvironment._parse  # pyright: ignore[reportPrivateUsage]
+
+    def counting_parse(self: SandboxedEnvironment, source: str, *args: Any) -> Any:
+        parsed.append(source)
+        return original_parse(self, source, *args)
+
+    monkeypatch.setattr(SandboxedEnvironment, "_parse", counting_parse)
+    assert write_jinja2_cache(manifest, str(cache_path)) == 2
+    assert parsed == []
+
+    monkeypatch.setattr(SandboxedEnvironment, "_parse", _fail_parse)
+    registry.reload()
+    assert registry.render("sandboxed", vars=VARS).messages[0]["content"] == "Bye."
+
+
+def test_cli_jinja2_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    _write_tree(tmp_path / "prompts")
+    cache_path = tmp_path / "out" / "manifest.jinja2c"
+    monkeypatch.setattr(
+        sys,
+        "argv",
+        [
+            "promptir",
+            "compile",
+            "--src",
+            str(tmp_path / "prompts"),
+            "--out",
+            str(tmp_path / "out" / "manifest.json"),
+            "--jinja2-cache",
+            str(cache_path),
+        ],
+    )
+
+    assert main() == 0
+    assert len(_read_cache(cache_path)) == 2
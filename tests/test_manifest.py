@@ -0,0 +1,142 @@
+from __future__ import annotations
+
+import json
+import marshal
+import mmap
+from pathlib import Path
+from typing import Any
+
+import pytest
+
+from promptir.compiler import compile_prompts
+from promptir.errors import PromptCompileError, PromptNotFound
+from promptir.manifest import (
+    BINARY_MAGIC,
+    INDEXED_MAGIC,
+    IndexedManifest,
+    decode_manifest,
+    detect_manifest_format,
+    encode_manifest,
+    open_indexed_manifest,
+    share_manifest,
+)
+from promptir.registry import PromptRegistry, _LazyPrompts  # pyright: ignore[reportPrivateUsage]
+
+
+def _write_tree(src_root: Path) -> None:
+    prompt_path = src_root / "planner" / "v1.md"
+    prompt_path.parent.mkdir(parents=True, exist_ok=True)
+    prompt_path.write_text(
+        """---
+{"id": "planner", "version": "v1", "metadata": {"owner": "ops", "tags": ["a", 1, null]},
+  "variables": ["question"], "blocks": {"_context": {"optional": true, "default": "none"}}}
+---
+# system
+System.
+
+# user
+Q: {{question}} / {{_context}}
+""",
+        encoding="utf-8",
+    )
+
+
+def test_binary_manifest_loads_like_json(tmp_path: Path) -> None:
+    src_root = tmp_path / "prompts"
+    _write_tree(src_root)
+    json_path = tmp_path / "manifest.json"
+    binary_path = tmp_path / "manifest.bin"
+    manifest = compile_prompts(str(src_root), str(json_path))
+    assert compile_prompts(str(src_root), str(binary_path), manifest_format="binary") == manifest
+
+    data = binary_path.read_bytes()
+    assert detect_manifest_format(data) == "binary"
+    assert detect_manifest_format(json_path.read_bytes()) == "json"
+    assert len(data) < len(json_path.read_bytes())
+    assert decode_manifest(data) == json.loads(json_path.read_text(encoding="utf-8"))
+
+    from_json = PromptRegistry.from_manifest_path(str(json_path))
+    from_binary = PromptRegistry.from_manifest_path(str(binary_path))
+    assert from_binary.prepare("planner").prompt == from_json.prepare("planner").prompt
+    assert from_binary.render("planner", vars={"question": "Why?"}) == from_json.render(
+        "planner", vars={"question": "Why?"}
+    )
+
+
+def test_binary_manifest_rejects_bad_input(tmp_path: Path) -> None:
+    unknown: Any = "yaml"
+    with pytest.raises(PromptCompileError, match="Unknown manifest format"):
+        compile_prompts(str(tmp_path), str(tmp_path / "m"), manifest_format=unknown)
+    with pytest.raises(ValueError, match="Unknown manifest format"):
+        encode_manifest({}, unknown)
+
+    encoded = encode_manifest({"schema_version": 1, "prompts": []}, "binary")
+    with pytest.raises(ValueError, match="Corrupt binary manifest"):
+        decode_manifest(encoded[:-3])
+    with pytest.raises(ValueError, match="expected a mapping"):
+        decode_manifest(BINARY_MAGIC + bytes([marshal.version]) + marshal.dumps([1]))
+    with pytest.raises(ValueError, match="missing header"):
+        decode_manifest(BINARY_MAGIC)
+    with pytest.raises(ValueError, match="newer Python"):
+        decode_manifest(BINARY_MAGIC + bytes([marshal.version + 1]) + encoded[5:])
+
+
+def test_indexed_manifest_decodes_prompts_on_first_use(tmp_path: Path) -> None:
+    src_root = tmp_path / "prompts"
+    _write_tree(src_root)
+    other = (src_root / "planner" / "v1.md").read_text(encoding="utf-8")
+    for prompt_id, version in (("planner", "v2"), ("writer", "v1")):
+        path = src_root / prompt_id / f"{version}.md"
+        path.parent.mkdir(parents=True, exist_ok=True)
+        path.write_text(
+            other.replace('"planner"', f'"{prompt_id}"').replace('"v1"', f'"{version}"'),
+            encoding="utf-8",
+        )
+    json_path = tmp_path / "manifest.json"
+    indexed_path = tmp_path / "manifest.idx"
+    manifest = compile_prompts(str(src_root), str(json_path))
+    compile_prompts(str(src_root), str(indexed_path), manifest_format="indexed")
+    data = indexed_path.read_bytes()
+    assert detect_manifest_format(data) == "indexed"
+    assert decode_manifest(data) == manifest
+    assert open_indexed_manifest(json_path) is None
+
+    registry = PromptRegistry.from_manifest_path(str(indexed_path))
+    prompts = registry._table.prompts  # pyright: ignore[reportPrivateUsage]
+    assert isinstance(prompts, _LazyPrompts)
+    assert len(prompts) == 3 and ("writer", "v1") in prompts
+    assert prompts._prompts == {}  # pyright: ignore[reportPrivateUsage]
+    rendered = registry.render("planner", vars={"question": "Why?"})
+    assert rendered == PromptRegistry.from_manifest_path(str(json_path)).render(
+        "planner", vars={"question": "Why?"}
+    )
+    assert list(prompts._prompts) == [("planner", "v2")]  # pyright: ignore[reportPrivateUsage]
+    with pytest.raises(PromptNotFound):
+        registry.render("planner", version="v9", vars={"question": "Why?"})
+
+
+def test_indexed_manifest_rejects_corrupt_input() -> None:
+    encoded = encode_manifest({"schema_version": 1, "prompts": []}, "indexed")
+    with pytest.raises(ValueError, match="Not an indexed manifest"):
+        IndexedManifest(b"{}")
+    with pytest.raises(ValueError, match="missing header"):
+        IndexedManifest(encoded[:8])
+    with pytest.raises(ValueError, match="newer Python"):
+        IndexedManifest(INDEXED_MAGIC + bytes([marshal.version + 1]) + encoded[5:])
+    header = marshal.dumps({"fields": {}})
+    with pytest.raises(ValueError, match="missing index"):
+        IndexedManifest(
+            INDEXED_MAGIC + bytes([marshal.version]) + len(header).to_bytes(8, "little") + header
+        )
+
+
+def test_share_manifest_maps_read_only(tmp_path: Path) -> None:
+    src_root = tmp_path / "prompts"
+    _write_tree(src_root)
+    manifest = compile_prompts(str(src_root), str(tmp_path / "manifest.json"))
+    shared = share_manifest(manifest)
+    assert shared[("planner", "v1")] == manifest["prompts"][0]
+    buffer = shared._buffer  # pyright: ignore[reportPrivateUsage]
+    assert isinstance(buffer, mmap.mmap)
+    with pytest.raises(TypeError):
+        buffer[0] = 0
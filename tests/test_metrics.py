@@ -0,0 +1,122 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from pathlib import Path
+
+import pytest
+
+from promptir.cache import LRUCache
+from promptir.compiler import compile_prompts
+from promptir.enrich import EnrichmentPipeline, enricher
+from promptir.errors import PromptInputError
+from promptir.metrics import (
+    HistogramSnapshot,
+    MetricsSnapshot,
+    PromptMetrics,
+    RenderMetrics,
+    format_prometheus,
+)
+from promptir.models import PromptDefinition
+from promptir.registry import PromptRegistry
+
+
+def _compile(tmp_path: Path) -> Path:
+    prompt_path = tmp_path / "prompts" / "planner" / "v1.md"
+    prompt_path.parent.mkdir(parents=True)
+    prompt_path.write_text(
+        """---
+{"id": "planner", "version": "v1", "metadata": {}, "variables": ["question"],
+  "blocks": {"_context": {"optional": true, "default": ""}}}
+---
+# system
+System.
+
+# user
+{{question}} {{_context}}
+""",
+        encoding="utf-8",
+    )
+    out_path = tmp_path / "manifest.json"
+    compile_prompts(str(tmp_path / "prompts"), str(out_path))
+    return out_path
+
+
+def test_registry_records_phases_enrichers_and_errors(tmp_path: Path) -> None:
+    metrics = RenderMetrics()
+    registry = PromptRegistry.from_manifest_path(
+        str(_compile(tmp_path)), metrics=metrics, render_cache=LRUCache()
+    )
+    release = threading.Event()
+
+    @enricher(writes=["_context"], name="context")
+    def context(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        return {"_context": "ctx"}
+
+    @enricher(writes=["_context"], name="stuck", timeout=0.01, cacheable=False)
+    def stuck(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        release.wait(5)
+        return {}
+
+    registry.set_enrichment_pipeline(EnrichmentPipeline([context, stuck]))
+    try:
+        registry.render("planner", vars={"question": "Q"})
+        registry.render("planner", vars={"question": "Q"})
+        asyncio.run(registry.arender("planner", vars={"question": "Other"}))
+    finally:
+        release.set()
+    with pytest.raises(PromptInputError):
+        registry.render("planner", vars={})
+    with pytest.raises(PromptInputError):
+        asyncio.run(registry.arender("planner", vars={}))
+
+    snapshot = metrics.snapshot()
+    prompt = registry.prepare("planner").prompt
+    series = snapshot.prompts[(prompt.id, prompt.version, prompt.hash)]
+    assert (series.renders, series.cache_hits, series.errors) == (3, 1, 2)
+    assert set(series.phases) == {
+        "normalize",
+        "cache_lookup",
+        "validate",
+        "block_defaults",
+        "enrichment",
+        "render",
+    }
+    assert series.phases["normalize"].count == 3
+    assert series.phases["render"].count == 2
+    assert series.enrichers["context"].count == 2
+    assert series.enricher_timeouts == {"stuck": 2}
+
+    text = metrics.to_prometheus()
+    labels = f'id="planner",version="v1",hash="{prompt.hash}"'
+    assert f"promptir_renders_total{{{labels}}} 3" in text
+    assert f'promptir_render_phase_seconds_count{{{labels},phase="render"}} 2' in text
+    assert f'promptir_enricher_timeouts_total{{{labels},enricher="stuck"}} 2' in text
+    assert "# TYPE promptir_enricher_seconds histogram" in text
+
+    metrics.reset()
+    assert metrics.snapshot().prompts == {}
+
+
+def test_prometheus_format_is_cumulative_and_escaped() -> None:
+    histogram = HistogramSnapshot(buckets=(0.1, 1.0), counts=(1, 2, 3), count=6, sum=7.5)
+    snapshot = MetricsSnapshot(
+        {('a"b', "v\\1", "h\n"): PromptMetrics(renders=6, phases={"render": histogram})}
+    )
+    text = format_prometheus(snapshot, prefix="app")
+    labels = 'id="a\\"b",version="v\\\\1",hash="h\\n"'
+    assert f'app_render_phase_seconds_bucket{{{labels},phase="render",le="0.1"}} 1' in text
+    assert f'app_render_phase_seconds_bucket{{{labels},phase="render",le="1.0"}} 3' in text
+    assert f'app_render_phase_seconds_bucket{{{labels},phase="render",le="+Inf"}} 6' in text
+    assert f'app_render_phase_seconds_sum{{{labels},phase="render"}} 7.5' in text
+    assert text.endswith("\n")
+
+
+def test_render_metrics_rejects_bad_buckets() -> None:
+    for buckets in ((), (1.0, 0.5), (0.0, 1.0), (1.0, 1.0)):
+        with pytest.raises(ValueError, match="buckets"):
+            RenderMetrics(buckets=buckets)
@@ -1,13 +1,25 @@
 from __future__ import annotations
 
+import asyncio
+import multiprocessing
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from multiprocessing.connection import Connection
 from pathlib import Path
+from typing import Any, Literal
 
 import pytest
 
+from promptir.cache import LRUCache
 from promptir.compiler import compile_prompts
 from promptir.enrich import EnrichmentPipeline
 from promptir.errors import PromptInputError, PromptNotFound
-from promptir.registry import PromptRegistry
+from promptir.registry import (
+    PromptRegistry,
+    RenderedPrompt,
+    _LazyPrompts,  # pyright: ignore[reportPrivateUsage]
+)
 
 
 def _write_prompt(path: Path, content: str) -> None:
@@ -142,6 +154,61 @@ def test_registry_optional_defaults_and_normalization(tmp_path: Path) -> None:
     assert "default" in rendered.messages[1]["content"]
 
 
+def test_registry_prepare_reuses_handle(tmp_path: Path) -> None:
+    manifest_path = _compile_optional_block_sample(tmp_path)
+    registry = PromptRegistry.from_manifest_path(str(manifest_path))
+    prepared = registry.prepare("optional")
+    assert registry.prepare("optional") is prepared
+    assert prepared.prompt.version == "v1"
+    assert prepared.required_vars == frozenset({"question"})
+    assert prepared.block_defaults == {"_context": "default"}
+
+    rendered = prepared.render({"question": "Hi"})
+    assert rendered == registry.render("optional", vars={"question": "Hi"})
+    assert "Context: default" in rendered.messages[1]["content"]
+    with pytest.raises(PromptInputError, match="Extra vars"):
+        prepared.render({"question": "Hi", "extra": "no"})
+    with pytest.raises(PromptNotFound):
+        registry.prepare("optional", version="v9")
+
+
+def test_registry_render_many(tmp_path: Path) -> None:
+    manifest_path = _compile_optional_block_sample(tmp_path)
+    registry = PromptRegistry.from_manifest_path(str(manifest_path))
+    inputs = [({"question": f"q{index}"}, {"_context": f"c{index}"}) for index in range(7)]
+    expected = [registry.render("optional", vars=vars, blocks=blocks) for vars, blocks in inputs]
+
+    assert registry.render_many("optional", inputs) == expected
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        assert registry.render_many("optional", iter(inputs), executor=executor, chunk_size=3) == (
+            expected
+        )
+        with pytest.raises(ValueError, match="chunk_size"):
+            registry.render_many("optional", inputs, executor=executor, chunk_size=0)
+    with ProcessPoolExecutor(max_workers=2) as executor:
+        assert registry.render_many("optional", inputs, executor=executor, chunk_size=2) == (
+            expected
+        )
+        with pytest.raises(PromptInputError, match="Missing required vars"):
+            registry.render_many("optional", [*inputs, ({}, {})], executor=executor)
+
+
+def test_registry_render_many_uses_one_pipeline_for_all_thread_chunks(tmp_path: Path) -> None:
+    manifest_path = _compile_optional_block_sample(tmp_path)
+    registry = PromptRegistry.from_manifest_path(str(manifest_path))
+
+    def swap(prompt: object, vars: dict[str, str], blocks: dict[str, str]) -> dict[str, str]:
+        registry.set_enrichment_pipeline(EnrichmentPipeline([]))
+        return {"_context": "first"}
+
+    registry.set_enrichment_pipeline(EnrichmentPipeline([swap]))
+    inputs = [({"question": f"q{index}"}, {"_context": ""}) for index in range(4)]
+    with ThreadPoolExecutor(max_workers=1) as executor:
+        rendered = registry.render_many("optional", inputs, executor=executor, chunk_size=1)
+
+    assert all("first" in result.messages[1]["content"] for result in rendered)
+
+
 def test_registry_enrichment_pipeline(tmp_path: Path) -> None:
     manifest_path = _compile_sample(tmp_path)
     registry = PromptRegistry.from_manifest_path(str(manifest_path))
@@ -156,6 +223,87 @@ def test_registry_enrichment_pipeline(tmp_path: Path) -> None:
     assert "enriched:Hi" in rendered.messages[1]["content"]
 
 
+def test_registry_arender_with_async_enricher(tmp_path: Path) -> None:
+    manifest_path = _compile_sample(tmp_path)
+    registry = PromptRegistry.from_manifest_path(str(manifest_path))
+    plain = asyncio.run(
+        registry.arender("planner", vars={"question": "Hi"}, blocks={"_context": "CTX"})
+    )
+    assert plain == registry.render("planner", vars={"question": "Hi"}, blocks={"_context": "CTX"})
+
+    async def enricher(
+        prompt: object, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        await asyncio.sleep(0)
+        return {"_context": f"async:{vars['question']}"}
+
+    registry.set_enrichment_pipeline(EnrichmentPipeline([enricher], concurrent=True))
+    rendered = asyncio.run(
+        registry.arender("planner", vars={"question": "Hi"}, blocks={"_context": ""})
+    )
+    assert "async:Hi" in rendered.messages[1]["content"]
+
+
+def test_registry_render_cache_skips_enrichment_on_hit(tmp_path: Path) -> None:
+    manifest_path = _compile_sample(tmp_path)
+    cache: LRUCache[tuple[str, str], RenderedPrompt] = LRUCache(max_entries=8)
+    registry = PromptRegistry.from_manifest_path(str(manifest_path), render_cache=cache)
+    calls: list[str] = []
+
+    def enricher(prompt: object, vars: dict[str, str], blocks: dict[str, str]) -> dict[str, str]:
+        calls.append(vars["question"])
+        return {"_context": f"enriched:{vars['question']}"}
+
+    registry.set_enrichment_pipeline(EnrichmentPipeline([enricher]))
+    first = registry.render("planner", vars={"question": "Hi"}, blocks={"_context": ""})
+    second = registry.render("planner", vars={"question": "Hi"}, blocks={"_context": None})
+    third = asyncio.run(
+        registry.arender("planner", vars={"question": "Hi"}, blocks={"_context": ""})
+    )
+    other = registry.render("planner", vars={"question": "Yo"}, blocks={"_context": ""})
+    assert first == second == third
+    assert "enriched:Yo" in other.messages[1]["content"]
+    assert calls == ["Hi", "Yo"]
+    assert cache.stats().hits == 2
+    with pytest.raises(PromptInputError, match="Missing required block"):
+        registry.render("planner", vars={"question": "Hi"})
+
+
+def test_registry_render_cache_hits_are_isolated_from_callers(tmp_path: Path) -> None:
+    manifest_path = _compile_sample(tmp_path)
+    cache: LRUCache[tuple[str, str], RenderedPrompt] = LRUCache(max_entries=8)
+    registry = PromptRegistry.from_manifest_path(str(manifest_path), render_cache=cache)
+    inputs: dict[str, Any] = {"vars": {"question": "Hi"}, "blocks": {"_context": ""}}
+
+    first = registry.render("planner", **inputs)
+    expected = first.messages[1]["content"]
+    first.messages[1]["content"] = "edited"
+    second = registry.render("planner", **inputs)
+    second.messages[1]["content"] = "edited again"
+
+    assert registry.render("planner", **inputs).messages[1]["content"] == expected
+    assert cache.stats().hits == 2
+
+
+def test_registry_pipeline_swap_clears_render_cache(tmp_path: Path) -> None:
+    manifest_path = _compile_sample(tmp_path)
+    cache: LRUCache[tuple[str, str], RenderedPrompt] = LRUCache(max_entries=8)
+    registry = PromptRegistry.from_manifest_path(str(manifest_path), render_cache=cache)
+
+    def tag(label: str) -> EnrichmentPipeline:
+        def enrich(prompt: object, vars: dict[str, str], blocks: dict[str, str]) -> dict[str, str]:
+            return {"_context": label}
+
+        return EnrichmentPipeline([enrich])
+
+    registry.set_enrichment_pipeline(tag("one"))
+    inputs: dict[str, Any] = {"vars": {"question": "Hi"}, "blocks": {"_context": ""}}
+    assert "one" in registry.render("planner", **inputs).messages[1]["content"]
+    registry.set_enrichment_pipeline(tag("two"))
+
+    assert "two" in registry.render("planner", **inputs).messages[1]["content"]
+
+
 def test_registry_enrichment_strict_block_check(tmp_path: Path) -> None:
     manifest_path = _compile_sample(tmp_path)
     registry = PromptRegistry.from_manifest_path(str(manifest_path))
@@ -206,6 +354,13 @@ Question: {{ question }}
     )
     assert "CTX" in rendered.messages[1]["content"]
 
+    templates = dict(registry._jinja_templates)
+    assert len(templates) == 2
+    rendered = registry.render("router", version="v1", vars={"question": "Again"}, blocks={})
+    assert "Question: Again" in rendered.messages[1]["content"]
+    assert "Context" not in rendered.messages[1]["content"]
+    assert registry._jinja_templates == templates
+
 
 def test_registry_unknown_template_engine(tmp_path: Path) -> None:
     manifest_path = tmp_path / "dist" / "manifest.json"
@@ -236,3 +391,141 @@ def test_registry_unknown_template_engine(tmp_path: Path) -> None:
     registry = PromptRegistry.from_manifest_path(str(manifest_path))
     with pytest.raises(PromptInputError, match="Unknown template_engine"):
         registry.render("bad", version="v1", vars={"question": "hi"}, blocks={})
+
+
+def _render_in_child(registry: PromptRegistry, conn: Connection) -> None:
+    conn.send(registry.render("planner", vars={"question": "Q?"}, blocks={"_context": "C"}))
+    conn.close()
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="requires fork")
+def test_registry_shared_manifest_serves_forked_workers(tmp_path: Path) -> None:
+    manifest_path = _compile_sample(tmp_path)
+    registry = PromptRegistry.from_manifest_path(str(manifest_path), shared=True)
+    prompts = registry._table.prompts  # pyright: ignore[reportPrivateUsage]
+    assert isinstance(prompts, _LazyPrompts)
+    assert prompts._prompts == {}  # pyright: ignore[reportPrivateUsage]
+
+    parent_conn, child_conn = multiprocessing.Pipe()
+    child = multiprocessing.get_context("fork").Process(
+        target=_render_in_child, args=(registry, child_conn)
+    )
+    child.start()
+    rendered = parent_conn.recv()
+    child.join()
+    assert child.exitcode == 0
+    assert rendered == PromptRegistry.from_manifest_path(str(manifest_path)).render(
+        "planner", vars={"question": "Q?"}, blocks={"_context": "C"}
+    )
+    assert prompts._prompts == {}  # pyright: ignore[reportPrivateUsage]
+
+
+def _write_writer(src_root: Path, greeting: str) -> None:
+    _write_prompt(
+        src_root / "writer" / "v1.md",
+        f"""---
+{{"id": "writer", "version": "v1", "metadata": {{}}, "variables": ["topic"]}}
+---
+# system
+{greeting}
+
+# user
+Write about {{{{topic}}}}.
+""",
+    )
+
+
+def test_registry_reload_swaps_table_and_keeps_unchanged_handles(tmp_path: Path) -> None:
+    manifest_path = _compile_sample(tmp_path)
+    src_root = tmp_path / "src" / "llm" / "prompts"
+    _write_writer(src_root, "Hello.")
+    compile_prompts(str(src_root), str(manifest_path))
+    registry = PromptRegistry.from_manifest_path(str(manifest_path))
+    planner = registry.prepare("planner")
+    writer = registry.prepare("writer")
+    writer.render({"topic": "cats"})
+
+    _write_writer(src_root, "Bonjour.")
+    compile_prompts(str(src_root), str(manifest_path))
+    registry.reload()
+    assert registry.prepare("planner") is planner
+    assert registry.prepare("writer") is not writer
+    rendered = registry.render("writer", vars={"topic": "cats"})
+    assert rendered.messages[0]["content"] == "Bonjour."
+    assert writer.render({"topic": "cats"}).messages[0]["content"] == "Hello."
+    plans = registry._simple_plans  # pyright: ignore[reportPrivateUsage]
+    writer_hash = registry.prepare("writer").prompt.hash
+    assert {key[0] for key in plans} == {planner.prompt.hash, writer_hash}
+
+    with pytest.raises(ValueError, match="needs a path"):
+        PromptRegistry({}).reload()
+    with pytest.raises(ValueError, match="needs a registry loaded"):
+        PromptRegistry({}).watch_manifest()
+
+
+@pytest.mark.parametrize("compare", ["mtime", "hash"])
+def test_registry_watch_manifest_reloads_on_change(
+    tmp_path: Path, compare: Literal["mtime", "hash"]
+) -> None:
+    manifest_path = _compile_sample(tmp_path)
+    src_root = tmp_path / "src" / "llm" / "prompts"
+    registry = PromptRegistry.from_manifest_path(str(manifest_path))
+    errors: list[Exception] = []
+    stop = registry.watch_manifest(0.01, compare=compare, on_error=errors.append)
+    try:
+        _write_writer(src_root, "Hello.")
+        compile_prompts(str(src_root), str(manifest_path))
+        deadline = time.monotonic() + 5
+        while time.monotonic() < deadline:
+            try:
+                registry.prepare("writer")
+                break
+            except PromptNotFound:
+                time.sleep(0.01)
+        assert registry.prepare("writer").prompt.id == "writer"
+
+        manifest_path.write_text("{not json", encoding="utf-8")
+        while not errors and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert isinstance(errors[0], ValueError)
+        assert registry.prepare("writer").prompt.id == "writer"
+    finally:
+        stop.set()
+
+
+def test_registry_concurrent_render_with_reloads_and_pipeline_swaps(tmp_path: Path) -> None:
+    manifest_path = _compile_sample(tmp_path)
+    registry = PromptRegistry.from_manifest_path(str(manifest_path))
+
+    def tag(label: str) -> EnrichmentPipeline:
+        def enrich(prompt: object, vars: dict[str, str], blocks: dict[str, str]) -> dict[str, str]:
+            return {"_context": label}
+
+        return EnrichmentPipeline([enrich])
+
+    pipelines = [tag("one"), tag("two")]
+    stop = threading.Event()
+    errors: list[BaseException] = []
+    contexts: set[str] = set()
+
+    def render_loop() -> None:
+        try:
+            while not stop.is_set():
+                rendered = registry.render(
+                    "planner", vars={"question": "Q"}, blocks={"_context": "C"}
+                )
+                contexts.add(rendered.messages[1]["content"].rsplit(" ", 1)[-1])
+        except BaseException as exc:  # pragma: no cover - surfaced by the assertion below
+            errors.append(exc)
+
+    threads = [threading.Thread(target=render_loop) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for index in range(50):
+        registry.set_enrichment_pipeline(pipelines[index % 2])
+        registry.reload()
+    stop.set()
+    for thread in threads:
+        thread.join()
+    assert errors == []
+    assert contexts <= {"C", "one", "two"}
@@ -0,0 +1,30 @@
+from __future__ import annotations
+
+from promptir.render_jinja2 import compile_jinja2, create_sandbox_environment, render_jinja2
+from promptir.render_simple import compile_simple, render_simple, render_simple_plan
+
+
+def test_render_jinja2_one_shot() -> None:
+    assert render_jinja2("Hi {{ name }}", {"name": "Ada"}) == "Hi Ada"
+
+
+def test_compile_jinja2_reuses_environment() -> None:
+    env = create_sandbox_environment()
+    template = compile_jinja2(env, "{% if ctx %}[{{ ctx }}]{% endif %}{{ name }}")
+    assert template.render({"ctx": "c", "name": "a"}) == "[c]a"
+    assert template.render({"ctx": "", "name": "b"}) == "b"
+    assert env.globals == {}
+
+
+def test_compile_simple_plan_alternates_literals_and_slots() -> None:
+    plan = compile_simple("Q: {{question}}\nC: {{ _context }}")
+    assert plan == ("Q: ", "question", "\nC: ", "_context", "")
+    assert render_simple_plan(plan, {"question": "Hi"}) == "Q: Hi\nC: "
+    assert compile_simple("static") == ("static",)
+    assert render_simple_plan(("static",), {}) == "static"
+
+
+def test_render_simple_matches_plan() -> None:
+    template = "{{a}}-{{b}}-{{a}} {not a token}"
+    values = {"a": "1", "b": "2"}
+    assert render_simple(template, values) == "1-2-1 {not a token}"
@@ -0,0 +1,123 @@
+from __future__ import annotations
+
+import asyncio
+import json
+from collections.abc import Iterator
+from pathlib import Path
+
+import pytest
+
+from promptir.compiler import compile_prompts
+from promptir.errors import PromptInputError
+from promptir.registry import PromptRegistry
+from promptir.sampling import RenderSampler
+
+
+def _registry(tmp_path: Path, sampler: RenderSampler) -> PromptRegistry:
+    prompt_path = tmp_path / "prompts" / "planner" / "v1.md"
+    prompt_path.parent.mkdir(parents=True)
+    prompt_path.write_text(
+        """---
+{"id": "planner", "version": "v1", "metadata": {}, "variables": ["question"],
+  "blocks": {"_context": {"optional": true, "default": ""}}}
+---
+# system
+System.
+
+# user
+{{question}} {{_context}}
+""",
+        encoding="utf-8",
+    )
+    out_path = tmp_path / "manifest.json"
+    compile_prompts(str(tmp_path / "prompts"), str(out_path))
+    return PromptRegistry.from_manifest_path(str(out_path), sampler=sampler)
+
+
+def _sequence(*values: float) -> Iterator[float]:
+    yield from values
+
+
+def test_threshold_records_slow_renders_with_phases_and_sizes(tmp_path: Path) -> None:
+    sampler = RenderSampler(threshold=0.0)
+    registry = _registry(tmp_path, sampler)
+
+    registry.render("planner", vars={"question": "Déjà?"}, blocks={"_context": "ctx"})
+
+    (sample,) = sampler.samples()
+    prompt = registry.prepare("planner").prompt
+    assert (sample.prompt_id, sample.version, sample.hash) == ("planner", "v1", prompt.hash)
+    assert sample.reason == "slow"
+    assert sample.input_bytes == {"question": 7, "_context": 3}
+    assert list(sample.phases) == ["normalize", "validate", "block_defaults", "render"]
+    assert sample.duration == pytest.approx(sum(sample.phases.values()))
+    assert sample.error is None and sample.profile is None
+
+
+def test_sample_rate_picks_renders_at_random(tmp_path: Path) -> None:
+    draws = _sequence(0.1, 0.9, 0.2)
+    sampler = RenderSampler(sample_rate=0.5, rng=lambda: next(draws))
+    registry = _registry(tmp_path, sampler)
+
+    for question in ("a", "b", "c"):
+        registry.render("planner", vars={"question": question})
+
+    samples = sampler.samples()
+    assert [sample.input_bytes["question"] for sample in samples] == [1, 1]
+    assert all(sample.reason == "sampled" for sample in samples)
+
+
+def test_ring_buffer_keeps_latest_samples_and_errors(tmp_path: Path) -> None:
+    sampler = RenderSampler(threshold=0.0, capacity=2)
+    registry = _registry(tmp_path, sampler)
+
+    registry.render("planner", vars={"question": "first"})
+    registry.render("planner", vars={"question": "second"})
+    with pytest.raises(PromptInputError):
+        registry.render("planner", vars={})
+
+    samples = sampler.samples()
+    assert [sample.input_bytes for sample in samples] == [{"question": 6}, {}]
+    assert samples[1].error == "PromptInputError: Missing required vars: ['question']"
+    sampler.clear()
+    assert sampler.samples() == []
+
+
+def test_profile_captures_sync_renders_only(tmp_path: Path) -> None:
+    sampler = RenderSampler(sample_rate=1.0, profile=True)
+    registry = _registry(tmp_path, sampler)
+
+    registry.render("planner", vars={"question": "Why?"})
+    asyncio.run(registry.arender("planner", vars={"question": "Why?"}))
+
+    synced, awaited = sampler.samples()
+    assert synced.profile is not None and "function calls" in synced.profile
+    assert awaited.profile is None
+
+
+def test_dump_jsonl_writes_one_sample_per_line(tmp_path: Path) -> None:
+    sampler = RenderSampler(threshold=0.0)
+    registry = _registry(tmp_path, sampler)
+    registry.render("planner", vars={"question": "Why?"})
+    registry.render("planner", vars={"question": "How?"})
+
+    out_path = tmp_path / "samples.jsonl"
+    assert sampler.dump_jsonl(out_path) == 2
+
+    lines = [json.loads(line) for line in out_path.read_text(encoding="utf-8").splitlines()]
+    assert [line["prompt_id"] for line in lines] == ["planner", "planner"]
+    assert lines[0]["phases"].keys() == {"normalize", "validate", "block_defaults", "render"}
+
+
+@pytest.mark.parametrize(
+    ("kwargs", "message"),
+    [
+        ({}, "set a threshold"),
+        ({"threshold": -1.0}, "threshold"),
+        ({"sample_rate": 1.5}, "sample_rate"),
+        ({"threshold": 0.1, "capacity": 0}, "capacity"),
+    ],
+)
+def test_sampler_rejects_invalid_settings(kwargs: dict[str, float], message: str) -> None:
+    with pytest.raises(ValueError, match=message):
+        RenderSampler(**kwargs)  # pyright: ignore[reportArgumentType]
@@ -0,0 +1,202 @@
+from __future__ import annotations
+
+import asyncio
+import threading
+from collections.abc import Iterator
+from dataclasses import dataclass, field
+from pathlib import Path
+
+import pytest
+
+from promptir.compiler import compile_prompts
+from promptir.enrich import EnrichmentPipeline, enricher
+from promptir.errors import PromptInputError
+from promptir.models import PromptDefinition
+from promptir.registry import PromptRegistry
+from promptir.tracing import SpanAttributes, current_span, set_tracer
+
+
+@dataclass
+class RecordedSpan:
+    name: str
+    attributes: dict[str, object]
+    parent: RecordedSpan | None
+    error: BaseException | None = None
+    ended: bool = False
+    thread: str = field(default_factory=lambda: threading.current_thread().name)
+
+
+class RecordingTracer:
+    def __init__(self) -> None:
+        self.spans: list[RecordedSpan] = []
+        self._lock = threading.Lock()
+
+    def start_span(self, name: str, attributes: SpanAttributes, parent: object | None) -> object:
+        assert parent is None or isinstance(parent, RecordedSpan)
+        recorded = RecordedSpan(name, dict(attributes), parent)
+        with self._lock:
+            self.spans.append(recorded)
+        return recorded
+
+    def end_span(self, span: object, error: BaseException | None) -> None:
+        assert isinstance(span, RecordedSpan) and not span.ended
+        span.ended = True
+        span.error = error
+
+    def named(self, name: str) -> list[RecordedSpan]:
+        return [span for span in self.spans if span.name == name]
+
+
+@pytest.fixture
+def tracer() -> Iterator[RecordingTracer]:
+    recording = RecordingTracer()
+    set_tracer(recording)
+    yield recording
+    set_tracer(None)
+
+
+def _write_prompt(root: Path) -> None:
+    prompt_path = root / "planner" / "v1.md"
+    prompt_path.parent.mkdir(parents=True)
+    prompt_path.write_text(
+        """---
+{"id": "planner", "version": "v1", "metadata": {}, "variables": ["question"],
+  "blocks": {"_context": {"optional": true, "default": ""}}}
+---
+# system
+System.
+
+# user
+{{question}} {{_context}}
+""",
+        encoding="utf-8",
+    )
+
+
+def _registry(tmp_path: Path) -> PromptRegistry:
+    _write_prompt(tmp_path / "prompts")
+    out_path = tmp_path / "manifest.json"
+    compile_prompts(str(tmp_path / "prompts"), str(out_path))
+    return PromptRegistry.from_manifest_path(str(out_path))
+
+
+def test_render_spans_nest_phases_under_render(tmp_path: Path, tracer: RecordingTracer) -> None:
+    registry = _registry(tmp_path)
+    tracer.spans.clear()
+
+    registry.render("planner", vars={"question": "Why?"}, blocks={"_context": "ctx"})
+
+    (render,) = tracer.named("promptir.render")
+    prompt = registry.prepare("planner").prompt
+    assert render.parent is None and render.ended and render.error is None
+    assert render.attributes == {
+        "promptir.prompt.id": "planner",
+        "promptir.prompt.version": "v1",
+        "promptir.prompt.hash": prompt.hash,
+        "promptir.input.vars": 1,
+        "promptir.input.blocks": 1,
+        "promptir.input.chars": 7,
+    }
+    phases = [span.name for span in tracer.spans if span.parent is render]
+    assert phases == [
+        "promptir.render.normalize",
+        "promptir.render.validate",
+        "promptir.render.block_defaults",
+        "promptir.render.render",
+    ]
+    assert all(span.ended for span in tracer.spans)
+    assert current_span() is None
+
+
+def test_render_error_ends_open_spans_with_the_exception(
+    tmp_path: Path, tracer: RecordingTracer
+) -> None:
+    registry = _registry(tmp_path)
+    tracer.spans.clear()
+
+    with pytest.raises(PromptInputError):
+        registry.render("planner", vars={})
+
+    (render,) = tracer.named("promptir.render")
+    (validate,) = tracer.named("promptir.render.validate")
+    assert isinstance(render.error, PromptInputError)
+    assert validate.error is render.error
+    assert tracer.named("promptir.render.normalize")[0].error is None
+    assert all(span.ended for span in tracer.spans)
+
+
+def test_enricher_spans_follow_threads_and_tasks(tmp_path: Path, tracer: RecordingTracer) -> None:
+    registry = _registry(tmp_path)
+
+    @enricher(writes=["_context"], name="context", timeout=5)
+    def context(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        return {"_context": "ctx"}
+
+    @enricher(reads=["_context"], writes=["_context"], name="suffix")
+    async def suffix(
+        prompt: PromptDefinition, vars: dict[str, str], blocks: dict[str, str]
+    ) -> dict[str, str]:
+        return {"_context": blocks["_context"] + "!"}
+
+    registry.set_enrichment_pipeline(EnrichmentPipeline([context, suffix]))
+    tracer.spans.clear()
+
+    rendered = asyncio.run(registry.arender("planner", vars={"question": "Why?"}))
+
+    assert rendered.messages[1]["content"] == "Why? ctx!"
+    (enrichment,) = tracer.named("promptir.render.enrichment")
+    (pipeline,) = tracer.named("promptir.enrich")
+    assert pipeline.parent is enrichment
+    assert pipeline.attributes["promptir.prompt.id"] == "planner"
+    stages = tracer.named("promptir.enrich.stage")
+    assert [span.attributes["promptir.stage"] for span in stages] == [0, 1]
+    assert all(span.parent is pipeline for span in stages)
+    calls = tracer.named("promptir.enricher")
+    assert [span.attributes["promptir.enricher"] for span in calls] == ["context", "suffix"]
+    assert [span.parent for span in calls] == stages
+
+    tracer.spans.clear()
+    registry.set_enrichment_pipeline(EnrichmentPipeline([context], max_workers=2))
+    registry.render("planner", vars={"question": "Why?"})
+
+    (threaded,) = tracer.named("promptir.enricher")
+    assert threaded.thread.startswith("promptir-enrich")
+    assert threaded.parent is tracer.named("promptir.enrich.stage")[0]
+    assert all(span.ended for span in tracer.spans)
+
+
+def test_compile_spans_cover_each_phase(tmp_path: Path, tracer: RecordingTracer) -> None:
+    _write_prompt(tmp_path / "prompts")
+
+    compile_prompts(str(tmp_path / "prompts"), str(tmp_path / "manifest.json"))
+
+    (root,) = tracer.named("promptir.compile")
+    phases = [span.name for span in tracer.spans if span.parent is root]
+    assert phases == [
+        "promptir.compile.plan",
+        "promptir.compile.prompts",
+        "promptir.compile.assemble",
+        "promptir.compile.write",
+    ]
+    (compiled,) = tracer.named("promptir.compile.file")
+    assert compiled.parent is tracer.named("promptir.compile.prompts")[0]
+    assert compiled.attributes["promptir.path"] == "planner/v1.md"
+    assert (
+        compiled.attributes["promptir.input.bytes"]
+        == (tmp_path / "prompts" / "planner" / "v1.md").stat().st_size
+    )
+
+
+def test_no_tracer_records_nothing(tmp_path: Path) -> None:
+    registry = _registry(tmp_path)
+    tracer = RecordingTracer()
+
+    registry.render("planner", vars={"question": "Why?"})
+
+    set_tracer(tracer)
+    set_tracer(None)
+    registry.render("planner", vars={"question": "Why?"})
+    assert tracer.spans == []
+    assert current_span() is None